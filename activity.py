@@ -0,0 +1,75 @@
+import asyncio
+from datetime import datetime
+from typing import Dict, Optional
+import logging
+
+from config import ACTIVITY_FLUSH_INTERVAL
+from metrics import ACTIVITY_TOUCHES, ACTIVITY_ROWS
+
+logger = logging.getLogger(__name__)
+
+
+class ActivityTracker:
+    """جمع کردن زمان آخرین فعالیت کاربران در حافظه و نوشتن دسته‌ای آن
+
+    touch فقط بیشترین زمان هر کاربر را نگه می‌دارد و هر flush_interval ثانیه همه کاربران با
+    یک UPDATE ... FROM (VALUES ...) در users.last_activity نوشته می‌شوند؛ پس هر کاربر در هر
+    بازه حداکثر یک بار ردیفش در جدول users به‌روز می‌شود. اگر نوشتن ناموفق باشد زمان‌ها برای
+    flush بعدی می‌مانند و در خاموشی همه نوشته می‌شوند.
+    """
+
+    def __init__(self, db, flush_interval=ACTIVITY_FLUSH_INTERVAL):
+        self.db = db
+        self.flush_interval = flush_interval
+        self._pending: Dict[int, datetime] = {}
+        self._wakeup = None
+        self._task = None
+        self._closing = False
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def start(self):
+        """شروع حلقه flush در پس‌زمینه"""
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"Activity tracker started (flush every {self.flush_interval}s)")
+
+    async def close(self):
+        """نوشتن زمان‌های باقیمانده و توقف"""
+        if self._task is None:
+            return
+        self._closing = True
+        self._wakeup.set()
+        await self._task
+        # touch هایی که حین آخرین flush حلقه رسیده‌اند
+        await self.flush()
+        self._task = None
+        logger.info("Activity tracker drained")
+
+    def touch(self, user_id: int, when: Optional[datetime] = None):
+        when = when or datetime.now()
+        ACTIVITY_TOUCHES.inc()
+        if when > self._pending.get(user_id, datetime.min):
+            self._pending[user_id] = when
+
+    async def flush(self):
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, {}
+        if await self.db.touch_users(batch):
+            ACTIVITY_ROWS.inc(len(batch))
+            return
+        # زمان‌هایی که در این فاصله رسیده‌اند جدیدترند
+        for user_id, when in batch.items():
+            if when > self._pending.get(user_id, datetime.min):
+                self._pending[user_id] = when
+
+    async def _run(self):
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            await self.flush()
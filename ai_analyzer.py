@@ -2,21 +2,20 @@ import re
 from typing import Dict, List, Tuple
 import logging
 
+from exercise_lexicon import get_lexicon
+from metrics import ANALYZER_SECONDS
+
 logger = logging.getLogger(__name__)
 
+_PERSIAN_NAME_RE = re.compile(r'([\u0600-\u06FF\s]+)')
+_VALUE_RE = re.compile(r'[=:]?\s*(\d+)\s*(دقیقه|ثانیه|تکرار|بار)?')
+
 class AIAnalyzer:
     def __init__(self):
-        self.exercise_keywords = {
-            "شنا": ["شنا", "شنای", "push up", "pushup"],
-            "دراز نشست": ["دراز نشست", "درازنشست", "sit up", "situp"],
-            "اسکات": ["اسکات", "squat"],
-            "طناب": ["طناب", "طناب زدن", "skipping"],
-            "دویدن": ["دویدن", "دو", "running", "run"],
-            "پلانک": ["پلانک", "plank"],
-            "بارفیکس": ["بارفیکس", "pull up", "pullup"],
-            "پرس سینه": ["پرس سینه", "chest press"],
-        }
+        self.lexicon = get_lexicon()
+        self.exercise_keywords = self.lexicon.aliases
     
+    @ANALYZER_SECONDS.labels("analyze_text").time()
     def analyze_text(self, text: str) -> Dict:
         """تحلیل متن با هوش مصنوعی ساده"""
         analysis = {
@@ -53,22 +52,17 @@ class AIAnalyzer:
         exercise = {}
         
         # تشخیص نام تمرین
-        for ex_name, keywords in self.exercise_keywords.items():
-            for keyword in keywords:
-                if keyword in text:
-                    exercise["name"] = ex_name
-                    break
-            if exercise.get("name"):
-                break
-        
-        if not exercise.get("name"):
+        name = self.lexicon.canonical_name(text)
+        if name:
+            exercise["name"] = name
+        else:
             # تشخیص نام‌های فارسی عمومی
-            match = re.search(r'([\u0600-\u06FF\s]+)', text)
+            match = _PERSIAN_NAME_RE.search(text)
             if match:
                 exercise["name"] = match.group(1).strip()
         
         # تشخیص تعداد/زمان
-        value_match = re.search(r'[=:]?\s*(\d+)\s*(دقیقه|ثانیه|تکرار|بار)?', text)
+        value_match = _VALUE_RE.search(text)
         if value_match:
             exercise["value"] = int(value_match.group(1))
             exercise["unit"] = value_match.group(2) if value_match.group(2) else "تکرار"
@@ -97,32 +91,32 @@ class AIAnalyzer:
         """تشخیص نواحی تمرکز"""
         areas = []
         for ex in exercises:
-            name = ex.get("name", "")
-            if "شنا" in name or "پرس" in name or "بارفیکس" in name:
-                if "بالاتنه" not in areas:
-                    areas.append("بالاتنه")
-            elif "اسکات" in name or "ددلیفت" in name:
-                if "پایین‌تنه" not in areas:
-                    areas.append("پایین‌تنه")
-            elif "پلانک" in name or "کرانچ" in name:
-                if "میان‌تنه" not in areas:
-                    areas.append("میان‌تنه")
+            area = self.lexicon.focus_area(ex.get("name", ""))
+            if area and area not in areas:
+                areas.append(area)
         
         return areas if areas else ["عمومی"]
     
     def _generate_suggestions(self, analysis: Dict) -> List[str]:
         """تولید پیشنهادات هوشمند"""
-        suggestions = []
         exercises = analysis.get("exercises", [])
+        has_cardio = any(self.is_cardio(ex.get("name", "")) for ex in exercises)
+        return self.suggestions_from(len(exercises), analysis.get("focus_areas", []), has_cardio)
+    
+    @staticmethod
+    def is_cardio(name: str) -> bool:
+        return "طناب" in name or "دویدن" in name
+    
+    def suggestions_from(self, exercise_count: int, focus_areas: List[str], has_cardio: bool) -> List[str]:
+        """پیشنهادات از تعداد حرکات، نواحی تمرکز و وجود تمرین هوازی"""
+        suggestions = []
         
-        if len(exercises) < 3:
+        if exercise_count < 3:
             suggestions.append("می‌تونی تنوع تمریناتت رو بیشتر کنی")
         
-        focus_areas = analysis.get("focus_areas", [])
         if len(focus_areas) == 1:
             suggestions.append(f"پیشنهاد می‌کنم تمرینات {focus_areas[0]} رو با تمرینات مکمل ترکیب کنی")
         
-        has_cardio = any("طناب" in ex.get("name", "") or "دویدن" in ex.get("name", "") for ex in exercises)
         if not has_cardio:
             suggestions.append("اضافه کردن یک تمرین هوازی کوتاه می‌تونه چربی‌سوزی رو افزایش بده")
         
@@ -139,6 +133,7 @@ class AIAnalyzer:
         
         return warnings
     
+    @ANALYZER_SECONDS.labels("generate_pro_version").time()
     def generate_pro_version(self, exercises: List[Dict], level: str) -> str:
         """تولید نسخه پیشرفته تمرین"""
         pro_version = []
@@ -0,0 +1,132 @@
+import asyncio
+import inspect
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Tuple, Type
+import logging
+
+from config import ANALYSIS_CACHE_SIZE, ANALYSIS_CACHE_TTL
+
+logger = logging.getLogger(__name__)
+
+DIGITS = str.maketrans("۰۱۲۳۴۵۶۷۸۹٠١٢٣٤٥٦٧٨٩", "01234567890123456789")
+_SPACES_RE = re.compile(r"[^\S\n]+")
+_SEPARATOR_RE = re.compile(r" ?[=:] ?")
+
+
+def normalize_workout_text(text: str) -> str:
+    """شکل استاندارد متن تمرین که کلید کش است
+
+    ارقام فارسی/عربی به انگلیسی، فاصله‌های پشت سر هم به یک فاصله، جداکننده‌های
+    «:» و « = » به «=» تبدیل و خطوط خالی حذف می‌شوند. تحلیل هم روی همین متن
+    انجام می‌شود تا همه شکل‌های یک تمرین نتیجه یکسان داشته باشند.
+    """
+    text = _SPACES_RE.sub(" ", text.translate(DIGITS))
+    lines = (_SEPARATOR_RE.sub("=", line.strip()) for line in text.split("\n"))
+    return "\n".join(line for line in lines if line)
+
+
+class AnalysisCache:
+    """کش LRU/TTL نتایج تحلیل بر اساس متن نرمال‌شده تمرین
+
+    درخواست‌های همزمان برای یک متن با هم ادغام می‌شوند تا فقط یکی محاسبه شود.
+    با تغییر version (قواعد تحلیلگر یا واژه‌نامه) کل کش خالی می‌شود. خطاهای private_errors
+    (مثل لغو کار به درخواست همان کاربر) فقط به درخواست‌کننده‌ای می‌رسند که محاسبه را شروع کرده؛
+    بقیه منتظرها خودشان دوباره محاسبه می‌کنند.
+    """
+
+    def __init__(self, version: str, max_size: int = ANALYSIS_CACHE_SIZE, ttl: float = ANALYSIS_CACHE_TTL,
+                 private_errors: Tuple[Type[BaseException], ...] = ()):
+        self.version = version
+        self.private_errors = private_errors
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def set_version(self, version: str):
+        """تغییر نسخه قواعد تحلیل و باطل کردن همه نتایج قبلی"""
+        if version != self.version:
+            logger.info(f"Analysis cache invalidated: {self.version} -> {version}")
+            self.version = version
+            self._entries.clear()
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+    async def get_or_compute(self, text: str, compute: Callable[[str], Any]) -> Any:
+        """نتیجه تحلیل از کش؛ در غیر این صورت compute روی متن نرمال‌شده اجرا می‌شود"""
+        key = normalize_workout_text(text)
+        version = self.version
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._entries[key]
+            self.expirations += 1
+
+        inflight = self._inflight.get(key)
+        while inflight is not None:
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                # لغو خود این درخواست، نه محاسبه مشترک
+                if not inflight.cancelled():
+                    raise
+            # محاسبه برای درخواست‌کننده‌اش لغو شد؛ اولین منتظر دوباره محاسبه می‌کند
+            inflight = self._inflight.get(key)
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = compute(key)
+            if inspect.isawaitable(value):
+                value = await value
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except self.private_errors:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # اگر منتظری نبود، هشدار «exception was never retrieved» ندهد
+            future.exception()
+            raise
+        else:
+            future.set_result(value)
+            # نتیجه‌ای که با قواعد قدیمی محاسبه شده ذخیره نمی‌شود
+            if version == self.version:
+                self._store(key, value)
+        finally:
+            del self._inflight[key]
+        return value
+
+    def _store(self, key: str, value: Any):
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
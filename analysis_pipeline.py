@@ -0,0 +1,134 @@
+from dataclasses import dataclass
+from typing import NamedTuple, Optional, Tuple
+import logging
+
+from ai_analyzer import AIAnalyzer
+from metrics import ANALYZER_SECONDS
+from workout_analyzer import WorkoutAnalyzer, POWERFUL_EXERCISES
+from workout_parser import parse_exercises
+
+logger = logging.getLogger(__name__)
+
+# با هر تغییر در قواعد تحلیل (جدول MET، آستانه‌ها، متن پیشنهادها) یکی اضافه شود
+ANALYZER_VERSION = "1"
+
+class Exercise(NamedTuple):
+    name: str
+    value: int
+    unit: str
+    category: str
+
+
+@dataclass(frozen=True)
+class WorkoutReport:
+    """نتیجه کامل تحلیل یک تمرین"""
+    exercises: Tuple[Exercise, ...]
+    volume: int
+    calories: int
+    goal: str
+    difficulty: str
+    rest_time: int
+    imbalances: Tuple[str, ...]
+    overtraining: Tuple[str, ...]
+    improvements: str
+    focus_areas: Tuple[str, ...]
+    suggestions: Tuple[str, ...]
+
+    @property
+    def summary(self) -> str:
+        """خلاصه‌ای که در ستون analysis ذخیره می‌شود"""
+        return f"هدف: {self.goal} - شدت: {self.difficulty}"
+
+
+class AnalysisPipeline:
+    """تحلیل تمرین با یک بار پارس و یک عبور روی حرکات
+
+    جایگزین دنباله parse_workout + هشت متد WorkoutAnalyzer + analyze_text است و
+    قواعد تصمیم‌گیری را از همان متدهای *_from تحلیلگرها می‌گیرد.
+    """
+
+    def __init__(self, workout_analyzer: WorkoutAnalyzer = None, ai_analyzer: AIAnalyzer = None):
+        self.workout_analyzer = workout_analyzer or WorkoutAnalyzer()
+        self.ai_analyzer = ai_analyzer or AIAnalyzer()
+        self.lexicon = self.workout_analyzer.lexicon
+
+    @property
+    def version(self) -> str:
+        """نسخه قواعد تحلیل؛ شامل هش واژه‌نامه حرکات"""
+        return f"{ANALYZER_VERSION}:{self.lexicon.source_hash[:12]}"
+
+    @ANALYZER_SECONDS.labels("pipeline").time()
+    def analyze(self, text: str, weight: int = 70) -> Optional[WorkoutReport]:
+        """تحلیل متن تمرین؛ اگر هیچ حرکتی تشخیص داده نشود None برمی‌گرداند"""
+        wa = self.workout_analyzer
+        lookup = self.lexicon.lookup
+
+        exercises = []
+        volume = 0
+        calories = 0.0
+        categories = set()
+        high_reps = False
+        has_minutes = False
+        has_powerful = False
+        has_cardio = False
+        upper_body = lower_body = core = 0
+        hard_count = 0
+        focus_areas = []
+
+        for name, value, unit in parse_exercises(text):
+            info = lookup(name)
+            category = info["category"]
+            exercises.append(Exercise(name, value, unit, category))
+            categories.add(category)
+
+            if unit == 'دقیقه':
+                volume += value * 2
+                has_minutes = True
+            else:
+                volume += value
+                if value > 12:
+                    high_reps = True
+                if value > 20 and unit == 'تکرار':
+                    hard_count += 1
+            calories += wa.exercise_calories(category, value, unit, weight)
+
+            if name in POWERFUL_EXERCISES:
+                has_powerful = True
+            regions = info["body_regions"]
+            if "upper" in regions:
+                upper_body += value
+            if "lower" in regions:
+                lower_body += value
+            if "core" in regions:
+                core += value
+
+            # دید تحلیلگر هوشمند: نام استاندارد حرکت اگر معادلی پیدا شود
+            ai_name = info["canonical_name"] or name
+            if ai_name != name:
+                area = self.lexicon.focus_area(ai_name)
+            else:
+                area = info["focus_area"]
+            if area and area not in focus_areas:
+                focus_areas.append(area)
+            if self.ai_analyzer.is_cardio(ai_name):
+                has_cardio = True
+
+        if not exercises:
+            return None
+
+        difficulty = wa.estimate_difficulty(volume)
+        # تحلیلگر هوشمند هر خط پیام را یک حرکت حساب می‌کند
+        line_count = text.strip().count('\n') + 1
+        return WorkoutReport(
+            exercises=tuple(exercises),
+            volume=volume,
+            calories=round(calories),
+            goal=wa.goal_from(categories, volume, high_reps),
+            difficulty=difficulty,
+            rest_time=wa.rest_time_from(difficulty, has_powerful),
+            imbalances=tuple(wa.imbalance_from(upper_body, lower_body, core)),
+            overtraining=tuple(wa.overtraining_from(volume, difficulty, hard_count)),
+            improvements=wa.improvement_from(len(categories), difficulty, has_minutes),
+            focus_areas=tuple(focus_areas or ["عمومی"]),
+            suggestions=tuple(self.ai_analyzer.suggestions_from(line_count, focus_areas or ["عمومی"], has_cardio)),
+        )
@@ -0,0 +1,172 @@
+"""محاسبه دوباره calories، intensity، analysis و volume برای کل workout_history
+
+بعد از تغییر جدول MET یا آستانه‌های سختی اجرا شود:
+    python backfill.py --chunk 5000
+اجرا با همان checkpoint از آخرین شناسه ذخیره‌شده ادامه پیدا می‌کند؛ --restart از اول شروع می‌کند.
+بعد از آن repair_stats.py آمار هفتگی را با مقادیر جدید بازسازی می‌کند.
+"""
+import argparse
+import os
+import time
+import logging
+
+import numpy as np
+from psycopg2.extras import execute_values
+
+from analysis_cache import normalize_workout_text
+from config import DATABASE_URL
+from database import Database
+from exercise_lexicon import get_lexicon
+from workout_analyzer import WorkoutAnalyzer, MET_VALUES, DIFFICULTY_LIMITS, DIFFICULTY_LEVELS
+from workout_parser import parse_exercises
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+CATEGORIES = list(MET_VALUES)
+_CATEGORY_INDEX = {category: i for i, category in enumerate(CATEGORIES)}
+_MET = np.array([MET_VALUES[category] for category in CATEGORIES])
+_OTHER = _CATEGORY_INDEX["سایر"]
+_CARDIO = _CATEGORY_INDEX["هوازی"]
+_STRENGTH = _CATEGORY_INDEX["قدرتی"]
+_CORE = _CATEGORY_INDEX["مرکزی"]
+
+
+def flatten_chunk(texts):
+    """همه حرکات یک دسته ردیف در آرایه‌های موازی؛ row شماره ردیف هر حرکت است"""
+    lexicon = get_lexicon()
+    rows, values, minutes, categories = [], [], [], []
+    for i, text in enumerate(texts):
+        for name, value, unit in parse_exercises(normalize_workout_text(text or "")):
+            rows.append(i)
+            values.append(value)
+            minutes.append(unit == 'دقیقه')
+            categories.append(_CATEGORY_INDEX.get(lexicon.category(name), _OTHER))
+    return (
+        np.array(rows, dtype=np.int64),
+        np.array(values, dtype=np.float64),
+        np.array(minutes, dtype=bool),
+        np.array(categories, dtype=np.int64),
+    )
+
+
+def analyze_chunk(texts, weight=70):
+    """حجم، کالری، سطح سختی و هدف برای یک دسته ردیف با عملیات برداری
+
+    خروجی برای هر ردیف (calories, intensity, analysis, volume) یا None اگر حرکتی پیدا نشد.
+    """
+    n = len(texts)
+    rows, values, minutes, categories = flatten_chunk(texts)
+    if not len(rows):
+        return [None] * n
+
+    def per_row(weights):
+        return np.bincount(rows, weights=weights, minlength=n)
+
+    volume = per_row(np.where(minutes, values * 2, values)).astype(np.int64)
+    duration = np.where(minutes, values, values * 0.5)
+    # ترتیب جمع bincount همان ترتیب حرکات است، پس گرد کردن با round پایتون یکسان است
+    calories = np.round(per_row(_MET[categories] * 3.5 * weight * duration / 200)).astype(np.int64)
+    exercise_count = np.bincount(rows, minlength=n)
+    difficulty = np.searchsorted(np.array(DIFFICULTY_LIMITS), volume, side="left")
+
+    has_cardio = per_row(categories == _CARDIO) > 0
+    has_strength = per_row(categories == _STRENGTH) > 0
+    has_core = per_row(categories == _CORE) > 0
+    high_reps = per_row(~minutes & (values > 12)) > 0
+
+    wa = WorkoutAnalyzer()
+    results = []
+    for i in range(n):
+        if not exercise_count[i]:
+            results.append(None)
+            continue
+        present = {label for label, flag in (("هوازی", has_cardio[i]), ("قدرتی", has_strength[i]), ("مرکزی", has_core[i])) if flag}
+        level = DIFFICULTY_LEVELS[difficulty[i]]
+        goal = wa.goal_from(present, int(volume[i]), bool(high_reps[i]))
+        results.append((int(calories[i]), level, f"هدف: {goal} - شدت: {level}", int(volume[i])))
+    return results
+
+
+def read_checkpoint(path):
+    try:
+        with open(path) as f:
+            return int(f.read().strip() or 0)
+    except FileNotFoundError:
+        return 0
+
+
+def write_checkpoint(path, last_id):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(str(last_id))
+    os.replace(tmp_path, path)
+
+
+def run(chunk_size, checkpoint_path, restart=False, dry_run=False):
+    db = Database(DATABASE_URL)
+    start_id = 0 if restart else read_checkpoint(checkpoint_path)
+    read_conn = db.get_connection()
+    write_conn = db.get_connection()
+    # کرسر نام‌دار سمت سرور: ردیف‌ها دسته‌دسته از سرور خوانده می‌شوند
+    cur = read_conn.cursor(name="workout_backfill")
+    cur.itersize = chunk_size
+    cur.execute("""
+        SELECT id, workout_text, calories, intensity, analysis, volume
+        FROM workout_history
+        WHERE id > %s
+        ORDER BY id
+    """, (start_id,))
+
+    logger.info(f"Backfill starting after id {start_id}")
+    started = time.perf_counter()
+    scanned = updated = 0
+    try:
+        while True:
+            chunk = cur.fetchmany(chunk_size)
+            if not chunk:
+                break
+            results = analyze_chunk([row[1] for row in chunk])
+            changes = [
+                (row[0],) + result
+                for row, result in zip(chunk, results)
+                if result is not None and result != tuple(row[2:6])
+            ]
+            if changes and not dry_run:
+                with write_conn.cursor() as wcur:
+                    execute_values(wcur, """
+                        UPDATE workout_history AS w
+                        SET calories = v.calories, intensity = v.intensity, analysis = v.analysis, volume = v.volume
+                        FROM (VALUES %s) AS v(id, calories, intensity, analysis, volume)
+                        WHERE w.id = v.id
+                    """, changes, page_size=1000)
+                write_conn.commit()
+            if not dry_run:
+                write_checkpoint(checkpoint_path, chunk[-1][0])
+
+            scanned += len(chunk)
+            updated += len(changes)
+            elapsed = time.perf_counter() - started
+            logger.info(f"Backfill at id {chunk[-1][0]}: {scanned} rows scanned, {updated} updated, "
+                        f"{scanned / elapsed:.0f} rows/s")
+    finally:
+        cur.close()
+        read_conn.close()
+        write_conn.close()
+
+    elapsed = time.perf_counter() - started
+    logger.info(f"Backfill done: {scanned} rows in {elapsed:.1f}s ({scanned / max(elapsed, 1e-9):.0f} rows/s), {updated} updated")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunk", type=int, default=5000, help="تعداد ردیف در هر دسته")
+    parser.add_argument("--checkpoint", default="backfill.checkpoint", help="فایل آخرین شناسه پردازش‌شده")
+    parser.add_argument("--restart", action="store_true", help="نادیده گرفتن checkpoint و شروع از اول")
+    parser.add_argument("--dry-run", action="store_true", help="فقط محاسبه و گزارش، بدون نوشتن")
+    args = parser.parse_args()
+    run(args.chunk, args.checkpoint, restart=args.restart, dry_run=args.dry_run)
+
+
+if __name__ == "__main__":
+    main()
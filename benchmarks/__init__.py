@@ -0,0 +1 @@
+"""بنچمارک‌های عملکرد ربات؛ از ریشه پروژه با python -m benchmarks.<name> اجرا شوند"""
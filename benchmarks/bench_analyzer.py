@@ -0,0 +1,193 @@
+"""بنچمارک تحلیلگرها روی پیکره مصنوعی فارسی با خروجی JSON برای تشخیص پسرفت
+
+    python -m benchmarks.bench_analyzer
+    python -m benchmarks.bench_analyzer --compare benchmarks/results/analyzer-<commit>.json
+
+برای هر تابع و هر بازه طول پیام: پیام در ثانیه، هزینه هر خط و اوج حافظه تخصیص‌یافته
+در هر فراخوانی گزارش می‌شود. با --compare اگر هزینه هر خط یا حافظه از مبنا بیشتر از
+--tolerance بدتر شده باشد کد خروج ۱ است.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import timeit
+import tracemalloc
+
+from ai_analyzer import AIAnalyzer
+from analysis_cache import normalize_workout_text
+from analysis_pipeline import AnalysisPipeline
+from benchmarks.common import print_table
+from benchmarks.corpus import CorpusGenerator
+from workout_analyzer import WorkoutAnalyzer
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+BUCKETS = {
+    "small": (1, 10),
+    "medium": (11, 50),
+    "large": (51, 200),
+}
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def calibrate(repeat):
+    """زمان یک حلقه ثابت پایتونی (میکروثانیه) برای خنثی کردن تفاوت سرعت ماشین بین اجراها"""
+    words = ["اسکات", "شنا", "پلانک", "دویدن"] * 50
+
+    def workload():
+        counts = {}
+        for word in words:
+            counts[word] = counts.get(word, 0) + len(word.strip())
+        return sorted(counts.items())
+
+    timer = timeit.Timer(workload)
+    number, _ = timer.autorange()
+    return min(timer.repeat(number=number, repeat=repeat)) / number * 1e6
+
+
+def build_targets(wa, ai, pipeline):
+    """تابع‌های اندازه‌گیری‌شده؛ ورودی هر کدام متن خام پیام است"""
+    parsed = {}
+
+    def pro_version(text):
+        exercises = parsed.get(text)
+        if exercises is None:
+            exercises = parsed[text] = wa.parse_workout(text)
+        return ai.generate_pro_version(exercises, "متوسط")
+
+    def process_workout(text):
+        # همان کاری که process_workout در صورت نبودن نتیجه در کش انجام می‌دهد
+        return pipeline.analyze(normalize_workout_text(text))
+
+    return {
+        "parse_workout": wa.parse_workout,
+        "analyze_text": ai.analyze_text,
+        "generate_pro_version": pro_version,
+        "process_workout": process_workout,
+    }
+
+
+def measure(func, messages, lines, repeat):
+    def run():
+        for text in messages:
+            func(text)
+
+    run()  # گرم کردن (و پر کردن پارس‌های generate_pro_version)
+    # هر تکرار حداقل ۰.۲ ثانیه تا نویز زمان‌بندی در توابع سریع کم شود
+    timer = timeit.Timer(run)
+    number, _ = timer.autorange()
+    seconds = min(timer.repeat(number=number, repeat=repeat)) / number
+
+    tracemalloc.start()
+    peak_total = 0
+    for text in messages:
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        func(text)
+        peak_total += tracemalloc.get_traced_memory()[1] - baseline
+    tracemalloc.stop()
+
+    return {
+        "messages": len(messages),
+        "lines": lines,
+        "ops_per_sec": len(messages) / seconds,
+        "us_per_line": seconds / lines * 1e6,
+        "alloc_kib_per_op": peak_total / len(messages) / 1024,
+    }
+
+
+def run_suite(seed, count, repeat):
+    generator = CorpusGenerator(seed)
+    corpora = {
+        name: [generator.message(generator.rng.randint(low, high)) for _ in range(count)]
+        for name, (low, high) in BUCKETS.items()
+    }
+    wa, ai = WorkoutAnalyzer(), AIAnalyzer()
+    targets = build_targets(wa, ai, AnalysisPipeline(wa, ai))
+
+    calibration_before = calibrate(repeat)
+    results = {}
+    for target, func in targets.items():
+        results[target] = {}
+        for bucket, messages in corpora.items():
+            lines = sum(text.count("\n") + 1 for text in messages)
+            results[target][bucket] = measure(func, messages, lines, repeat)
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "seed": seed,
+            "messages_per_bucket": count,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "calibration_us": (calibration_before + calibrate(repeat)) / 2,
+        },
+        "results": results,
+    }
+
+
+def compare(current, baseline, tolerance):
+    """فهرست پسرفت‌ها نسبت به مبنا
+
+    زمان‌ها بر زمان حلقه کالیبراسیون هر اجرا تقسیم می‌شوند تا کند یا تند بودن ماشین
+    پسرفت حساب نشود.
+    """
+    scale = baseline["meta"].get("calibration_us", 1) / current["meta"].get("calibration_us", 1)
+    regressions = []
+    for target, buckets in current["results"].items():
+        for bucket, stats in buckets.items():
+            base = baseline["results"].get(target, {}).get(bucket)
+            if base is None:
+                continue
+            for key, factor in (("us_per_line", scale), ("alloc_kib_per_op", 1)):
+                value = stats[key] * factor
+                if base[key] and value > base[key] * (1 + tolerance):
+                    regressions.append(f"{target}/{bucket} {key}: {base[key]:.2f} -> {value:.2f} "
+                                       f"(+{value / base[key] - 1:.0%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--messages", type=int, default=100, help="تعداد پیام در هر بازه طول")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="مسیر JSON نتایج (پیش‌فرض benchmarks/results/analyzer-<commit>.json)")
+    parser.add_argument("--compare", help="JSON مبنا برای تشخیص پسرفت")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="حداکثر بدتر شدن مجاز نسبت به مبنا (روی ماشین‌های مشترک نویز تا ۲۰٪ عادی است)")
+    args = parser.parse_args()
+
+    report = run_suite(args.seed, args.messages, args.repeat)
+    for target, buckets in report["results"].items():
+        print_table(target, buckets)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"analyzer-{report['meta']['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nresults written to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) against {baseline['meta']['commit']}:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"no regressions against {baseline['meta']['commit']} (tolerance {args.tolerance:.0%})")
+
+
+if __name__ == "__main__":
+    main()
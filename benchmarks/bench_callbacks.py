@@ -0,0 +1,81 @@
+"""هزینه پیدا کردن هندلر callback: زنجیره if/elif قبلی در برابر CallbackRouter
+
+    python -m benchmarks.bench_callbacks
+
+برای هر تعداد دکمه، همان تعداد مقدار ثابت جعلی قبل از دکمه‌های واقعی ثبت می‌شود (بدترین
+حالت زنجیره if/elif که دکمه‌های جدید را اول بررسی می‌کند) و زمان پیدا کردن هندلر برای
+callback_dataهای واقعی ربات اندازه‌گیری می‌شود.
+"""
+import argparse
+import timeit
+
+from callback_router import CallbackRouter
+
+EXACT = ("make_harder", "make_easier", "adjust_rest", "save_workout", "export_pdf", "rewrite_pro")
+PREFIXES = ("rest_", "plan_", "settings_", "level_", "strength_")
+SAMPLES = ("make_harder", "rewrite_pro", "rest_90", "plan_strength", "settings_level", "level_advanced",
+           "strength_beginner")
+
+
+def legacy_chain(extra):
+    """مثل if/elif قبلی bot.py: مقایسه‌های ترتیبی و split دوباره در هر شاخه"""
+    exact = tuple(extra) + EXACT
+
+    def resolve(data):
+        for value in exact:
+            if data == value:
+                return value, ()
+        for prefix in PREFIXES:
+            if data.startswith(prefix):
+                return prefix, (data.split("_")[1],)
+        return None
+    return resolve
+
+
+def build_router(extra):
+    router = CallbackRouter()
+
+    async def handler(*args):
+        pass
+    for value in tuple(extra) + EXACT:
+        router.exact(value)(handler)
+    for prefix in PREFIXES:
+        router.prefix(prefix, int if prefix == "rest_" else str)(handler)
+    return router
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--number", type=int, default=20000)
+    args = parser.parse_args()
+
+    for buttons in (10, 100, 1000):
+        extra = [f"button_{i}" for i in range(buttons)]
+        legacy = legacy_chain(extra)
+        router = build_router(extra)
+        for data in SAMPLES:
+            assert legacy(data)[0] == router.resolve(data)[0], data
+
+        def run_legacy():
+            for data in SAMPLES:
+                legacy(data)
+
+        def run_router():
+            for data in SAMPLES:
+                router.resolve(data)
+
+        def run_router_cold():
+            # بدون cache نتایج: مسیر کامل dict + trie + parse
+            router._resolved.clear()
+            for data in SAMPLES:
+                router.resolve(data)
+
+        results = {}
+        for label, func in (("if/elif", run_legacy), ("router", run_router), ("router cold", run_router_cold)):
+            best = min(timeit.repeat(func, number=args.number, repeat=5)) / args.number / len(SAMPLES)
+            results[label] = best * 1e9
+        print(f"{buttons:>5} buttons  " + "  ".join(f"{label} {ns:9.1f} ns" for label, ns in results.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""مقایسه تأخیر هندلرها زیر بار همزمان: اتصال تازه برای هر کوئری در برابر استخر غیرهمگام
+
+اجرا (نیاز به یک PostgreSQL محلی دارد):
+    DATABASE_URL=postgresql://localhost/workout_bench DATABASE_SSLMODE=disable \\
+        python -m benchmarks.bench_db --requests 2000 --rate 400
+"""
+import argparse
+import asyncio
+import random
+import time
+from datetime import datetime
+
+import psycopg2
+from psycopg2.extras import RealDictCursor
+
+from benchmarks.common import latency_summary, print_table
+from config import DATABASE_URL, DATABASE_SSLMODE
+from database import Database
+
+
+class LegacyDatabase:
+    """پیاده‌سازی قبلی: یک اتصال TCP/TLS برای هر کوئری و اجرای همگام داخل coroutine"""
+
+    def __init__(self, database_url):
+        self.database_url = database_url
+
+    def get_connection(self):
+        return psycopg2.connect(self.database_url, sslmode=DATABASE_SSLMODE)
+
+    async def add_user(self, user_id, username, first_name, last_name):
+        conn = self.get_connection()
+        cur = conn.cursor()
+        cur.execute("""
+            INSERT INTO users (user_id, username, first_name, last_name, last_activity)
+            VALUES (%s, %s, %s, %s, %s)
+            ON CONFLICT (user_id) DO UPDATE SET
+            last_activity = EXCLUDED.last_activity
+        """, (user_id, username, first_name, last_name, datetime.now()))
+        cur.execute("""
+            INSERT INTO user_settings (user_id)
+            VALUES (%s)
+            ON CONFLICT (user_id) DO NOTHING
+        """, (user_id,))
+        conn.commit()
+        cur.close()
+        conn.close()
+        return True
+
+    async def get_user_history(self, user_id, limit=10):
+        conn = self.get_connection()
+        cur = conn.cursor(cursor_factory=RealDictCursor)
+        cur.execute("""
+            SELECT * FROM workout_history
+            WHERE user_id = %s
+            ORDER BY workout_date DESC
+            LIMIT %s
+        """, (user_id, limit))
+        history = cur.fetchall()
+        cur.close()
+        conn.close()
+        return history
+
+
+async def handler(db, user_id):
+    """شبیه‌سازی start_command و analyze_my_workout"""
+    if random.random() < 0.5:
+        await db.add_user(user_id, f"user{user_id}", "bench", None)
+    else:
+        await db.get_user_history(user_id, limit=1)
+
+
+async def run_load(db, requests, rate, users):
+    """بار open-loop: تأخیر از زمان ورود برنامه‌ریزی‌شده تا پایان هندلر اندازه‌گیری می‌شود"""
+    latencies = []
+
+    async def one(user_id, arrival):
+        await handler(db, user_id)
+        latencies.append(time.perf_counter() - arrival)
+
+    tasks = []
+    start = time.perf_counter()
+    for i in range(requests):
+        arrival = start + i / rate
+        delay = arrival - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(one(random.randint(1, users), arrival)))
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - start
+    summary = latency_summary(latencies)
+    summary["throughput_rps"] = requests / elapsed
+    return summary
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--rate", type=float, default=400, help="درخواست در ثانیه")
+    parser.add_argument("--users", type=int, default=500)
+    args = parser.parse_args()
+
+    random.seed(1)
+    pooled = Database(DATABASE_URL)
+    await pooled.connect()
+    # کاربران را از قبل بساز تا هر دو حالت روی داده یکسان کار کنند
+    await asyncio.gather(*(pooled.add_user(i, f"user{i}", "bench", None) for i in range(1, args.users + 1)))
+
+    results = {
+        "legacy (connect per query)": await run_load(LegacyDatabase(DATABASE_URL), args.requests, args.rate, args.users),
+        "pooled (async)": await run_load(pooled, args.requests, args.rate, args.users),
+    }
+    await pooled.close()
+    print_table(f"handler latency, {args.requests} requests @ {args.rate:.0f}/s", results)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,128 @@
+"""تأخیر get_state/set_state با ۱۰۰ هزار کاربر فعال
+
+    python -m benchmarks.bench_fsm --users 100000 --writers 3
+
+با --writers، SQLiteStorage یک بار دیگر هم اندازه گرفته می‌شود وقتی این تعداد پردازه دیگر هم‌زمان
+روی همان فایل می‌نویسند: concurrency کاربر هم‌زمان در این پردازه get/set می‌کنند و تأخیر
+event loop (دیرتر بیدار شدن یک تسک ۱ میلی‌ثانیه‌ای) هم گزارش می‌شود.
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+
+from aiogram.contrib.fsm_storage.memory import MemoryStorage
+
+from benchmarks.common import latency_summary, print_table
+from fsm_storage import BoundedMemoryStorage, SQLiteStorage
+
+STATE = "WorkoutStates:waiting_for_workout"
+
+
+async def measure(storage, users, operations, rng):
+    for user in range(users):
+        await storage.set_state(chat=user, user=user, state=STATE)
+
+    gets, sets = [], []
+    for _ in range(operations):
+        user = rng.randrange(users * 2)  # نیمی از کاربران حالتی ندارند
+        started = time.perf_counter()
+        await storage.get_state(chat=user, user=user)
+        gets.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await storage.set_state(chat=user, user=user, state=STATE if rng.random() < 0.5 else None)
+        sets.append(time.perf_counter() - started)
+    return {"get_state": latency_summary(gets), "set_state": latency_summary(sets)}
+
+
+def write_forever(path, users, stop):
+    """پردازه نویسنده دیگر روی همان فایل SQLite"""
+    async def run():
+        storage = SQLiteStorage(path, max_keys=users * 2)
+        rng = random.Random(os.getpid())
+        while not stop.is_set():
+            user = rng.randrange(users)
+            await storage.set_state(chat=user, user=user, state=STATE if rng.random() < 0.5 else None)
+        await storage.close()
+
+    asyncio.run(run())
+
+
+async def loop_lag(samples, interval=0.001):
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(interval)
+        samples.append(loop.time() - started - interval)
+
+
+async def measure_shared(path, users, operations, writers, concurrency):
+    storage = SQLiteStorage(path, max_keys=users * 2)
+    for user in range(users):
+        await storage.set_state(chat=user, user=user, state=STATE)
+
+    context = multiprocessing.get_context("fork")
+    stop = context.Event()
+    processes = [context.Process(target=write_forever, args=(path, users, stop)) for _ in range(writers)]
+    for process in processes:
+        process.start()
+
+    gets, sets, lags = [], [], []
+
+    async def user_loop(rng, count):
+        for _ in range(count):
+            user = rng.randrange(users * 2)
+            started = time.perf_counter()
+            await storage.get_state(chat=user, user=user)
+            gets.append(time.perf_counter() - started)
+
+            started = time.perf_counter()
+            await storage.set_state(chat=user, user=user, state=STATE if rng.random() < 0.5 else None)
+            sets.append(time.perf_counter() - started)
+
+    lag_task = asyncio.create_task(loop_lag(lags))
+    try:
+        await asyncio.gather(*(user_loop(random.Random(i), operations // concurrency) for i in range(concurrency)))
+        # نمونه آخر؛ اگر loop تمام مدت بلاک بوده همین یک نمونه است
+        await asyncio.sleep(0.01)
+    finally:
+        lag_task.cancel()
+        stop.set()
+        for process in processes:
+            process.join()
+        await storage.close()
+    return {"get_state": latency_summary(gets), "set_state": latency_summary(sets), "loop_lag": latency_summary(lags)}
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=100000)
+    parser.add_argument("--operations", type=int, default=50000)
+    parser.add_argument("--writers", type=int, default=0, help="پردازه‌های دیگری که هم‌زمان روی فایل SQLite می‌نویسند")
+    parser.add_argument("--concurrency", type=int, default=50, help="کاربران هم‌زمان در حالت --writers")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        storages = {
+            "aiogram MemoryStorage": MemoryStorage(),
+            "BoundedMemoryStorage": BoundedMemoryStorage(max_keys=args.users * 2),
+            "SQLiteStorage": SQLiteStorage(os.path.join(tmp, "fsm.sqlite3"), max_keys=args.users * 2),
+        }
+        for name, storage in storages.items():
+            results = await measure(storage, args.users, args.operations, random.Random(3))
+            print_table(f"{name}, {args.users} active users", results)
+            await storage.close()
+
+        if args.writers:
+            results = await measure_shared(os.path.join(tmp, "shared.sqlite3"), args.users, args.operations,
+                                           args.writers, args.concurrency)
+            print_table(f"SQLiteStorage, {args.users} active users, {args.writers} other writer processes, "
+                        f"{args.concurrency} concurrent users", results)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
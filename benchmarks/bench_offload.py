@@ -0,0 +1,81 @@
+"""توقف event loop هنگام تحلیل پیام‌های بزرگ: تحلیل درجا در برابر استخر پردازه WorkPool
+
+    python -m benchmarks.bench_offload --users 40 --lines 500
+
+برای هر حالت users پیام متفاوت lines خطی هم‌زمان تحلیل می‌شود و یک تسک جدا هر میلی‌ثانیه
+بیدار می‌شود؛ تأخیر بیدار شدن آن همان زمانی است که پیام بقیه کاربران منتظر می‌ماند.
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from ai_analyzer import AIAnalyzer
+from analysis_cache import normalize_workout_text
+from analysis_pipeline import AnalysisPipeline
+from workout_analyzer import WorkoutAnalyzer
+from work_pool import WorkPool
+
+NAMES = ("اسکوات", "شنا", "دویدن", "پلانک", "کرانچ", "بارفیکس", "لانژ", "طناب")
+
+pipeline = AnalysisPipeline(WorkoutAnalyzer(), AIAnalyzer())
+
+
+def analyze(text):
+    return pipeline.analyze(text)
+
+
+async def probe(lags, stop):
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + 0.001
+        await asyncio.sleep(0.001)
+        lags.append(loop.time() - expected)
+
+
+async def measure(label, texts, run):
+    lags = []
+    stop = asyncio.Event()
+    prober = asyncio.create_task(probe(lags, stop))
+    await asyncio.sleep(0.01)
+    started = time.perf_counter()
+    await asyncio.gather(*(run(text) for text in texts))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await prober
+    lags.sort()
+    print(f"{label:<8} total {elapsed * 1000:7.1f} ms  loop lag p50 {lags[len(lags) // 2] * 1000:5.1f} ms"
+          f"  max {lags[-1] * 1000:6.1f} ms")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=40)
+    parser.add_argument("--lines", type=int, default=500)
+    parser.add_argument("--processes", type=int, default=2)
+    args = parser.parse_args()
+
+    texts = [
+        normalize_workout_text("\n".join(f"{random.choice(NAMES)} {random.randint(5, 40)}" for _ in range(args.lines)))
+        for _ in range(args.users)
+    ]
+    pool = WorkPool(processes=args.processes, max_pending=args.users)
+    pool.start()
+    try:
+        async def inline(text):
+            # مثل هندلر: هر پیام در تسک خودش و بدون await در وسط تحلیل
+            await asyncio.sleep(0)
+            analyze(text)
+
+        async def offloaded(text):
+            await pool.run_cpu(analyze, text)
+
+        await offloaded(texts[0])
+        await measure("inline", texts, inline)
+        await measure("pool", texts, offloaded)
+    finally:
+        await pool.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
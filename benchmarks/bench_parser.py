@@ -0,0 +1,114 @@
+"""مقایسه پارسر تک‌اسکن با پیاده‌سازی قبلی parse_workout
+
+ابتدا خروجی دو پیاده‌سازی روی یک پیکره رگرسیون مقایسه می‌شود، سپس توان عملیاتی
+روی پیام‌های چندخطی بزرگ اندازه‌گیری می‌شود:
+    python -m benchmarks.bench_parser
+"""
+import argparse
+import random
+import re
+import timeit
+
+from workout_parser import parse_exercises
+
+REGRESSION_CORPUS = [
+    "دراز نشست=۲۰\nشنا=۱۰\nاسکات=۵\nطناب=۳ دقیقه",
+    "دراز نشست=20\nشنا=10\nاسکات=5",
+    "پلانک:۶۰ ثانیه\nکرانچ:15",
+    "شنا 10 تکرار\nاسکات 20\nدویدن 15 دقیقه",
+    "شنا ۱۰ ۲۰\nشنا ۱۰ 20",
+    "  شنا=۱۰  \n\n\n  اسکات:12 بار",
+    "۱. شنا=۱۰\n۲. اسکات=۱۵",
+    "شنا 10 تکرار، دراز نشست=20",
+    "push up=10\nsquat 20",
+    "x  10\n  =5\na :5",
+    "بارفیکس=۸تکرار\nپرس سینه=12 تکرار",
+    "امروز خیلی خسته بودم\nفقط کمی نرمش",
+    "طناب زدن=5دقیقه\nپله 10 دقیقه",
+    "شنا=۱۰\r\nاسکات=۲۰\r\n",
+    "",
+]
+
+# ورودی‌هایی که پیاده‌سازی قبلی روی آن‌ها یا چیزی نمی‌فهمید یا ValueError می‌داد
+NEW_ONLY_CORPUS = {
+    "طناب = 3 دقیقه": [("طناب", 3, "دقیقه")],
+    "شنا = ۱۰": [("شنا", 10, "تکرار")],
+    "اسکات : 15 بار": [("اسکات", 15, "بار")],
+}
+
+NAMES = ["شنا", "دراز نشست", "اسکات", "پرس سینه", "طناب", "دویدن", "پلانک", "بارفیکس", "کرانچ", "لانگز"]
+UNITS = ["", " دقیقه", " ثانیه", " تکرار", " بار", "دقیقه"]
+SEPARATORS = ["=", ":", " ", "="]
+PERSIAN_DIGITS = str.maketrans("0123456789", "۰۱۲۳۴۵۶۷۸۹")
+
+
+def legacy_parse(text):
+    """پیاده‌سازی قبلی WorkoutAnalyzer.parse_workout (بدون تعیین دسته)"""
+    exercises = []
+    for line in text.strip().split('\n'):
+        line = line.strip()
+        if not line:
+            continue
+        patterns = [
+            r'([\u0600-\u06FF\s]+)[=:](\d+)(?:\s*(دقیقه|ثانیه|تکرار|بار))?',
+            r'([\u0600-\u06FF\s]+)\s+(\d+)\s*(دقیقه|ثانیه|تکرار|بار)?',
+            r'طناب\s*=\s*(\d+)\s*(دقیقه)',
+        ]
+        for pattern in patterns:
+            match = re.search(pattern, line)
+            if match:
+                name = match.group(1).strip()
+                value = int(match.group(2))
+                unit = match.group(3) if len(match.groups()) > 2 else 'تکرار'
+                exercises.append((name, value, unit if unit else 'تکرار'))
+                break
+    return exercises
+
+
+def random_line(rng):
+    value = str(rng.randint(1, 120))
+    if rng.random() < 0.5:
+        value = value.translate(PERSIAN_DIGITS)
+    roll = rng.random()
+    if roll < 0.1:
+        return "امروز حالم خوب بود و تمرین کردم"
+    if roll < 0.15:
+        return f"{rng.choice(['push up', 'squat', 'plank'])} {value}"
+    return f"{rng.choice(NAMES)}{rng.choice(SEPARATORS)}{value}{rng.choice(UNITS)}"
+
+
+def random_message(rng, lines):
+    return "\n".join(random_line(rng) for _ in range(lines))
+
+
+def check_regression(rng):
+    corpus = list(REGRESSION_CORPUS) + [random_message(rng, rng.randint(1, 30)) for _ in range(500)]
+    for text in corpus:
+        expected = legacy_parse(text)
+        actual = parse_exercises(text)
+        assert actual == expected, f"mismatch for {text!r}: {actual} != {expected}"
+    for text, expected in NEW_ONLY_CORPUS.items():
+        assert parse_exercises(text) == expected, text
+    print(f"regression corpus: {len(corpus)} messages identical")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lines", type=int, default=200)
+    parser.add_argument("--number", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    check_regression(rng)
+
+    message = random_message(rng, args.lines)
+    legacy = min(timeit.repeat(lambda: legacy_parse(message), number=args.number, repeat=5))
+    compiled = min(timeit.repeat(lambda: parse_exercises(message), number=args.number, repeat=5))
+    for label, seconds in (("legacy", legacy), ("single-pass", compiled)):
+        per_message = seconds / args.number
+        print(f"{label:<12} {1 / per_message:10.1f} msg/s  {per_message / args.lines * 1e6:8.2f} us/line")
+    print(f"speedup: {legacy / compiled:.2f}x on {args.lines}-line messages")
+
+
+if __name__ == "__main__":
+    main()
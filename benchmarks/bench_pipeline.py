@@ -0,0 +1,83 @@
+"""مقایسه AnalysisPipeline با دنباله قبلی فراخوانی‌ها در process_workout
+
+    python -m benchmarks.bench_pipeline
+"""
+import argparse
+import random
+import timeit
+
+from ai_analyzer import AIAnalyzer
+from analysis_pipeline import AnalysisPipeline
+from benchmarks.bench_parser import random_message
+from workout_analyzer import WorkoutAnalyzer
+
+
+def legacy_sequence(wa, ai, text):
+    """همان فراخوانی‌هایی که process_workout قبلاً انجام می‌داد"""
+    exercises = wa.parse_workout(text)
+    if not exercises:
+        return None
+    volume = wa.calculate_volume(exercises)
+    calories = wa.calculate_calories(exercises)
+    goal = wa.detect_goal(exercises, volume)
+    difficulty = wa.estimate_difficulty(volume)
+    rest_time = wa.suggest_rest_time(exercises, difficulty)
+    imbalances = wa.detect_imbalance(exercises)
+    improvements = wa.suggest_improvement(exercises, difficulty)
+    overtraining = wa.check_overtraining(exercises, difficulty)
+    ai_analysis = ai.analyze_text(text)
+    return {
+        "exercises": [(ex['name'], ex['value'], ex['unit'], ex['category']) for ex in exercises],
+        "volume": volume,
+        "calories": calories,
+        "goal": goal,
+        "difficulty": difficulty,
+        "rest_time": rest_time,
+        "imbalances": imbalances,
+        "overtraining": overtraining,
+        "improvements": improvements,
+        "suggestions": ai_analysis["suggestions"],
+    }
+
+
+def compare(pipeline, wa, ai, corpus):
+    """فیلدهای WorkoutAnalyzer باید دقیقاً برابر باشند؛ پیشنهادهای هوشمند فقط شمارش می‌شوند"""
+    same_suggestions = 0
+    for text in corpus:
+        expected = legacy_sequence(wa, ai, text)
+        report = pipeline.analyze(text)
+        if expected is None:
+            assert report is None, text
+            same_suggestions += 1
+            continue
+        for field in ("volume", "calories", "goal", "difficulty", "rest_time", "improvements"):
+            assert getattr(report, field) == expected[field], (field, text)
+        assert [tuple(ex) for ex in report.exercises] == expected["exercises"], text
+        assert list(report.imbalances) == expected["imbalances"], text
+        assert list(report.overtraining) == expected["overtraining"], text
+        same_suggestions += list(report.suggestions) == expected["suggestions"]
+    print(f"{len(corpus)} messages: analyzer fields identical, "
+          f"smart suggestions identical for {same_suggestions / len(corpus):.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lines", type=int, nargs="+", default=[4, 20, 200])
+    parser.add_argument("--number", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(11)
+    wa, ai = WorkoutAnalyzer(), AIAnalyzer()
+    pipeline = AnalysisPipeline(wa, ai)
+    compare(pipeline, wa, ai, [random_message(rng, rng.randint(1, 30)) for _ in range(500)])
+
+    for lines in args.lines:
+        message = random_message(rng, lines)
+        legacy = min(timeit.repeat(lambda: legacy_sequence(wa, ai, message), number=args.number, repeat=5))
+        fused = min(timeit.repeat(lambda: pipeline.analyze(message), number=args.number, repeat=5))
+        print(f"{lines:>4} lines: legacy {legacy / args.number * 1e6:9.1f} us  "
+              f"pipeline {fused / args.number * 1e6:9.1f} us  speedup {legacy / fused:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
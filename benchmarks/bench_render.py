@@ -0,0 +1,140 @@
+"""زمان ساخت پاسخ‌ها: لایه responses در برابر ساختن دوباره در هر هندلر
+
+    python -m benchmarks.bench_render
+
+زمان «ساخت پاسخ» شامل آماده‌سازی reply_markup برای ارسال (کاری که aiogram با
+prepare_arg انجام می‌دهد) هم هست. قبل از اندازه‌گیری، برابری متن و کیبوردها بررسی می‌شود.
+"""
+import argparse
+import json
+import random
+import timeit
+
+from aiogram.types import ReplyKeyboardMarkup, KeyboardButton, InlineKeyboardMarkup, InlineKeyboardButton
+from aiogram.utils.payload import prepare_arg
+
+import responses
+from analysis_pipeline import AnalysisPipeline
+from benchmarks.corpus import CorpusGenerator
+
+
+def legacy_main_keyboard():
+    keyboard = ReplyKeyboardMarkup(resize_keyboard=True, row_width=2)
+    keyboard.add(
+        KeyboardButton("🏋 ثبت برنامه تمرینی"),
+        KeyboardButton("📊 تحلیل تمرین من"),
+        KeyboardButton("📅 ساخت برنامه هفتگی"),
+        KeyboardButton("⚡ ارتقای تمرین"),
+        KeyboardButton("📉 کاهش وزن هوشمند"),
+        KeyboardButton("📈 افزایش قدرت"),
+        KeyboardButton("🧠 راهنمای تمرین اصولی"),
+        KeyboardButton("⚙ تنظیمات")
+    )
+    return keyboard
+
+
+def legacy_analysis_keyboard():
+    keyboard = InlineKeyboardMarkup(row_width=2)
+    keyboard.add(
+        InlineKeyboardButton("🔥 سخت‌ترش کن", callback_data="make_harder"),
+        InlineKeyboardButton("🧊 سبک‌ترش کن", callback_data="make_easier"),
+        InlineKeyboardButton("⏱ تنظیم زمان استراحت", callback_data="adjust_rest"),
+        InlineKeyboardButton("📋 ذخیره این تمرین", callback_data="save_workout"),
+        InlineKeyboardButton("📤 خروجی PDF", callback_data="export_pdf"),
+        InlineKeyboardButton("🔄 بازنویسی حرفه‌ای", callback_data="rewrite_pro")
+    )
+    return keyboard
+
+
+def legacy_plan_reply(plan_type):
+    """دیکشنری برنامه‌ها مثل قبل در هر callback ساخته می‌شود (رشته‌ها ثابت‌اند، فقط دیکشنری ساخته می‌شود)"""
+    plans = dict(responses.WEEKLY_PLANS)
+    return plans.get(plan_type, "برنامه مورد نظر یافت نشد.")
+
+
+def legacy_render_report(report):
+    result = f"""🔥 **تحلیل تمرین شما:**
+
+📋 **تمرینات ثبت شده:**
+"""
+    for ex in report.exercises:
+        result += f"• {ex.name}: {ex.value} {ex.unit} (دسته: {ex.category})\n"
+
+    result += f"""
+📊 **آمار کلی:**
+• حجم کل: {report.volume}
+• کالری تقریبی: {report.calories} کالری
+• هدف تمرین: {report.goal}
+• سطح سختی: {report.difficulty}
+
+⏱ **زمان استراحت پیشنهادی:**
+• بین حرکات: {report.rest_time} ثانیه
+💧 آب: هر ۱۵ دقیقه
+
+"""
+
+    if report.imbalances:
+        result += "⚠ **هشدارهای تعادل:**\n"
+        for w in report.imbalances:
+            result += f"• {w}\n"
+        result += "\n"
+
+    if report.overtraining:
+        result += "⚠ **هشدار تمرین بیش از حد:**\n"
+        for w in report.overtraining:
+            result += f"• {w}\n"
+        result += "\n"
+
+    result += f"📈 **پیشنهاد بهینه‌سازی:**\n{report.improvements}\n\n"
+
+    if report.suggestions:
+        result += "🧠 **پیشنهادات هوشمند:**\n"
+        for s in report.suggestions:
+            result += f"• {s}\n"
+
+    return result
+
+
+def check_equivalence(reports):
+    assert json.loads(responses.MAIN_KEYBOARD) == legacy_main_keyboard().to_python()
+    assert json.loads(responses.ANALYSIS_KEYBOARD) == legacy_analysis_keyboard().to_python()
+    for report in reports:
+        assert responses.render_report(report) == legacy_render_report(report), report
+    print(f"keyboards and {len(reports)} reports identical")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--number", type=int, default=2000)
+    args = parser.parse_args()
+
+    generator = CorpusGenerator(13)
+    pipeline = AnalysisPipeline()
+    reports = [report for report in (pipeline.analyze(generator.message(generator.rng.randint(1, 30)))
+                                     for _ in range(300)) if report is not None]
+    check_equivalence(reports)
+
+    report = random.Random(13).choice([r for r in reports if len(r.exercises) >= 8])
+    cases = (
+        ("main keyboard",
+         lambda: prepare_arg(legacy_main_keyboard()),
+         lambda: prepare_arg(responses.MAIN_KEYBOARD)),
+        ("analysis report",
+         lambda: legacy_render_report(report),
+         lambda: responses.render_report(report)),
+        ("analysis report + keyboard",
+         lambda: (legacy_render_report(report), prepare_arg(legacy_analysis_keyboard())),
+         lambda: (responses.render_report(report), prepare_arg(responses.ANALYSIS_KEYBOARD))),
+        ("weekly plan",
+         lambda: legacy_plan_reply("strength"),
+         lambda: responses.WEEKLY_PLANS.get("strength", responses.PLAN_NOT_FOUND)),
+    )
+    for label, legacy, prebuilt in cases:
+        before = min(timeit.repeat(legacy, number=args.number, repeat=5)) / args.number
+        after = min(timeit.repeat(prebuilt, number=args.number, repeat=5)) / args.number
+        print(f"{label:<28} legacy {before * 1e6:8.2f} us  prebuilt {after * 1e6:8.2f} us  "
+              f"speedup {before / after:6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
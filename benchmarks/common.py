@@ -0,0 +1,31 @@
+import math
+from typing import Dict, List
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """صدک pct از نمونه‌ها (روش nearest-rank)"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def latency_summary(samples: List[float]) -> Dict[str, float]:
+    """خلاصه تأخیر بر حسب میلی‌ثانیه"""
+    return {
+        "count": len(samples),
+        "p50_ms": percentile(samples, 50) * 1000,
+        "p99_ms": percentile(samples, 99) * 1000,
+        "max_ms": (max(samples) if samples else 0.0) * 1000,
+    }
+
+
+def print_table(title: str, rows: Dict[str, Dict[str, float]]):
+    print(f"\n== {title} ==")
+    for name, stats in rows.items():
+        cells = "  ".join(
+            f"{key}={value:.3f}" if isinstance(value, float) else f"{key}={value}"
+            for key, value in stats.items()
+        )
+        print(f"{name:<28} {cells}")
@@ -0,0 +1,86 @@
+"""مولد پیام‌های تمرینی مصنوعی ولی واقع‌گرایانه با seed ثابت
+
+نام حرکات از واژه‌نامه (فارسی و معادل انگلیسی)، ارقام انگلیسی/فارسی/عربی، همه واحدها،
+جداکننده‌های مختلف و خطوط نویزی که پارس نمی‌شوند. با seed یکسان همیشه همان پیکره ساخته
+می‌شود تا نتایج بنچمارک بین کامیت‌ها قابل مقایسه باشد.
+"""
+import random
+from typing import List
+
+from exercise_lexicon import get_lexicon
+from workout_parser import UNITS
+
+PERSIAN_DIGITS = str.maketrans("0123456789", "۰۱۲۳۴۵۶۷۸۹")
+ARABIC_DIGITS = str.maketrans("0123456789", "٠١٢٣٤٥٦٧٨٩")
+SEPARATORS = ("=", ":", " ", " = ", ": ", "  ")
+NOISE = (
+    "امروز حالم خوب بود و تمرین کردم",
+    "گرم کردن",
+    "استراحت بین ست‌ها",
+    "🔥💪",
+    "ست دوم سخت‌تر بود!",
+    "---",
+    "",
+    "today was leg day",
+    "۳ ست",
+    "آب خوردم ۲ لیوان",
+)
+
+# سهم هر نوع خط در پیکره
+NOISE_RATE = 0.12
+ENGLISH_RATE = 0.08
+MIXED_RATE = 0.05
+
+
+def exercise_names():
+    """نام‌های فارسی و انگلیسی حرکات از واژه‌نامه"""
+    lexicon = get_lexicon()
+    persian, english = set(), set()
+    for keywords in list(lexicon.categories.values()) + list(lexicon.aliases.values()):
+        for keyword in keywords:
+            (english if keyword.isascii() else persian).add(keyword)
+    persian.add("لانگز")
+    return sorted(persian), sorted(english)
+
+
+class CorpusGenerator:
+    def __init__(self, seed: int = 42):
+        self.rng = random.Random(seed)
+        self.persian_names, self.english_names = exercise_names()
+        self.units = ("",) + tuple(UNITS)
+
+    def value(self) -> str:
+        value = str(self.rng.choice((self.rng.randint(1, 30), self.rng.randint(1, 120))))
+        roll = self.rng.random()
+        if roll < 0.4:
+            return value.translate(PERSIAN_DIGITS)
+        if roll < 0.5:
+            return value.translate(ARABIC_DIGITS)
+        return value
+
+    def unit(self) -> str:
+        unit = self.rng.choice(self.units)
+        return f"{self.rng.choice((' ', ''))}{unit}" if unit else ""
+
+    def line(self) -> str:
+        rng = self.rng
+        roll = rng.random()
+        if roll < NOISE_RATE:
+            return rng.choice(NOISE)
+        if roll < NOISE_RATE + ENGLISH_RATE:
+            name = rng.choice(self.english_names)
+        elif roll < NOISE_RATE + ENGLISH_RATE + MIXED_RATE:
+            name = f"{rng.choice(self.persian_names)} ({rng.choice(self.english_names)})"
+        else:
+            name = rng.choice(self.persian_names)
+        return f"{name}{rng.choice(SEPARATORS)}{self.value()}{self.unit()}"
+
+    def message(self, lines: int) -> str:
+        return "\n".join(self.line() for _ in range(lines))
+
+    def corpus(self, count: int, min_lines: int = 1, max_lines: int = 200) -> List[str]:
+        return [self.message(self.rng.randint(min_lines, max_lines)) for _ in range(count)]
+
+
+def generate_corpus(count: int, seed: int = 42, min_lines: int = 1, max_lines: int = 200) -> List[str]:
+    return CorpusGenerator(seed).corpus(count, min_lines, max_lines)
@@ -0,0 +1,297 @@
+"""جایگزین محلی Bot API تلگرام برای تست بار
+
+getUpdates (long polling با offset)، setWebhook/deleteWebhook، sendMessage، sendDocument و
+answerCallbackQuery را شبیه‌سازی می‌کند و هر متد دیگری را با ok=True جواب می‌دهد. بعد از setWebhook
+آپدیت‌ها مثل تلگرام با حداکثر max_connections درخواست هم‌زمان به آدرس وب‌هوک POST می‌شوند و
+آپدیتی که جواب 2xx نگیرد یک ثانیه بعد دوباره فرستاده می‌شود؛ secret_token در سرآیند
+X-Telegram-Bot-Api-Secret-Token می‌آید. درایور با push_message و push_callback آپدیت می‌سازد و
+با expect منتظر جواب ربات در همان چت می‌ماند. با flood_limits مثل تلگرام برای sendMessageهای بیش از
+حد مجاز در یک ثانیه (سراسری یا در یک چت) پاسخ 429 با retry_after برمی‌گرداند.
+
+    python -m benchmarks.fake_telegram --port 8081 --flood-limits 30 1
+"""
+import argparse
+import asyncio
+import time
+from collections import defaultdict, deque
+from typing import Deque, Dict, List
+import logging
+
+from aiohttp import web, ClientSession, ClientError
+
+logger = logging.getLogger(__name__)
+
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "moraby", "username": "moraby_bot"}
+
+
+class FakeTelegramAPI:
+    def __init__(self):
+        self._updates: Deque[dict] = deque()
+        self._next_update_id = 1
+        self._next_message_id = 1
+        self._new_updates = asyncio.Event()
+        # chat_id -> [(methods, future)] منتظرهای جواب ربات
+        self._waiters: Dict[int, List] = defaultdict(list)
+        self.calls: Dict[str, int] = defaultdict(int)
+        self.sent: Dict[int, List[str]] = defaultdict(list)
+        self.record_text = False
+        # callback_query_id -> chat_id برای پیدا کردن چت در answerCallbackQuery
+        self._callback_chats: Dict[str, int] = {}
+        # (حداکثر سراسری، حداکثر هر چت) پیام در ثانیه؛ None یعنی بدون محدودیت
+        self.flood_limits = None
+        self._sent_times: Deque[float] = deque()
+        self._chat_sent_times: Dict[int, Deque[float]] = defaultdict(deque)
+        self.flood_errors = 0
+        # file_id -> محتوای سندهای آپلودشده
+        self.documents: Dict[str, bytes] = {}
+        self.webhook_url = ""
+        self.webhook_secret = None
+        self._deliveries: List[asyncio.Task] = []
+        self._session = None
+
+    def app(self) -> web.Application:
+        # سقف آپلود سند در Bot API تلگرام ۵۰ مگابایت است
+        app = web.Application(client_max_size=50 * 1024 * 1024)
+        app.router.add_route("*", "/bot{token}/{method}", self.handle)
+        app.on_cleanup.append(lambda _: self._stop_webhook())
+        return app
+
+    # سمت درایور
+    def _push(self, payload: dict) -> int:
+        update_id = self._next_update_id
+        self._next_update_id += 1
+        self._updates.append(dict(payload, update_id=update_id))
+        self._new_updates.set()
+        return update_id
+
+    def push_message(self, user_id: int, text: str, first_name: str = "کاربر") -> int:
+        user = {"id": user_id, "is_bot": False, "first_name": first_name, "username": f"user{user_id}"}
+        message = {
+            "message_id": self._message_id(),
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private", "first_name": first_name},
+            "from": user,
+            "text": text,
+        }
+        if text.startswith("/"):
+            command = text.split()[0]
+            message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(command)}]
+        return self._push({"message": message})
+
+    def push_callback(self, user_id: int, data: str) -> int:
+        user = {"id": user_id, "is_bot": False, "first_name": "کاربر"}
+        callback_id = str(self._next_update_id)
+        self._callback_chats[callback_id] = user_id
+        message = {
+            "message_id": self._message_id(),
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": BOT_USER,
+            "text": "...",
+        }
+        return self._push({"callback_query": {
+            "id": callback_id,
+            "chat_instance": str(user_id),
+            "from": user,
+            "message": message,
+            "data": data,
+        }})
+
+    def expect(self, chat_id: int, methods=("sendMessage",)) -> asyncio.Future:
+        """Future ای که با اولین فراخوانی یکی از methods برای این چت کامل می‌شود"""
+        future = asyncio.get_running_loop().create_future()
+        self._waiters[chat_id].append((methods, future))
+        return future
+
+    @property
+    def pending_updates(self) -> int:
+        return len(self._updates)
+
+    # سمت ربات
+    def _message_id(self) -> int:
+        self._next_message_id += 1
+        return self._next_message_id
+
+    def _notify(self, chat_id: int, method: str, result):
+        waiters = self._waiters.get(chat_id)
+        if not waiters:
+            return
+        remaining = []
+        for methods, future in waiters:
+            if future.done():
+                continue
+            if method in methods:
+                future.set_result((method, result))
+            else:
+                remaining.append((methods, future))
+        if remaining:
+            self._waiters[chat_id] = remaining
+        else:
+            del self._waiters[chat_id]
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        if request.content_type == "application/json":
+            params = await request.json()
+        else:
+            params = dict(await request.post())
+        self.calls[method] += 1
+        if method == "sendMessage" and self.flood_limits and self._flooded(int(params["chat_id"])):
+            self.flood_errors += 1
+            return web.json_response({
+                "ok": False, "error_code": 429, "description": "Too Many Requests: retry after 1",
+                "parameters": {"retry_after": 1},
+            }, status=429)
+        handler = getattr(self, f"_method_{method.lower()}", None)
+        result = await handler(params) if handler else True
+        return web.json_response({"ok": True, "result": result})
+
+    def _flooded(self, chat_id: int) -> bool:
+        """پنجره لغزان یک‌ثانیه‌ای؛ پیام ردشده در شمارش حساب نمی‌شود"""
+        now = time.monotonic()
+        global_limit, chat_limit = self.flood_limits
+        chat_times = self._chat_sent_times[chat_id]
+        for times in (self._sent_times, chat_times):
+            while times and times[0] <= now - 1:
+                times.popleft()
+        if len(self._sent_times) >= global_limit or len(chat_times) >= chat_limit:
+            return True
+        self._sent_times.append(now)
+        chat_times.append(now)
+        return False
+
+    async def _method_getme(self, params):
+        return BOT_USER
+
+    async def _method_getwebhookinfo(self, params):
+        return {"url": self.webhook_url, "has_custom_certificate": False, "pending_update_count": len(self._updates)}
+
+    async def _method_setwebhook(self, params):
+        await self._stop_webhook()
+        if str(params.get("drop_pending_updates")).lower() == "true":
+            self._updates.clear()
+        self.webhook_url = params.get("url", "")
+        self.webhook_secret = params.get("secret_token")
+        if self.webhook_url:
+            self._session = ClientSession()
+            self._deliveries = [
+                asyncio.create_task(self._deliver()) for _ in range(int(params.get("max_connections") or 40))
+            ]
+        return True
+
+    async def _method_deletewebhook(self, params):
+        await self._stop_webhook()
+        return True
+
+    async def _stop_webhook(self):
+        self.webhook_url = ""
+        for task in self._deliveries:
+            task.cancel()
+        if self._deliveries:
+            await asyncio.wait(self._deliveries)
+        self._deliveries = []
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def _deliver(self):
+        while True:
+            if not self._updates:
+                self._new_updates.clear()
+                await self._new_updates.wait()
+                continue
+            update = self._updates.popleft()
+            try:
+                headers = {"X-Telegram-Bot-Api-Secret-Token": self.webhook_secret} if self.webhook_secret else None
+                async with self._session.post(self.webhook_url, json=update, headers=headers) as response:
+                    await response.read()
+                    delivered = 200 <= response.status < 300
+            except ClientError:
+                delivered = False
+            if not delivered:
+                self._updates.appendleft(update)
+                await asyncio.sleep(1)
+
+    async def _method_getupdates(self, params):
+        offset = int(params.get("offset") or 0)
+        limit = int(params.get("limit") or 100)
+        timeout = float(params.get("timeout") or 0)
+        if offset < 0:
+            return []
+        # آپدیت‌های تأییدشده (id کمتر از offset) حذف می‌شوند
+        while self._updates and self._updates[0]["update_id"] < offset:
+            self._updates.popleft()
+        if not self._updates and timeout:
+            self._new_updates.clear()
+            try:
+                await asyncio.wait_for(self._new_updates.wait(), timeout)
+            except asyncio.TimeoutError:
+                return []
+        return [update for _, update in zip(range(limit), self._updates)]
+
+    async def _method_sendmessage(self, params):
+        chat_id = int(params["chat_id"])
+        text = params.get("text", "")
+        if self.record_text:
+            self.sent[chat_id].append(text)
+        result = {
+            "message_id": self._message_id(),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": BOT_USER,
+            "text": text,
+        }
+        self._notify(chat_id, "sendMessage", result)
+        return result
+
+    async def _method_senddocument(self, params):
+        chat_id = int(params["chat_id"])
+        document = params["document"]
+        if isinstance(document, str):
+            # ارسال دوباره با file_id
+            file_id, file_name = document, "cached"
+        else:
+            file_id, file_name = f"doc{self._message_id()}", document.filename
+            self.documents[file_id] = document.file.read()
+        result = {
+            "message_id": self._message_id(),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": BOT_USER,
+            "caption": params.get("caption", ""),
+            "document": {"file_id": file_id, "file_unique_id": file_id, "file_name": file_name,
+                         "file_size": len(self.documents.get(file_id, b""))},
+        }
+        self._notify(chat_id, "sendDocument", result)
+        return result
+
+    async def _method_answercallbackquery(self, params):
+        chat_id = self._callback_chats.pop(params.get("callback_query_id"), None)
+        if chat_id is not None:
+            self._notify(chat_id, "answerCallbackQuery", True)
+        return True
+
+
+async def serve(api: FakeTelegramAPI, host: str, port: int) -> web.AppRunner:
+    runner = web.AppRunner(api.app(), access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info(f"Fake Bot API listening on http://{host}:{port}")
+    return runner
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--flood-limits", type=int, nargs=2, metavar=("GLOBAL", "CHAT"),
+                        help="حداکثر sendMessage در ثانیه (سراسری و هر چت) قبل از پاسخ 429")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    api = FakeTelegramAPI()
+    api.flood_limits = args.flood_limits
+    web.run_app(api.app(), host=args.host, port=args.port, access_log=None)
+
+
+if __name__ == "__main__":
+    main()
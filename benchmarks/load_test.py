@@ -0,0 +1,329 @@
+"""تست بار سرتاسری: Bot API جعلی محلی + فرایند واقعی bot.py + Postgres محلی
+
+    python -m benchmarks.load_test --database-url postgresql://localhost/moraby_load --users 2000 --duration 60
+
+ربات با BOT_MODE=polling و TELEGRAM_API_URL به API جعلی وصل می‌شود و همه آپدیت‌ها از
+هندلرهای واقعی dp می‌گذرند. هر کاربر مجازی یک سناریو (‏/start، ثبت تمرین، callbackها،
+تاریخچه، برنامه هفتگی، تنظیمات) را با زمان فکر کردن تصادفی تکرار می‌کند. تأخیر از ساختن
+آپدیت تا رسیدن جواب ربات (sendMessage یا answerCallbackQuery) اندازه‌گیری می‌شود.
+با --workers N به جای یک ربات polling، N پردازه ربات با BOT_MODE=worker روی پورت‌های بعد از
+--bot-port و ingress.py روی خود --bot-port اجرا می‌شوند و API جعلی آپدیت‌ها را به وب‌هوک ingress
+می‌فرستد. با --external ربات اجرا نمی‌شود و باید جداگانه با همان تنظیمات بالا آمده باشد. با --flood-limits
+API جعلی مثل تلگرام برای ارسال بیش از حد پاسخ 429 می‌دهد؛ محدودیت‌های سمت ربات از متغیرهای
+محیطی SEND_* خوانده می‌شوند.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import secrets
+import signal
+import subprocess
+import sys
+import time
+from collections import defaultdict
+import logging
+
+import aiohttp
+import psycopg2
+
+from benchmarks.common import percentile, print_table
+from benchmarks.corpus import CorpusGenerator
+from benchmarks.fake_telegram import FakeTelegramAPI, serve
+
+logger = logging.getLogger(__name__)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LOAD_TEST_TOKEN = "123456:LOADTEST-fake-token"
+FIRST_USER_ID = 10_000_000
+
+# (نوع، داده)؛ workout متن تمرین تصادفی می‌فرستد
+SCENARIO = (
+    ("message", "🏋 ثبت برنامه تمرینی"),
+    ("workout", None),
+    ("callback", ("make_harder", "make_easier", "adjust_rest", "save_workout", "rewrite_pro")),
+    ("callback", ("rest_30", "rest_45", "rest_60", "rest_90", "rest_120")),
+    ("message", "📊 تحلیل تمرین من"),
+    ("message", "📅 ساخت برنامه هفتگی"),
+    ("callback", ("plan_fatloss", "plan_strength", "plan_endurance", "plan_mixed")),
+    ("message", "📈 افزایش قدرت"),
+    ("callback", ("strength_beginner", "strength_intermediate", "strength_advanced")),
+    ("message", "⚙ تنظیمات"),
+    ("callback", ("settings_level",)),
+    ("callback", ("level_beginner", "level_intermediate", "level_advanced")),
+    ("message", "/ping"),
+)
+
+
+class LoadStats:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.rejected = 0
+        self.started = time.perf_counter()
+        self.finished = None
+
+    @property
+    def completed(self):
+        return sum(len(samples) for samples in self.latencies.values())
+
+    def summary(self):
+        elapsed = (self.finished or time.perf_counter()) - self.started
+        total_errors = sum(self.errors.values())
+        rows = {}
+        for action, samples in sorted(self.latencies.items()):
+            rows[action] = {
+                "count": len(samples),
+                "p50_ms": percentile(samples, 50) * 1000,
+                "p90_ms": percentile(samples, 90) * 1000,
+                "p99_ms": percentile(samples, 99) * 1000,
+                "max_ms": max(samples) * 1000,
+                "errors": self.errors.get(action, 0),
+            }
+        everything = [value for samples in self.latencies.values() for value in samples]
+        return {
+            "elapsed_s": elapsed,
+            "completed": self.completed,
+            "throughput_per_s": self.completed / elapsed if elapsed else 0.0,
+            "errors": total_errors,
+            "error_rate": total_errors / max(1, self.completed + total_errors),
+            "rejected_workouts": self.rejected,
+            "p50_ms": percentile(everything, 50) * 1000,
+            "p90_ms": percentile(everything, 90) * 1000,
+            "p99_ms": percentile(everything, 99) * 1000,
+            "actions": rows,
+        }
+
+
+async def simulate_user(api, stats, user_id, deadline, args, rng, generator):
+    async def step(action, kind, push, methods):
+        future = api.expect(user_id, methods)
+        started = time.perf_counter()
+        push()
+        try:
+            method, result = await asyncio.wait_for(future, args.timeout)
+        except asyncio.TimeoutError:
+            stats.errors[action] += 1
+            return None
+        stats.latencies[action].append(time.perf_counter() - started)
+        return result
+
+    await asyncio.sleep(rng.uniform(0, args.ramp))
+    await step("/start", "message", lambda: api.push_message(user_id, "/start"), ("sendMessage",))
+    while time.perf_counter() < deadline:
+        for kind, data in SCENARIO:
+            if time.perf_counter() >= deadline:
+                return
+            await asyncio.sleep(rng.expovariate(1 / args.think) if args.think else 0)
+            if kind == "callback":
+                value = rng.choice(data)
+                action = f"cb:{value.split('_')[0]}"
+                await step(action, kind, lambda: api.push_callback(user_id, value), ("answerCallbackQuery",))
+            elif kind == "workout":
+                # پیام ردشده کاربر را در حالت انتظار تمرین نگه می‌دارد؛ مثل کاربر واقعی دوباره می‌فرستد
+                for _ in range(3):
+                    text = generator.message(rng.randint(1, args.max_lines))
+                    result = await step("workout", kind, lambda: api.push_message(user_id, text), ("sendMessage",))
+                    if not (result and result["text"].startswith("❌")):
+                        break
+                    stats.rejected += 1
+            else:
+                await step(data, kind, lambda: api.push_message(user_id, data), ("sendMessage",))
+
+
+async def wait_ready(url, timeout):
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as session:
+        while time.monotonic() < deadline:
+            try:
+                async with session.get(url) as response:
+                    if response.status == 200:
+                        return
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.5)
+    raise RuntimeError(f"Bot did not become ready at {url} within {timeout}s")
+
+
+async def fetch_metrics(urls):
+    """خطوط شمارنده‌های مهم از /metrics ربات؛ با چند پردازه جمع همه"""
+    counters = defaultdict(float)
+    async with aiohttp.ClientSession() as session:
+        for url in urls:
+            try:
+                async with session.get(url) as response:
+                    text = await response.text()
+            except aiohttp.ClientError as e:
+                logger.warning(f"Could not read bot metrics from {url}: {e}")
+                continue
+            for line in text.splitlines():
+                if line.startswith(("db_query_seconds_count", "telegram_api_seconds_count", "db_pool_wait_seconds_count",
+                                    "bot_updates_received_total", "bot_handler_errors_total",
+                                    "send_queue_seconds_count", "send_retry_after_total", "updates_dropped_total",
+                                    "ingress_updates_total", "activity_touches_total",
+                                    "activity_rows_written_total")):
+                    name, value = line.rsplit(" ", 1)
+                    counters[name] += float(value)
+    return counters
+
+
+def _spawn(script, args, api_url, port, log_path, **env):
+    env = dict(
+        os.environ,
+        BOT_TOKEN=LOAD_TEST_TOKEN,
+        TELEGRAM_API_URL=api_url,
+        DATABASE_URL=args.database_url,
+        DATABASE_SSLMODE=args.sslmode,
+        PORT=str(port),
+        SELF_PING_URL="",
+        **env,
+    )
+    log = open(log_path, "w") if log_path else subprocess.DEVNULL
+    return subprocess.Popen([sys.executable, script], cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+
+def spawn_bot(args, api_url):
+    return _spawn("bot.py", args, api_url, args.bot_port, args.bot_log, BOT_MODE="polling", WEBHOOK_HOST="")
+
+
+def worker_urls(args):
+    return {f"w{i}": f"http://127.0.0.1:{args.bot_port + 1 + i}" for i in range(args.workers)}
+
+
+async def start_cluster(args, api_url, processes):
+    """پردازه‌های worker و بعد از آماده شدن همه، ingress؛ پردازه‌ها به processes اضافه می‌شوند"""
+    workers = worker_urls(args)
+    env = dict(WORKERS=",".join(f"{name}={url}" for name, url in workers.items()), WEBHOOK_PATH="/webhook",
+               WEBHOOK_SECRET=secrets.token_urlsafe(32))
+    for name, url in workers.items():
+        log_path = f"{args.bot_log}.{name}" if args.bot_log else None
+        processes.append(_spawn("bot.py", args, api_url, int(url.rsplit(":", 1)[1]), log_path,
+                                BOT_MODE="worker", WORKER_NAME=name, WEBHOOK_HOST="", **env))
+    await asyncio.gather(*(wait_ready(f"{url}/health", args.startup_timeout) for url in workers.values()))
+    log_path = f"{args.bot_log}.ingress" if args.bot_log else None
+    processes.append(_spawn("ingress.py", args, api_url, args.bot_port, log_path,
+                            WEBHOOK_HOST=f"http://127.0.0.1:{args.bot_port}", **env))
+
+
+def database_writes(database_url, sslmode):
+    """ردیف‌های درج‌شده و به‌روزشده هر جدول و موقعیت WAL تا این لحظه
+
+    آمار هر اتصال Postgres هنگام بسته شدنش ثبت می‌شود، پس بعد از خاموش شدن ربات خوانده می‌شود.
+    """
+    conn = psycopg2.connect(database_url, sslmode=sslmode)
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT relname, n_tup_ins, n_tup_upd FROM pg_stat_user_tables")
+            writes = {}
+            for table, inserted, updated in cur.fetchall():
+                writes[f"{table}.inserted"] = inserted
+                writes[f"{table}.updated"] = updated
+            cur.execute("SELECT pg_wal_lsn_diff(pg_current_wal_lsn(), '0/0')")
+            writes["wal_bytes"] = int(cur.fetchone()[0])
+    finally:
+        conn.close()
+    return writes
+
+
+async def run(args):
+    api = FakeTelegramAPI()
+    api.flood_limits = args.flood_limits
+    runner = await serve(api, "127.0.0.1", args.api_port)
+    api_url = f"http://127.0.0.1:{args.api_port}"
+    writes_before = database_writes(args.database_url, args.sslmode)
+    processes = []
+    metrics_urls = [f"http://127.0.0.1:{args.bot_port}/metrics"]
+    if args.workers:
+        metrics_urls += [f"{url}/metrics" for url in worker_urls(args).values()]
+    try:
+        if args.workers and not args.external:
+            await start_cluster(args, api_url, processes)
+        elif not args.external:
+            processes.append(spawn_bot(args, api_url))
+        await wait_ready(f"http://127.0.0.1:{args.bot_port}/health", args.startup_timeout)
+        metrics_before = await fetch_metrics(metrics_urls)
+
+        rng = random.Random(args.seed)
+        generator = CorpusGenerator(args.seed)
+        stats = LoadStats()
+        deadline = time.perf_counter() + args.ramp + args.duration
+        await asyncio.gather(*(
+            simulate_user(api, stats, FIRST_USER_ID + i, deadline, args, random.Random(rng.random()), generator)
+            for i in range(args.users)
+        ))
+        stats.finished = time.perf_counter()
+        # زمان ramp-up در گذردهی حساب نمی‌شود
+        stats.started += args.ramp / 2
+
+        # نوشتن‌های دسته‌ای بعد از آخرین پیام هم flush شوند
+        await asyncio.sleep(args.settle)
+        metrics_after = await fetch_metrics(metrics_urls)
+    finally:
+        # ingress قبل از workerها
+        for process in reversed(processes):
+            process.send_signal(signal.SIGINT)
+            try:
+                process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        await runner.cleanup()
+
+    writes_after = database_writes(args.database_url, args.sslmode)
+    summary = stats.summary()
+    summary["db_writes"] = {
+        name: value - writes_before.get(name, 0) for name, value in writes_after.items()
+        if value - writes_before.get(name, 0)
+    }
+    summary["bot_counters"] = {
+        name: value - metrics_before.get(name, 0) for name, value in metrics_after.items()
+        if value - metrics_before.get(name, 0)
+    }
+    summary["api_calls"] = dict(api.calls)
+    summary["flood_errors"] = api.flood_errors
+    summary["config"] = {key: value for key, value in vars(args).items() if key != "database_url"}
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=os.environ.get("LOAD_TEST_DATABASE_URL", "postgresql://localhost/moraby_load"))
+    parser.add_argument("--sslmode", default="disable")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--duration", type=float, default=30, help="ثانیه بعد از ramp-up")
+    parser.add_argument("--ramp", type=float, default=5, help="پخش شروع کاربران در این چند ثانیه")
+    parser.add_argument("--think", type=float, default=1.0, help="میانگین زمان فکر کردن بین اقدام‌ها (ثانیه)")
+    parser.add_argument("--timeout", type=float, default=10, help="حداکثر انتظار برای جواب ربات")
+    parser.add_argument("--max-lines", type=int, default=20, help="حداکثر خطوط پیام تمرین")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--api-port", type=int, default=8081)
+    parser.add_argument("--bot-port", type=int, default=10080)
+    parser.add_argument("--bot-log", help="فایل لاگ فرایند ربات (پیش‌فرض دور ریخته می‌شود)")
+    parser.add_argument("--flood-limits", type=int, nargs=2, metavar=("GLOBAL", "CHAT"),
+                        help="حداکثر sendMessage در ثانیه در API جعلی (سراسری و هر چت) قبل از پاسخ 429")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="تعداد پردازه‌های ربات پشت ingress.py (صفر: یک ربات polling)")
+    parser.add_argument("--external", action="store_true", help="ربات را اجرا نکن؛ از قبل بالا است")
+    parser.add_argument("--startup-timeout", type=float, default=30)
+    parser.add_argument("--settle", type=float, default=2, help="انتظار بعد از پایان برای flush نوشتن‌ها")
+    parser.add_argument("--output", help="ذخیره خلاصه به صورت JSON")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    summary = asyncio.run(run(args))
+    print_table("latency by action", summary["actions"])
+    print_table("bot counters during run", {name: {"count": int(value)} for name, value in summary["bot_counters"].items()})
+    # شامل نوشتن‌های هنگام خاموش شدن ربات
+    print_table("database writes during run", {name: {"count": value} for name, value in summary["db_writes"].items()})
+    print(f"\n{summary['completed']} replies in {summary['elapsed_s']:.1f}s: "
+          f"{summary['throughput_per_s']:.1f} updates/s, p50 {summary['p50_ms']:.1f} ms, "
+          f"p90 {summary['p90_ms']:.1f} ms, p99 {summary['p99_ms']:.1f} ms, "
+          f"errors {summary['errors']} ({summary['error_rate']:.2%}), rejected workouts {summary['rejected_workouts']}, "
+          f"429 responses {summary['flood_errors']}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(summary, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,36 +1,95 @@
 import logging
 import asyncio
-import threading
+import os
 import time
-from aiogram import Bot, Dispatcher, types
+from datetime import datetime, timedelta
+from aiogram import types
 from aiogram.contrib.middlewares.logging import LoggingMiddleware
-from aiogram.types import ReplyKeyboardMarkup, KeyboardButton, InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.utils import executor
-from aiogram.contrib.fsm_storage.memory import MemoryStorage
+from aiogram.bot.api import TelegramAPIServer, TELEGRAM_PRODUCTION
 from aiogram.dispatcher import FSMContext
 from aiogram.dispatcher.filters.state import State, StatesGroup
-import requests
+from aiohttp import web
 
-from config import BOT_TOKEN, DATABASE_URL, WELCOME_MESSAGE
+from config import (
+    BOT_TOKEN, DATABASE_URL, WELCOME_MESSAGE, PORT, BOT_MODE, WEBHOOK_PATH, WEBHOOK_URL, SELF_PING_URL,
+    TELEGRAM_API_URL, ANALYSIS_OFFLOAD_LINES, PROGRESS_OFFLOAD_SESSIONS, WORKERS, WORKER_NAME, WEBHOOK_SECRET
+)
 from database import Database
+from fsm_storage import create_storage
+from workout_writer import WorkoutWriter
+from activity import ActivityTracker
 from workout_analyzer import WorkoutAnalyzer
 from ai_analyzer import AIAnalyzer
-from keep_alive import keep_alive, ping_self
+from analysis_pipeline import AnalysisPipeline
+from analysis_cache import AnalysisCache, DIGITS
+from keep_alive import setup_routes, start_server, ping_self
+from responses import (
+    MAIN_KEYBOARD, ANALYSIS_KEYBOARD, PLAN_KEYBOARD, STRENGTH_KEYBOARD, SETTINGS_KEYBOARD, REST_KEYBOARD,
+    LEVEL_KEYBOARD, EXPORT_KEYBOARD, WORKOUT_PROMPT, WORKOUT_NOT_UNDERSTOOD, NO_HISTORY, PLAN_PROMPT, UPGRADE_PROMPT,
+    WEIGHT_LOSS_PROMPT, STRENGTH_PROMPT, TUTORIAL_TEXT, PING_REPLY, MAKE_HARDER_REPLY,
+    MAKE_EASIER_REPLY, REST_PROMPT, SAVE_WORKOUT_REPLY, EXPORT_PDF_REPLY, REWRITE_PRO_REPLY,
+    NOTIFICATIONS_REPLY, LEVEL_PROMPT, RESET_REPLY, EXPORT_REPLY, EXPORT_FORMAT_PROMPT, EXPORT_BUSY,
+    WEEKLY_PLANS, PLAN_NOT_FOUND,
+    STRENGTH_LEVELS, STRENGTH_UNKNOWN, REMINDER_USAGE, REMINDER_OFF_REPLY, NO_STATS,
+    WORK_BUSY, PROGRESS_BUSY, CANCEL_REPLY, NOTHING_TO_CANCEL, rest_reply, level_reply,
+    render_progress, render_report, reminder_set_reply, settings_prompt, stats_reply
+)
+from bot_metrics import MetricsMiddleware
+from send_scheduler import ScheduledBot
+from update_scheduler import ScheduledDispatcher, ScheduledWebhookHandler
+from callback_router import CallbackRouter
+from reminders import ReminderScheduler
+from progress import ProgressFold, ProgressCache, parse_sessions, week_start
+from exporter import Exporter, FORMATS as EXPORT_FORMATS
+from work_pool import WorkPool, WorkError, WorkCancelled, CPU, IO
+from hash_ring import HashRing
+from metrics import QUEUE_DEPTH, UPDATE_USERS
 
 # تنظیمات لاگینگ
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # مقداردهی اولیه
-bot = Bot(token=BOT_TOKEN)
-storage = MemoryStorage()
-dp = Dispatcher(bot, storage=storage)
+api_server = TelegramAPIServer.from_base(TELEGRAM_API_URL) if TELEGRAM_API_URL else TELEGRAM_PRODUCTION
+bot = ScheduledBot(token=BOT_TOKEN, server=api_server)
+storage = create_storage()
+dp = ScheduledDispatcher(bot, storage=storage)
 dp.middleware.setup(LoggingMiddleware())
+callbacks = CallbackRouter()
+dp.middleware.setup(MetricsMiddleware(callback_label=callbacks.label))
 
 # اتصال به دیتابیس
 db = Database(DATABASE_URL)
+workout_writer = WorkoutWriter(db)
+activity = ActivityTracker(db)
+# با چند پردازه هر پردازه فقط یادآوری کاربرانی را می‌فرستد که ingress آپدیت‌هایشان را به آن می‌دهد
+ring = HashRing(WORKERS)
+reminders = ReminderScheduler(db, bot, owns=(lambda user_id: ring.node_for(user_id) == WORKER_NAME) if WORKER_NAME else None)
+work_pool = WorkPool()
+exporter = Exporter(db, bot, work_pool)
 workout_analyzer = WorkoutAnalyzer()
 ai_analyzer = AIAnalyzer()
+analysis_pipeline = AnalysisPipeline(workout_analyzer, ai_analyzer)
+# لغو کار با /cancel فقط تحلیل همان کاربر را متوقف می‌کند؛ کاربران دیگر منتظر همان متن دوباره محاسبه می‌کنند
+analysis_cache = AnalysisCache(analysis_pipeline.version, private_errors=(WorkCancelled,))
+progress_cache = ProgressCache()
+workout_writer.add_listener(progress_cache.invalidate)
+workout_writer.add_listener(exporter.invalidate)
+QUEUE_DEPTH.set_function(lambda: dp.update_scheduler.pending, "updates")
+UPDATE_USERS.set_function(lambda: dp.update_scheduler.users)
+QUEUE_DEPTH.set_function(lambda: workout_writer.pending, "workout_writer")
+QUEUE_DEPTH.set_function(lambda: activity.pending, "activity")
+QUEUE_DEPTH.set_function(lambda: bot.scheduler.pending, "send_scheduler")
+QUEUE_DEPTH.set_function(lambda: reminders.pending, "reminders")
+QUEUE_DEPTH.set_function(lambda: exporter.pending, "exports")
+QUEUE_DEPTH.set_function(lambda: work_pool.pending(CPU), "work_cpu")
+QUEUE_DEPTH.set_function(lambda: work_pool.pending(IO), "work_io")
+
+def analyze_workout(text):
+    """تحلیل و متن پاسخ با هم ساخته و با هم در کش نگه داشته می‌شوند"""
+    report = analysis_pipeline.analyze(text)
+    return None if report is None else (report, render_report(report))
 
 # تعریف حالت‌ها
 class WorkoutStates(StatesGroup):
@@ -38,39 +97,12 @@ class WorkoutStates(StatesGroup):
     waiting_for_goal = State()
     waiting_for_difficulty = State()
 
-# کیبورد اصلی
-def get_main_keyboard():
-    keyboard = ReplyKeyboardMarkup(resize_keyboard=True, row_width=2)
-    keyboard.add(
-        KeyboardButton("🏋 ثبت برنامه تمرینی"),
-        KeyboardButton("📊 تحلیل تمرین من"),
-        KeyboardButton("📅 ساخت برنامه هفتگی"),
-        KeyboardButton("⚡ ارتقای تمرین"),
-        KeyboardButton("📉 کاهش وزن هوشمند"),
-        KeyboardButton("📈 افزایش قدرت"),
-        KeyboardButton("🧠 راهنمای تمرین اصولی"),
-        KeyboardButton("⚙ تنظیمات")
-    )
-    return keyboard
-
-# کیبورد اینلاین برای بعد از تحلیل
-def get_analysis_keyboard():
-    keyboard = InlineKeyboardMarkup(row_width=2)
-    keyboard.add(
-        InlineKeyboardButton("🔥 سخت‌ترش کن", callback_data="make_harder"),
-        InlineKeyboardButton("🧊 سبک‌ترش کن", callback_data="make_easier"),
-        InlineKeyboardButton("⏱ تنظیم زمان استراحت", callback_data="adjust_rest"),
-        InlineKeyboardButton("📋 ذخیره این تمرین", callback_data="save_workout"),
-        InlineKeyboardButton("📤 خروجی PDF", callback_data="export_pdf"),
-        InlineKeyboardButton("🔄 بازنویسی حرفه‌ای", callback_data="rewrite_pro")
-    )
-    return keyboard
-
 # دستور start
 @dp.message_handler(commands=['start'])
 async def start_command(message: types.Message):
     user = message.from_user
-    db.add_user(
+    activity.touch(user.id)
+    await db.add_user(
         user_id=user.id,
         username=user.username,
         first_name=user.first_name,
@@ -79,376 +111,306 @@ async def start_command(message: types.Message):
     
     await message.reply(
         WELCOME_MESSAGE,
-        reply_markup=get_main_keyboard(),
+        reply_markup=MAIN_KEYBOARD,
         parse_mode="Markdown"
     )
 
+# لغو کارهای در جریان کاربر و خروج از حالت فعلی
+@dp.message_handler(commands=['cancel'], state='*')
+async def cancel_command(message: types.Message, state: FSMContext):
+    cancelled = work_pool.cancel(message.from_user.id)
+    current = await state.get_state()
+    await state.finish()
+    await message.reply(CANCEL_REPLY if cancelled or current else NOTHING_TO_CANCEL, reply_markup=MAIN_KEYBOARD)
+
 # ثبت برنامه تمرینی
 @dp.message_handler(lambda message: message.text == "🏋 ثبت برنامه تمرینی")
 async def register_workout(message: types.Message):
     await WorkoutStates.waiting_for_workout.set()
-    await message.reply(
-        "📝 لطفاً تمریناتت رو به این شکل برام بنویس:\n\n"
-        "دراز نشست=۲۰\n"
-        "شنا=۱۰\n"
-        "اسکات=۵\n"
-        "طناب=۳ دقیقه\n\n"
-        "یا هر شکل دیگه‌ای که راحت‌تری ✍️"
-    )
+    await message.reply(WORKOUT_PROMPT)
 
 # دریافت تمرین از کاربر
 @dp.message_handler(state=WorkoutStates.waiting_for_workout)
 async def process_workout(message: types.Message, state: FSMContext):
     workout_text = message.text
+    user_id = message.from_user.id
     
-    # تحلیل با workout_analyzer
-    exercises = workout_analyzer.parse_workout(workout_text)
-    
-    if not exercises:
-        await message.reply("❌ متوجه تمرینات نشدم! لطفاً دوباره با فرمت واضح‌تر بنویس.")
+    # تحلیل کامل با یک بار پارس (تمرین‌های تکراری از کش)؛ پیام‌های بزرگ در استخر پردازه
+    # تحلیل می‌شوند تا پیام بقیه کاربران منتظر نماند
+    if workout_text.count("\n") >= ANALYSIS_OFFLOAD_LINES:
+        compute = lambda text: work_pool.run_cpu(analyze_workout, text, user_id=user_id)
+    else:
+        compute = analyze_workout
+    try:
+        analysis = await analysis_cache.get_or_compute(workout_text, compute)
+    except WorkCancelled:
+        return
+    except WorkError as e:
+        logger.warning(f"Workout analysis for {user_id} not completed: {e}")
+        await message.reply(WORK_BUSY)
         return
     
-    # محاسبات
-    volume = workout_analyzer.calculate_volume(exercises)
-    calories = workout_analyzer.calculate_calories(exercises)
-    goal = workout_analyzer.detect_goal(exercises, volume)
-    difficulty = workout_analyzer.estimate_difficulty(volume)
-    rest_time = workout_analyzer.suggest_rest_time(exercises, difficulty)
-    imbalances = workout_analyzer.detect_imbalance(exercises)
-    improvements = workout_analyzer.suggest_improvement(exercises, difficulty)
-    overtraining = workout_analyzer.check_overtraining(exercises, difficulty)
-    
-    # تحلیل با AI
-    ai_analysis = ai_analyzer.analyze_text(workout_text)
+    if analysis is None:
+        await message.reply(WORKOUT_NOT_UNDERSTOOD)
+        return
+    report, reply = analysis
     
-    # ذخیره در دیتابیس
-    db.save_workout(
+    # ذخیره در دیتابیس (در صف نوشتن؛ پاسخ منتظر commit نمی‌ماند)
+    activity.touch(user_id)
+    await workout_writer.save_workout(
         user_id=message.from_user.id,
         workout_text=workout_text,
-        analysis=f"هدف: {goal} - شدت: {difficulty}",
-        calories=calories,
-        intensity=difficulty
+        analysis=report.summary,
+        calories=report.calories,
+        intensity=report.difficulty,
+        volume=report.volume
     )
+    # گزارش پیشرفت کش‌شده بدون این تمرین است؛ بعد از نوشتنش هم دوباره باطل می‌شود
+    progress_cache.invalidate((user_id,))
     
-    # ساخت پیام نتیجه
-    result = f"""🔥 **تحلیل تمرین شما:**
-
-📋 **تمرینات ثبت شده:**
-"""
-    for ex in exercises:
-        result += f"• {ex['name']}: {ex['value']} {ex['unit']} (دسته: {ex['category']})\n"
-    
-    result += f"""
-📊 **آمار کلی:**
-• حجم کل: {volume}
-• کالری تقریبی: {calories} کالری
-• هدف تمرین: {goal}
-• سطح سختی: {difficulty}
-
-⏱ **زمان استراحت پیشنهادی:**
-• بین حرکات: {rest_time} ثانیه
-💧 آب: هر ۱۵ دقیقه
-
-"""
-    
-    if imbalances:
-        result += "⚠ **هشدارهای تعادل:**\n"
-        for w in imbalances:
-            result += f"• {w}\n"
-        result += "\n"
-    
-    if overtraining:
-        result += "⚠ **هشدار تمرین بیش از حد:**\n"
-        for w in overtraining:
-            result += f"• {w}\n"
-        result += "\n"
-    
-    result += f"📈 **پیشنهاد بهینه‌سازی:**\n{improvements}\n\n"
-    
-    if ai_analysis.get("suggestions"):
-        result += "🧠 **پیشنهادات هوشمند:**\n"
-        for s in ai_analysis["suggestions"]:
-            result += f"• {s}\n"
-    
-    await message.reply(result, parse_mode="Markdown", reply_markup=get_analysis_keyboard())
+    await message.reply(reply, parse_mode="Markdown", reply_markup=ANALYSIS_KEYBOARD)
     await state.finish()
 
-# تحلیل تمرین قبلی
+# گزارش پیشرفت از کل تاریخچه (تا ثبت تمرین بعدی از کش)؛ تاریخچه دسته‌دسته خوانده می‌شود و
+# متن دسته‌های بزرگ در استخر پردازه پارس می‌شود، نه در thread دیتابیس یا روی event loop
+async def progress_report(user_id, today):
+    fold = ProgressFold(today)
+
+    async def add_chunk(rows):
+        texts = [row[1] for row in rows]
+        if len(rows) >= PROGRESS_OFFLOAD_SESSIONS:
+            parsed = await work_pool.run_cpu(parse_sessions, texts, user_id=user_id)
+        else:
+            parsed = parse_sessions(texts)
+        for (workout_date, _, calories, volume), (per_session, computed_volume) in zip(rows, parsed):
+            fold.add_parsed(workout_date, per_session, computed_volume, calories, volume)
+
+    if not await db.fold_user_history(user_id, add_chunk) or not fold.sessions:
+        return None
+    return render_progress(fold.result())
+
 @dp.message_handler(lambda message: message.text == "📊 تحلیل تمرین من")
 async def analyze_my_workout(message: types.Message):
-    history = db.get_user_history(message.from_user.id, limit=1)
-    
-    if history:
-        last_workout = history[0]
-        await message.reply(
-            f"📊 **آخرین تمرین ثبت شده:**\n\n"
-            f"📅 تاریخ: {last_workout['workout_date']}\n"
-            f"🏋 تمرین: {last_workout['workout_text']}\n"
-            f"🔥 کالری: {last_workout['calories']}\n"
-            f"📈 شدت: {last_workout['intensity']}\n\n"
-            f"برای تحلیل جدید از دکمه ثبت تمرین استفاده کن 👇",
-            parse_mode="Markdown"
-        )
-    else:
-        await message.reply("📭 هنوز تمرینی ثبت نکردی! از دکمه 'ثبت برنامه تمرینی' شروع کن.")
+    user_id = message.from_user.id
+    today = datetime.now().date()
+    try:
+        reply = await progress_cache.get_or_compute(user_id, week_start(today), lambda: progress_report(user_id, today))
+    except WorkCancelled:
+        return
+    except WorkError as e:
+        logger.warning(f"Progress report for {user_id} not completed: {e}")
+        await message.reply(PROGRESS_BUSY)
+        return
+    await message.reply(reply or NO_HISTORY, parse_mode="Markdown")
+
+# آمار کاربر از آخرین ردیف user_stats
+@dp.message_handler(commands=['stats'])
+async def user_stats(message: types.Message):
+    stats = await db.get_user_stats(message.from_user.id)
+    if not stats:
+        await message.reply(NO_STATS)
+        return
+
+    today = datetime.now().date()
+    this_week = today - timedelta(days=today.weekday())
+    current = stats["week_start"] == this_week
+    # streak فقط وقتی ادامه دارد که کاربر این هفته یا هفته قبل تمرین کرده باشد
+    streak = stats["streak_weeks"] if stats["week_start"] >= this_week - timedelta(days=7) else 0
+    await message.reply(stats_reply({
+        "sessions": stats["sessions"] if current else 0,
+        "days": bin(stats["active_days"]).count("1") if current else 0,
+        "calories": stats["calories"] if current else 0,
+        "volume": stats["volume"] if current else 0,
+        "total_sessions": stats["total_sessions"],
+        "total_calories": stats["total_calories"],
+        "total_volume": stats["total_volume"],
+        "streak": streak,
+    }), parse_mode="Markdown")
 
 # ساخت برنامه هفتگی
 @dp.message_handler(lambda message: message.text == "📅 ساخت برنامه هفتگی")
 async def weekly_plan(message: types.Message):
-    keyboard = InlineKeyboardMarkup(row_width=2)
-    keyboard.add(
-        InlineKeyboardButton("🔥 چربی‌سوزی", callback_data="plan_fatloss"),
-        InlineKeyboardButton("💪 افزایش قدرت", callback_data="plan_strength"),
-        InlineKeyboardButton("⚡ استقامتی", callback_data="plan_endurance"),
-        InlineKeyboardButton("🧘 ترکیبی", callback_data="plan_mixed")
-    )
-    
-    await message.reply(
-        "🎯 **هدف خود از برنامه هفتگی رو انتخاب کن:**",
-        reply_markup=keyboard,
-        parse_mode="Markdown"
-    )
+    await message.reply(PLAN_PROMPT, reply_markup=PLAN_KEYBOARD, parse_mode="Markdown")
 
 # ارتقای تمرین
 @dp.message_handler(lambda message: message.text == "⚡ ارتقای تمرین")
 async def upgrade_workout(message: types.Message):
     await WorkoutStates.waiting_for_workout.set()
-    await message.reply(
-        "📝 تمرین فعلیت رو برام بنویس تا نسخه پیشرفته‌ترش رو بهت بدم:"
-    )
+    await message.reply(UPGRADE_PROMPT)
 
 # کاهش وزن هوشمند
 @dp.message_handler(lambda message: message.text == "📉 کاهش وزن هوشمند")
 async def smart_weight_loss(message: types.Message):
-    await message.reply(
-        "🎯 **برنامه کاهش وزن هوشمند:**\n\n"
-        "برای شروع، اطلاعات زیر رو برام بفرست:\n"
-        "1️⃣ وزن فعلی\n"
-        "2️⃣ وزن هدف\n"
-        "3️⃣ تعداد جلسات تمرین در هفته\n\n"
-        "مثال: ۷۵, ۶۵, ۴"
-    )
+    await message.reply(WEIGHT_LOSS_PROMPT)
     await WorkoutStates.waiting_for_goal.set()
 
 # افزایش قدرت
 @dp.message_handler(lambda message: message.text == "📈 افزایش قدرت")
 async def strength_gain(message: types.Message):
-    await message.reply(
-        "💪 **برنامه افزایش قدرت:**\n\n"
-        "برای شروع، سطح فعلی خودت رو انتخاب کن:",
-        reply_markup=InlineKeyboardMarkup().add(
-            InlineKeyboardButton("مبتدی", callback_data="strength_beginner"),
-            InlineKeyboardButton("متوسط", callback_data="strength_intermediate"),
-            InlineKeyboardButton("حرفه‌ای", callback_data="strength_advanced")
-        )
-    )
+    await message.reply(STRENGTH_PROMPT, reply_markup=STRENGTH_KEYBOARD)
 
 # راهنمای تمرین اصولی
 @dp.message_handler(lambda message: message.text == "🧠 راهنمای تمرین اصولی")
 async def tutorial(message: types.Message):
-    tutorial_text = """
-🧠 **راهنمای تمرین اصولی:**
-
-🔹 **قبل از تمرین:**
-• ۱۰ دقیقه گرم کردن
-• حرکات کششی پویا
-• نوشیدن آب کافی
-
-🔸 **حین تمرین:**
-• فرم صحیح حرکات رو رعایت کن
-• بین حرکات ۳۰-۶۰ ثانیه استراحت کن
-• هر ۱۵-۲۰ دقیقه آب بخور
-
-🔹 **بعد از تمرین:**
-• ۵-۱۰ دقیقه سرد کردن
-• حرکات کششی ایستا
-• تغذیه مناسب (پروتئین + کربوهیدرات)
-
-⚠ **نکات مهم:**
-• به بدن خود گوش کن
-• در صورت درد شدید، تمرین رو قطع کن
-• پیشرفت تدریجی داشته باش
-• ۴۸ ساعت بین تمرینات یک گروه عضلانی فاصله بنداز
-
-💧 **هیدراتاسیون:**
-• قبل تمرین: ۵۰۰ میلی‌لیتر
-• حین تمرین: هر ۱۵ دقیقه ۲۰۰ میلی‌لیتر
-• بعد تمرین: ۵۰۰ میلی‌لیتر به ازای هر نیم‌ساعت
-"""
-    await message.reply(tutorial_text, parse_mode="Markdown")
+    await message.reply(TUTORIAL_TEXT, parse_mode="Markdown")
 
 # تنظیمات
 @dp.message_handler(lambda message: message.text == "⚙ تنظیمات")
 async def settings(message: types.Message):
-    keyboard = InlineKeyboardMarkup(row_width=2)
-    keyboard.add(
-        InlineKeyboardButton("🔔 اعلان‌ها", callback_data="settings_notifications"),
-        InlineKeyboardButton("📊 سطح تمرین", callback_data="settings_level"),
-        InlineKeyboardButton("🔄 بازنشانی", callback_data="settings_reset"),
-        InlineKeyboardButton("📤 خروجی", callback_data="settings_export")
-    )
-    
-    await message.reply(
-        "⚙ **تنظیمات ربات:**\n\n"
-        "از اینجا می‌تونی تنظیمات ربات رو شخصی‌سازی کنی.",
-        reply_markup=keyboard,
-        parse_mode="Markdown"
-    )
+    profile = await db.get_profile(message.from_user.id)
+    await message.reply(settings_prompt(profile), reply_markup=SETTINGS_KEYBOARD, parse_mode="Markdown")
 
 # پاسخ به callbackهای اینلاین
+def static_reply(text, reply_markup=None):
+    async def handler(callback_query: types.CallbackQuery):
+        await callback_query.message.answer(text, reply_markup=reply_markup)
+    return handler
+
+callbacks.exact("make_harder")(static_reply(MAKE_HARDER_REPLY))
+callbacks.exact("make_easier")(static_reply(MAKE_EASIER_REPLY))
+callbacks.exact("adjust_rest")(static_reply(REST_PROMPT, REST_KEYBOARD))
+callbacks.exact("save_workout")(static_reply(SAVE_WORKOUT_REPLY))
+callbacks.exact("rewrite_pro")(static_reply(REWRITE_PRO_REPLY))
+
+# پاسخ به تنظیمات استراحت
+@callbacks.prefix("rest_", int)
+async def rest_selected(callback_query: types.CallbackQuery, seconds: int):
+    await callback_query.message.answer(rest_reply(seconds))
+
+# خروجی تاریخچه تمرین؛ فایل در پس‌زمینه ساخته و به صورت سند فرستاده می‌شود
+@callbacks.prefix("export_")
+async def export_selected(callback_query: types.CallbackQuery, fmt: str):
+    if fmt not in EXPORT_FORMATS:
+        return
+    if exporter.submit(callback_query.message.chat.id, callback_query.from_user.id, fmt):
+        text = EXPORT_PDF_REPLY if fmt == "pdf" else EXPORT_REPLY
+    else:
+        text = EXPORT_BUSY
+    await callback_query.message.answer(text)
+
+# پاسخ به برنامه‌های هفتگی
+@callbacks.prefix("plan_")
+async def plan_selected(callback_query: types.CallbackQuery, plan_type: str):
+    await callback_query.message.answer(WEEKLY_PLANS.get(plan_type, PLAN_NOT_FOUND), parse_mode="Markdown")
+
+# پاسخ به تنظیمات
+SETTINGS_REPLIES = {
+    "notifications": (NOTIFICATIONS_REPLY, None),
+    "level": (LEVEL_PROMPT, LEVEL_KEYBOARD),
+    "reset": (RESET_REPLY, None),
+    "export": (EXPORT_FORMAT_PROMPT, EXPORT_KEYBOARD),
+}
+
+@callbacks.prefix("settings_")
+async def settings_selected(callback_query: types.CallbackQuery, setting: str):
+    if setting == "notifications":
+        user_id = callback_query.from_user.id
+        changed = await db.toggle_notifications(user_id)
+        if changed is not None:
+            reminders.update(user_id, *changed)
+    reply = SETTINGS_REPLIES.get(setting)
+    if reply is not None:
+        text, keyboard = reply
+        await callback_query.message.answer(text, reply_markup=keyboard)
+
+# پاسخ به سطوح
+@callbacks.prefix("level_")
+async def level_selected(callback_query: types.CallbackQuery, level: str):
+    await db.update_user_level(callback_query.from_user.id, level)
+    await callback_query.message.answer(level_reply(level))
+
+# پاسخ به سطوح قدرت
+@callbacks.prefix("strength_")
+async def strength_selected(callback_query: types.CallbackQuery, level: str):
+    await callback_query.message.answer(STRENGTH_LEVELS.get(level, STRENGTH_UNKNOWN))
+
 @dp.callback_query_handler(lambda c: True)
 async def inline_callbacks(callback_query: types.CallbackQuery):
-    data = callback_query.data
-    
-    if data == "make_harder":
-        await callback_query.message.answer(
-            "🔥 **نسخه سخت‌تر تمرین:**\n\n"
-            "برای دریافت نسخه سخت‌تر، لطفاً تمرین فعلیت رو با دکمه ثبت برنامه وارد کن."
-        )
-    
-    elif data == "make_easier":
-        await callback_query.message.answer(
-            "🧊 **نسخه سبک‌تر تمرین:**\n\n"
-            "برای شروع می‌تونی تعداد تکرارها رو ۲۰٪ کاهش بدی و زمان استراحت رو افزایش بدی."
-        )
-    
-    elif data == "adjust_rest":
-        keyboard = InlineKeyboardMarkup(row_width=3)
-        keyboard.add(
-            InlineKeyboardButton("۳۰ ثانیه", callback_data="rest_30"),
-            InlineKeyboardButton("۴۵ ثانیه", callback_data="rest_45"),
-            InlineKeyboardButton("۶۰ ثانیه", callback_data="rest_60"),
-            InlineKeyboardButton("۹۰ ثانیه", callback_data="rest_90"),
-            InlineKeyboardButton("۲ دقیقه", callback_data="rest_120")
-        )
-        await callback_query.message.answer(
-            "⏱ **زمان استراحت مورد نظر را انتخاب کن:**",
-            reply_markup=keyboard
-        )
-    
-    elif data == "save_workout":
-        await callback_query.message.answer(
-            "✅ تمرین با موفقیت در تاریخچه شما ذخیره شد!"
-        )
-    
-    elif data == "export_pdf":
-        await callback_query.message.answer(
-            "📤 در حال آماده‌سازی PDF... لطفاً صبر کنید."
-        )
-    
-    elif data == "rewrite_pro":
-        await callback_query.message.answer(
-            "🔄 در حال بازنویسی حرفه‌ای تمرین..."
-        )
-    
-    # پاسخ به تنظیمات استراحت
-    elif data.startswith("rest_"):
-        time = data.split("_")[1]
-        await callback_query.message.answer(
-            f"✅ زمان استراحت روی {time} ثانیه تنظیم شد.\n\n"
-            f"به یاد داشته باش که بین ستها هم {time} ثانیه استراحت کنی."
-        )
-    
-    # پاسخ به برنامه‌های هفتگی
-    elif data.startswith("plan_"):
-        plan_type = data.split("_")[1]
-        plans = {
-            "fatloss": "🔥 **برنامه چربی‌سوزی هفتگی:**\n\n"
-                      "شنبه: هوازی ۴۵ دقیقه + کرانچ\n"
-                      "یک‌شنبه: تمرین قدرتی تمام بدن\n"
-                      "دوشنبه: استراحت یا یوگا\n"
-                      "سه‌شنبه: اینتروال ۳۰ دقیقه\n"
-                      "چهارشنبه: تمرین قدرتی میان‌تنه\n"
-                      "پنج‌شنبه: هوازی ۶۰ دقیقه\n"
-                      "جمعه: استراحت فعال",
-            
-            "strength": "💪 **برنامه افزایش قدرت هفتگی:**\n\n"
-                        "شنبه: سینه و پشت بازو\n"
-                        "یک‌شنبه: پا و سرشانه\n"
-                        "دوشنبه: استراحت\n"
-                        "سه‌شنبه: پشت و جلو بازو\n"
-                        "چهارشنبه: پا و سرشانه\n"
-                        "پنج‌شنبه: سینه و زیربغل\n"
-                        "جمعه: استراحت",
-            
-            "endurance": "⚡ **برنامه استقامتی هفتگی:**\n\n"
-                         "شنبه: دویدن ۵ کیلومتر\n"
-                         "یک‌شنبه: شنا ۱۰۰۰ متر\n"
-                         "دوشنبه: دوچرخه ۲۰ کیلومتر\n"
-                         "سه‌شنبه: تمرین تناوبی\n"
-                         "چهارشنبه: استراحت\n"
-                         "پنج‌شنبه: کوهنوردی\n"
-                         "جمعه: پیاده‌روی سریع",
-            
-            "mixed": "🧘 **برنامه ترکیبی هفتگی:**\n\n"
-                     "شنبه: قدرتی بالاتنه + هوازی\n"
-                     "یک‌شنبه: یوگا و کشش\n"
-                     "دوشنبه: قدرتی پایین‌تنه\n"
-                     "سه‌شنبه: اینتروال + کرانچ\n"
-                     "چهارشنبه: استراحت\n"
-                     "پنج‌شنبه: تمرین دایره‌ای\n"
-                     "جمعه: پیاده‌روی طولانی"
-        }
-        
-        await callback_query.message.answer(plans.get(plan_type, "برنامه مورد نظر یافت نشد."), parse_mode="Markdown")
-    
-    # پاسخ به تنظیمات
-    elif data.startswith("settings_"):
-        setting = data.split("_")[1]
-        if setting == "notifications":
-            await callback_query.message.answer("🔔 اعلان‌ها با موفقیت تغییر کرد!")
-        elif setting == "level":
-            keyboard = InlineKeyboardMarkup(row_width=3)
-            keyboard.add(
-                InlineKeyboardButton("مبتدی", callback_data="level_beginner"),
-                InlineKeyboardButton("متوسط", callback_data="level_intermediate"),
-                InlineKeyboardButton("حرفه‌ای", callback_data="level_advanced")
-            )
-            await callback_query.message.answer("📊 سطح تمرینی خود را انتخاب کن:", reply_markup=keyboard)
-        elif setting == "reset":
-            await callback_query.message.answer("🔄 تنظیمات به حالت پیش‌فرض بازگشت!")
-        elif setting == "export":
-            await callback_query.message.answer("📤 اطلاعات شما در حال آماده‌سازی است...")
-    
-    # پاسخ به سطوح
-    elif data.startswith("level_"):
-        level = data.split("_")[1]
-        db.update_user_level(callback_query.from_user.id, level)
-        await callback_query.message.answer(f"✅ سطح شما به {level} تغییر کرد!")
-    
-    # پاسخ به سطوح قدرت
-    elif data.startswith("strength_"):
-        level = data.split("_")[1]
-        levels = {
-            "beginner": "برنامه مبتدی: ۳ جلسه در هفته، تمرینات پایه",
-            "intermediate": "برنامه متوسط: ۴ جلسه در هفته، تمرینات ترکیبی",
-            "advanced": "برنامه حرفه‌ای: ۵ جلسه در هفته، تمرینات پیشرفته"
-        }
-        await callback_query.message.answer(f"💪 {levels.get(level, 'برنامه انتخابی')}")
-    
+    await callbacks.dispatch(callback_query)
     await callback_query.answer()
 
+# تنظیم یادآوری روزانه: /reminder 18:30 یا /reminder off
+@dp.message_handler(commands=['reminder'])
+async def reminder_command(message: types.Message):
+    arg = message.get_args().strip().translate(DIGITS)
+    user_id = message.from_user.id
+    if arg.lower() in ("off", "خاموش"):
+        await db.set_reminder_time(user_id, None)
+        reminders.update(user_id, False, None)
+        await message.reply(REMINDER_OFF_REPLY)
+        return
+    try:
+        reminder_time = datetime.strptime(arg, "%H:%M").time()
+    except ValueError:
+        await message.reply(REMINDER_USAGE)
+        return
+    if await db.set_reminder_time(user_id, reminder_time):
+        reminders.update(user_id, True, reminder_time)
+    await message.reply(reminder_set_reply(reminder_time))
+
 # دستور ping برای تست
 @dp.message_handler(commands=['ping'])
 async def ping_command(message: types.Message):
-    await message.reply("🏓 پونگ! ربات فعال است.")
+    await message.reply(PING_REPLY)
 
 # راه‌اندازی
+# در هر دو حالت فقط یک سرور aiohttp روی همان event loop ربات اجرا می‌شود
+web_app = setup_routes(web.Application())
+background = {}
+
 async def on_startup(dp):
     logger.info("Starting bot...")
+    # پردازه‌های استخر کار قبل از threadهای دیتابیس fork می‌شوند
+    work_pool.start()
+    exporter.start()
+    await db.connect()
+    workout_writer.start()
+    activity.start()
+    bot.scheduler.start()
+    reminders.start()
+    dp.update_scheduler.start()
+    if BOT_MODE == "webhook":
+        await bot.set_webhook(WEBHOOK_URL, drop_pending_updates=True, secret_token=WEBHOOK_SECRET)
+        logger.info(f"Webhook set to {WEBHOOK_URL}")
+    elif BOT_MODE == "polling":
+        background["runner"] = await start_server(web_app, PORT)
+        if SELF_PING_URL:
+            background["ping"] = asyncio.create_task(ping_self(SELF_PING_URL))
+
+async def on_shutdown(dp):
+    logger.info("Stopping bot...")
+    if "ping" in background:
+        background.pop("ping").cancel()
+    if "runner" in background:
+        await background.pop("runner").cleanup()
+    # هندلرهای در جریان هنوز به دیتابیس و صف ارسال نیاز دارند
+    await dp.update_scheduler.close()
+    await reminders.close()
+    await exporter.close()
+    await work_pool.close()
+    await bot.scheduler.close()
+    await workout_writer.close()
+    await activity.close()
+    await db.close()
 
 if __name__ == "__main__":
-    # راه‌اندازی سرور Keep Alive
-    keep_alive()
-    
-    # راه‌اندازی ترد پینگ زدن به خودش
-    ping_thread = threading.Thread(target=ping_self)
-    ping_thread.daemon = True
-    ping_thread.start()
-    
-    # اجرای ربات با Polling
-    executor.start_polling(
-        dp,
-        on_startup=on_startup,
-        skip_updates=True
-    )
+    # پردازه worker فقط آپدیت‌هایی را می‌پذیرد که ingress با رمز مشترک فرستاده
+    if BOT_MODE == "worker" and not os.environ.get("WEBHOOK_SECRET"):
+        raise SystemExit("WEBHOOK_SECRET is not set")
+    if BOT_MODE in ("webhook", "worker"):
+        # آپدیت‌های تلگرام (یا ingress)، / و /health روی یک اپلیکیشن و یک پورت
+        webhook_executor = executor.Executor(dp)
+        webhook_executor.on_startup(on_startup, webhook=True, polling=False)
+        webhook_executor.on_shutdown(on_shutdown, webhook=True, polling=False)
+        webhook_executor.set_webhook(
+            webhook_path=WEBHOOK_PATH, request_handler=ScheduledWebhookHandler, web_app=web_app
+        )
+        webhook_executor.run_app(host="0.0.0.0", port=PORT)
+    else:
+        # اجرای ربات با Polling
+        executor.start_polling(
+            dp,
+            on_startup=on_startup,
+            on_shutdown=on_shutdown,
+            skip_updates=True
+        )
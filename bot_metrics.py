@@ -0,0 +1,72 @@
+import time
+from typing import Callable
+import logging
+
+from aiogram import Bot, types
+from aiogram.dispatcher.handler import current_handler
+from aiogram.dispatcher.middlewares import BaseMiddleware
+
+from metrics import (
+    HANDLER_SECONDS, HANDLER_ERRORS, UPDATES_RECEIVED, UPDATES_IN_FLIGHT,
+    TELEGRAM_API_SECONDS, TELEGRAM_API_ERRORS,
+)
+
+logger = logging.getLogger(__name__)
+
+class MetricsMiddleware(BaseMiddleware):
+    """زمان هر هندلر پیام و callback و تعداد آپدیت‌های در حال پردازش
+
+    callback_label برای callback_data برچسبی با تعداد محدود برمی‌گرداند تا داده دلخواه
+    کاربر سری جدید نسازد.
+    """
+
+    def __init__(self, callback_label: Callable[[str], str] = lambda data: "other"):
+        super().__init__()
+        self.callback_label = callback_label
+
+    async def on_pre_process_update(self, update: types.Update, data: dict):
+        UPDATES_RECEIVED.inc()
+        UPDATES_IN_FLIGHT.inc()
+
+    async def on_post_process_update(self, update: types.Update, results, data: dict):
+        UPDATES_IN_FLIGHT.dec()
+
+    async def on_pre_process_error(self, update: types.Update, error: Exception, data: dict):
+        HANDLER_ERRORS.labels(type(error).__name__).inc()
+
+    async def on_process_message(self, message: types.Message, data: dict):
+        data["_metrics"] = (HANDLER_SECONDS.labels("message", current_handler.get().__name__, ""), time.perf_counter())
+
+    async def on_post_process_message(self, message: types.Message, results, data: dict):
+        self._observe(data)
+
+    async def on_process_callback_query(self, callback_query: types.CallbackQuery, data: dict):
+        series = HANDLER_SECONDS.labels(
+            "callback", current_handler.get().__name__, self.callback_label(callback_query.data or "")
+        )
+        data["_metrics"] = (series, time.perf_counter())
+
+    async def on_post_process_callback_query(self, callback_query: types.CallbackQuery, results, data: dict):
+        self._observe(data)
+
+    @staticmethod
+    def _observe(data: dict):
+        # هندلری که فیلترش رد نشده باشد زمان‌سنج ندارد
+        metrics = data.pop("_metrics", None)
+        if metrics is not None:
+            series, started = metrics
+            series.observe(time.perf_counter() - started)
+
+
+class InstrumentedBot(Bot):
+    """Bot با اندازه‌گیری زمان هر درخواست به Bot API"""
+
+    async def request(self, method, data=None, files=None, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await super().request(method, data, files, **kwargs)
+        except Exception:
+            TELEGRAM_API_ERRORS.labels(method).inc()
+            raise
+        finally:
+            TELEGRAM_API_SECONDS.labels(method).observe(time.perf_counter() - started)
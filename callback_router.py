@@ -0,0 +1,102 @@
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+import logging
+
+from aiogram import types
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[..., Awaitable[Any]]
+
+# کلید گره trie که هندلر پیشوند در آن نگه داشته می‌شود
+_END = ""
+
+
+class CallbackRouter:
+    """مسیریابی callback_data با دیکشنری برای مقادیر ثابت و trie برای پیشوندها
+
+    هزینه پیدا کردن هندلر به تعداد دکمه‌ها بستگی ندارد: مقدار ثابت یک lookup است و
+    پیشوند حداکثر به طول بلندترین پیشوند ثبت‌شده. مقدار بعد از پیشوند یک بار با parse به
+    نوع درست تبدیل می‌شود و نتیجه برای callback_dataهای تکراری نگه داشته می‌شود.
+    """
+
+    def __init__(self, max_resolved: int = 1024):
+        self._exact: Dict[str, Handler] = {}
+        self._trie: Dict[str, Any] = {}
+        # callback_data -> (کلید ثبت‌شده، هندلر، آرگومان‌های بعد از callback_query)
+        self._resolved: Dict[str, Tuple[str, Handler, tuple]] = {}
+        self.max_resolved = max_resolved
+
+    def exact(self, data: str):
+        """ثبت هندلر برای یک callback_data مشخص؛ هندلر (callback_query) می‌گیرد"""
+        def decorator(handler: Handler) -> Handler:
+            self._exact[data] = handler
+            self._resolved.clear()
+            return handler
+        return decorator
+
+    def prefix(self, prefix: str, parse: Callable[[str], Any] = str):
+        """ثبت هندلر برای callback_dataهای با این پیشوند؛ هندلر (callback_query, value) می‌گیرد
+
+        value بخش اول بعد از پیشوند (تا «_» بعدی) است که با parse تبدیل شده.
+        """
+        def decorator(handler: Handler) -> Handler:
+            node = self._trie
+            for char in prefix:
+                node = node.setdefault(char, {})
+            node[_END] = (prefix, handler, parse)
+            self._resolved.clear()
+            return handler
+        return decorator
+
+    def resolve(self, data: str) -> Optional[Tuple[str, Handler, tuple]]:
+        """(کلید ثبت‌شده، هندلر، آرگومان‌ها) یا None اگر هندلری نباشد یا مقدار نامعتبر باشد"""
+        resolved = self._resolved.get(data)
+        if resolved is not None:
+            return resolved
+
+        handler = self._exact.get(data)
+        if handler is not None:
+            resolved = (data, handler, ())
+        else:
+            resolved = self._resolve_prefix(data)
+            if resolved is None:
+                return None
+
+        if len(self._resolved) >= self.max_resolved:
+            self._resolved.clear()
+        self._resolved[data] = resolved
+        return resolved
+
+    def _resolve_prefix(self, data: str):
+        # طولانی‌ترین پیشوند ثبت‌شده
+        node = self._trie
+        match = None
+        for char in data:
+            node = node.get(char)
+            if node is None:
+                break
+            if _END in node:
+                match = node[_END]
+        if match is None:
+            return None
+        prefix, handler, parse = match
+        try:
+            value = parse(data[len(prefix):].split("_")[0])
+        except (ValueError, KeyError) as e:
+            logger.warning(f"Invalid callback payload {data!r}: {e}")
+            return None
+        return prefix, handler, (value,)
+
+    def label(self, data: str) -> str:
+        """برچسب با تعداد محدود برای متریک‌ها: مقدار ثابت یا پیشوند ثبت‌شده"""
+        resolved = self.resolve(data or "")
+        return resolved[0] if resolved is not None else "other"
+
+    async def dispatch(self, callback_query: types.CallbackQuery) -> bool:
+        """اجرای هندلر مربوط؛ False اگر callback_data هندلری نداشته باشد"""
+        resolved = self.resolve(callback_query.data or "")
+        if resolved is None:
+            return False
+        _, handler, args = resolved
+        await handler(callback_query, *args)
+        return True
@@ -1,151 +1,615 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
 import psycopg2
-from psycopg2.extras import RealDictCursor
-from datetime import datetime
+from psycopg2 import pool as pg_pool
+from psycopg2.extras import RealDictCursor, execute_values
+from datetime import datetime, timedelta
 import logging
 
+from config import DATABASE_SSLMODE, DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE, DB_HEALTHCHECK_IDLE
+from migrations import migrate, LATEST_VERSION
+from metrics import DB_QUERY_SECONDS, DB_QUERY_ERRORS, DB_POOL_WAIT_SECONDS
+from profile_cache import ProfileCache, UserProfile
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class Database:
-    def __init__(self, database_url):
+    def __init__(self, database_url, min_connections=DB_POOL_MIN_SIZE, max_connections=DB_POOL_MAX_SIZE):
         self.database_url = database_url
-        self.init_db()
-    
+        self.min_connections = min_connections
+        self.max_connections = max_connections
+        self.pool = None
+        self._last_used = {}
+        # تعداد نخ‌ها برابر سقف استخر است، پس getconn هیچ‌وقت با PoolError مواجه نمی‌شود
+        # و درخواست‌های اضافه در صف executor منتظر می‌مانند
+        self._executor = ThreadPoolExecutor(max_workers=max_connections, thread_name_prefix="db")
+        # سطح و تنظیمات کاربران؛ نوشتن‌های همین کلاس آن را به‌روز نگه می‌دارند
+        self.profiles = ProfileCache()
+
     def get_connection(self):
-        return psycopg2.connect(self.database_url, sslmode='require')
-    
-    def init_db(self):
-        """ایجاد جداول مورد نیاز"""
-        try:
-            conn = self.get_connection()
-            cur = conn.cursor()
-            
-            # جدول کاربران
-            cur.execute("""
-                CREATE TABLE IF NOT EXISTS users (
-                    user_id BIGINT PRIMARY KEY,
-                    username VARCHAR(255),
-                    first_name VARCHAR(255),
-                    last_name VARCHAR(255),
-                    registered_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    fitness_level VARCHAR(50) DEFAULT 'مبتدی',
-                    last_activity TIMESTAMP
-                )
-            """)
-            
-            # جدول تاریخچه تمرینات
-            cur.execute("""
-                CREATE TABLE IF NOT EXISTS workout_history (
-                    id SERIAL PRIMARY KEY,
-                    user_id BIGINT REFERENCES users(user_id),
-                    workout_text TEXT,
-                    analysis TEXT,
-                    calories INT,
-                    intensity VARCHAR(50),
-                    workout_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (user_id) REFERENCES users (user_id)
-                )
-            """)
-            
-            # جدول تنظیمات کاربر
-            cur.execute("""
-                CREATE TABLE IF NOT EXISTS user_settings (
-                    user_id BIGINT PRIMARY KEY REFERENCES users(user_id),
-                    language VARCHAR(10) DEFAULT 'fa',
-                    notifications BOOLEAN DEFAULT TRUE,
-                    workout_reminder_time TIME,
-                    preferred_level VARCHAR(50)
-                )
-            """)
-            
+        return psycopg2.connect(self.database_url, sslmode=DATABASE_SSLMODE)
+
+    async def connect(self):
+        """ساخت استخر اتصال، گرم کردن آن و ایجاد جداول"""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._executor, self._open_pool)
+        await self.init_db()
+
+    async def close(self):
+        """بستن استخر اتصال"""
+        self._executor.shutdown(wait=True)
+        if self.pool is not None and not self.pool.closed:
+            self.pool.closeall()
+        logger.info("Database pool closed")
+
+    def _open_pool(self):
+        # ThreadedConnectionPool در سازنده min_connections اتصال باز می‌کند
+        self.pool = pg_pool.ThreadedConnectionPool(
+            self.min_connections,
+            self.max_connections,
+            self.database_url,
+            sslmode=DATABASE_SSLMODE
+        )
+        logger.info(f"Database pool warmed with {self.min_connections} connections")
+
+    def _is_healthy(self, conn):
+        """بررسی سلامت اتصالی که مدتی بیکار بوده"""
+        if conn.closed:
+            return False
+        last_used = self._last_used.get(id(conn))
+        # اتصال تازه‌ساخته نیازی به بررسی ندارد
+        if last_used is None or time.monotonic() - last_used < DB_HEALTHCHECK_IDLE:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _acquire(self):
+        # هر اتصال خراب بسته و با اتصال تازه جایگزین می‌شود
+        for _ in range(self.max_connections + 1):
+            conn = self.pool.getconn()
+            if self._is_healthy(conn):
+                return conn
+            logger.warning("Discarding unhealthy database connection")
+            self._last_used.pop(id(conn), None)
+            self.pool.putconn(conn, close=True)
+        raise psycopg2.OperationalError("No healthy database connection available")
+
+    def _release(self, conn):
+        if conn.closed:
+            self._last_used.pop(id(conn), None)
+            self.pool.putconn(conn, close=True)
+            return
+        self._last_used[id(conn)] = time.monotonic()
+        self.pool.putconn(conn)
+
+    def _call(self, func, args, submitted):
+        conn = self._acquire()
+        # انتظار در صف executor و گرفتن اتصال از استخر
+        started = time.perf_counter()
+        DB_POOL_WAIT_SECONDS.observe(started - submitted)
+        method = func.__name__.lstrip("_")
+        try:
+            result = func(conn, *args)
             conn.commit()
-            cur.close()
-            conn.close()
-            logger.info("Database initialized successfully")
+            return result
+        except Exception:
+            DB_QUERY_ERRORS.labels(method).inc()
+            if not conn.closed:
+                conn.rollback()
+            raise
+        finally:
+            self._release(conn)
+            DB_QUERY_SECONDS.labels(method).observe(time.perf_counter() - started)
+
+    async def _run(self, func, *args):
+        """اجرای یک تابع همگام دیتابیس روی یک اتصال از استخر، بدون بلاک کردن event loop"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._call, func, args, time.perf_counter())
+
+    async def init_db(self):
+        """اجرای مهاجرت‌های شِما (وقتی شِما به‌روز است فقط یک SELECT)"""
+        try:
+            applied = await self._run(migrate)
+            logger.info(f"Database schema at version {LATEST_VERSION}"
+                        + (f" (applied {applied})" if applied else ""))
         except Exception as e:
             logger.error(f"Error initializing database: {e}")
-    
-    def add_user(self, user_id, username, first_name, last_name):
-        """افزودن کاربر جدید"""
-        try:
-            conn = self.get_connection()
-            cur = conn.cursor()
-            cur.execute("""
-                INSERT INTO users (user_id, username, first_name, last_name, last_activity)
-                VALUES (%s, %s, %s, %s, %s)
-                ON CONFLICT (user_id) DO UPDATE SET
-                last_activity = EXCLUDED.last_activity
-            """, (user_id, username, first_name, last_name, datetime.now()))
-            
-            # ایجاد تنظیمات پیش‌فرض
-            cur.execute("""
-                INSERT INTO user_settings (user_id)
-                VALUES (%s)
-                ON CONFLICT (user_id) DO NOTHING
-            """, (user_id,))
-            
-            conn.commit()
-            cur.close()
-            conn.close()
+
+    async def add_user(self, user_id, username, first_name, last_name):
+        """افزودن کاربر جدید؛ کاربری که پروفایل تازه‌اش در کش است دوباره نوشته نمی‌شود"""
+        if self.profiles.get(user_id) is not None:
             return True
+        try:
+            profile = await self._run(self._add_user, user_id, username, first_name, last_name)
         except Exception as e:
             logger.error(f"Error adding user: {e}")
             return False
-    
-    def save_workout(self, user_id, workout_text, analysis, calories, intensity):
+        self.profiles.put(user_id, profile)
+        return True
+
+    def _add_user(self, conn, user_id, username, first_name, last_name):
+        cur = conn.cursor()
+        cur.execute("""
+            INSERT INTO users (user_id, username, first_name, last_name, last_activity)
+            VALUES (%s, %s, %s, %s, %s)
+            ON CONFLICT (user_id) DO NOTHING
+        """, (user_id, username, first_name, last_name, datetime.now()))
+
+        # ایجاد تنظیمات پیش‌فرض
+        cur.execute("""
+            INSERT INTO user_settings (user_id)
+            VALUES (%s)
+            ON CONFLICT (user_id) DO NOTHING
+        """, (user_id,))
+        profile = self._select_profile(cur, user_id)
+        cur.close()
+        return profile
+
+    async def get_profile(self, user_id):
+        """سطح و تنظیمات کاربر از کش یا دیتابیس؛ برای کاربر ثبت‌نشده یا خطا None"""
+        profile = self.profiles.get(user_id)
+        if profile is not None:
+            return profile
+        try:
+            profile = await self._run(self._get_profile, user_id)
+        except Exception as e:
+            logger.error(f"Error loading user profile: {e}")
+            return None
+        if profile is not None:
+            self.profiles.put(user_id, profile)
+        return profile
+
+    def _get_profile(self, conn, user_id):
+        cur = conn.cursor()
+        profile = self._select_profile(cur, user_id)
+        cur.close()
+        return profile
+
+    def _select_profile(self, cur, user_id):
+        cur.execute("""
+            SELECT COALESCE(u.fitness_level, 'مبتدی'), COALESCE(s.language, 'fa'),
+                   COALESCE(s.notifications, TRUE), s.workout_reminder_time
+            FROM users u LEFT JOIN user_settings s ON s.user_id = u.user_id
+            WHERE u.user_id = %s
+        """, (user_id,))
+        row = cur.fetchone()
+        return None if row is None else UserProfile(*row)
+
+    async def save_workout(self, user_id, workout_text, analysis, calories, intensity, volume=None):
         """ذخیره تمرین در تاریخچه"""
         try:
-            conn = self.get_connection()
-            cur = conn.cursor()
-            cur.execute("""
-                INSERT INTO workout_history (user_id, workout_text, analysis, calories, intensity)
-                VALUES (%s, %s, %s, %s, %s)
-            """, (user_id, workout_text, analysis, calories, intensity))
-            
-            # به‌روزرسانی آخرین فعالیت کاربر
-            cur.execute("""
-                UPDATE users SET last_activity = %s WHERE user_id = %s
-            """, (datetime.now(), user_id))
-            
-            conn.commit()
-            cur.close()
-            conn.close()
-            return True
+            return bool(await self._run(self._save_workout, user_id, workout_text, analysis, calories, intensity, volume))
         except Exception as e:
             logger.error(f"Error saving workout: {e}")
             return False
-    
-    def get_user_history(self, user_id, limit=10):
+
+    def _save_workout(self, conn, user_id, workout_text, analysis, calories, intensity, volume):
+        return self._save_workouts(conn, [(user_id, workout_text, analysis, calories, intensity, datetime.now(), volume)])
+
+    async def save_workouts(self, rows):
+        """ذخیره دسته‌ای تمرینات در یک تراکنش؛ ردیف‌های نوشته‌شده یا None در صورت خطا
+
+        هر سطر به شکل (user_id, workout_text, analysis, calories, intensity, workout_date, volume) است.
+        آمار هفتگی user_stats در همان تراکنش به‌روز می‌شود. ردیفی که خودش قابل نوشتن نیست (مثلاً
+        تمرین کاربری که در users نیست) لاگ و کنار گذاشته می‌شود و بقیه دسته نوشته می‌شوند.
+        """
+        try:
+            return await self._run(self._save_workouts, rows)
+        except Exception as e:
+            logger.error(f"Error saving workout batch of {len(rows)}: {e}")
+            return None
+
+    def _save_workouts(self, conn, rows):
+        cur = conn.cursor()
+        try:
+            self._insert_workouts(cur, rows)
+        except (psycopg2.IntegrityError, psycopg2.DataError):
+            # تراکنش با همین INSERT شروع شده، پس rollback چیز دیگری را از بین نمی‌برد
+            conn.rollback()
+            rows = self._insert_workouts_each(cur, rows)
+        self._add_user_stats(cur, rows)
+        cur.close()
+        return rows
+
+    def _insert_workouts(self, cur, rows):
+        execute_values(cur, """
+            INSERT INTO workout_history (user_id, workout_text, analysis, calories, intensity, workout_date, volume)
+            VALUES %s
+        """, rows, page_size=len(rows))
+
+    def _insert_workouts_each(self, cur, rows):
+        """نوشتن تک‌تک ردیف‌ها، هر کدام با savepoint خودش؛ ردیف‌های نوشته‌شده"""
+        saved = []
+        for row in rows:
+            cur.execute("SAVEPOINT workout")
+            try:
+                self._insert_workouts(cur, [row])
+            except (psycopg2.IntegrityError, psycopg2.DataError) as e:
+                cur.execute("ROLLBACK TO SAVEPOINT workout")
+                logger.error(f"Dropping workout of user {row[0]} from {row[5]}: {e}")
+                continue
+            cur.execute("RELEASE SAVEPOINT workout")
+            saved.append(row)
+        return saved
+
+    async def touch_users(self, activity):
+        """نوشتن آخرین زمان فعالیت کاربران (user_id -> زمان) با یک UPDATE؛ زمان قدیمی‌تر از مقدار فعلی نوشته نمی‌شود"""
+        try:
+            await self._run(self._touch_users, sorted(activity.items()))
+            return True
+        except Exception as e:
+            logger.error(f"Error updating last activity of {len(activity)} users: {e}")
+            return False
+
+    def _touch_users(self, conn, rows):
+        cur = conn.cursor()
+        # ترتیب user_id یکسان تا نوشتن هم‌زمان چند پردازه روی ردیف‌ها بن‌بست نسازد
+        execute_values(cur, """
+            UPDATE users SET last_activity = v.last_activity
+            FROM (VALUES %s) AS v(user_id, last_activity)
+            WHERE users.user_id = v.user_id
+            AND (users.last_activity IS NULL OR users.last_activity < v.last_activity)
+        """, rows, template="(%s::bigint, %s::timestamp)", page_size=len(rows))
+        cur.close()
+
+    async def get_user_history(self, user_id, limit=10):
         """دریافت تاریخچه تمرینات کاربر"""
         try:
-            conn = self.get_connection()
-            cur = conn.cursor(cursor_factory=RealDictCursor)
-            cur.execute("""
-                SELECT * FROM workout_history 
-                WHERE user_id = %s 
-                ORDER BY workout_date DESC 
-                LIMIT %s
-            """, (user_id, limit))
-            history = cur.fetchall()
-            cur.close()
-            conn.close()
-            return history
+            return await self._run(self._get_user_history, user_id, limit)
         except Exception as e:
             logger.error(f"Error getting history: {e}")
             return []
-    
-    def update_user_level(self, user_id, level):
+
+    def _get_user_history(self, conn, user_id, limit):
+        cur = conn.cursor(cursor_factory=RealDictCursor)
+        cur.execute("""
+            SELECT id, user_id, workout_text, analysis, calories, intensity, workout_date
+            FROM workout_history
+            WHERE user_id = %s
+            ORDER BY workout_date DESC
+            LIMIT %s
+        """, (user_id, limit))
+        history = cur.fetchall()
+        cur.close()
+        return history
+
+    async def update_user_level(self, user_id, level):
         """به‌روزرسانی سطح کاربر"""
         try:
-            conn = self.get_connection()
-            cur = conn.cursor()
-            cur.execute("""
-                UPDATE users SET fitness_level = %s WHERE user_id = %s
-            """, (level, user_id))
-            conn.commit()
-            cur.close()
-            conn.close()
-            return True
+            await self._run(self._update_user_level, user_id, level)
         except Exception as e:
             logger.error(f"Error updating user level: {e}")
             return False
+        self.profiles.update(user_id, fitness_level=level)
+        return True
+
+    def _update_user_level(self, conn, user_id, level):
+        cur = conn.cursor()
+        cur.execute("""
+            UPDATE users SET fitness_level = %s WHERE user_id = %s
+        """, (level, user_id))
+        cur.close()
+
+    async def get_reminders(self, day, start, end=None):
+        """کاربرانی که یادآوری روز day را در بازه [start, end) ساعت دارند و هنوز نگرفته‌اند
+
+        end خالی یعنی تا پایان روز. خروجی لیست (user_id, workout_reminder_time) یا None در صورت خطا است.
+        """
+        try:
+            return await self._run(self._get_reminders, day, start, end)
+        except Exception as e:
+            logger.error(f"Error loading reminders: {e}")
+            return None
+
+    def _get_reminders(self, conn, day, start, end):
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT user_id, workout_reminder_time FROM user_settings
+            WHERE notifications AND workout_reminder_time IS NOT NULL
+            AND workout_reminder_time >= %s AND (%s::time IS NULL OR workout_reminder_time < %s)
+            AND (last_reminded_on IS NULL OR last_reminded_on < %s)
+        """, (start, end, end, day))
+        rows = cur.fetchall()
+        cur.close()
+        return rows
+
+    async def claim_reminders(self, user_ids, day):
+        """ثبت یادآوری روز day برای کاربرانی که هنوز نگرفته‌اند؛ فقط همین‌ها (یا None در صورت خطا) برگردانده می‌شوند"""
+        try:
+            return await self._run(self._claim_reminders, user_ids, day)
+        except Exception as e:
+            logger.error(f"Error claiming reminders: {e}")
+            return None
+
+    def _claim_reminders(self, conn, user_ids, day):
+        cur = conn.cursor()
+        cur.execute("""
+            UPDATE user_settings SET last_reminded_on = %s
+            WHERE user_id = ANY(%s) AND notifications
+            AND (last_reminded_on IS NULL OR last_reminded_on < %s)
+            RETURNING user_id
+        """, (day, list(user_ids), day))
+        claimed = [row[0] for row in cur.fetchall()]
+        cur.close()
+        return claimed
+
+    async def set_reminder_time(self, user_id, reminder_time):
+        """تنظیم ساعت یادآوری روزانه (None یعنی خاموش)؛ با ساعت جدید اعلان‌ها روشن می‌شوند"""
+        try:
+            notifications, reminder_time = await self._run(self._set_reminder_time, user_id, reminder_time)
+        except Exception as e:
+            logger.error(f"Error setting reminder time: {e}")
+            return False
+        self.profiles.update(user_id, notifications=notifications, reminder_time=reminder_time)
+        return True
+
+    def _set_reminder_time(self, conn, user_id, reminder_time):
+        cur = conn.cursor()
+        cur.execute("""
+            INSERT INTO user_settings (user_id, workout_reminder_time, notifications)
+            VALUES (%s, %s, TRUE)
+            ON CONFLICT (user_id) DO UPDATE SET
+            workout_reminder_time = EXCLUDED.workout_reminder_time,
+            notifications = user_settings.notifications OR EXCLUDED.workout_reminder_time IS NOT NULL
+            RETURNING notifications, workout_reminder_time
+        """, (user_id, reminder_time))
+        row = cur.fetchone()
+        cur.close()
+        return row
+
+    async def set_notifications(self, user_id, enabled):
+        """روشن یا خاموش کردن اعلان‌ها"""
+        try:
+            await self._run(self._set_notifications, user_id, enabled)
+        except Exception as e:
+            logger.error(f"Error setting notifications: {e}")
+            return False
+        self.profiles.update(user_id, notifications=enabled)
+        return True
+
+    def _set_notifications(self, conn, user_id, enabled):
+        cur = conn.cursor()
+        cur.execute("""
+            UPDATE user_settings SET notifications = %s WHERE user_id = %s
+        """, (enabled, user_id))
+        cur.close()
+
+    async def toggle_notifications(self, user_id):
+        """تغییر وضعیت اعلان‌ها؛ (notifications, workout_reminder_time) جدید یا None"""
+        try:
+            row = await self._run(self._toggle_notifications, user_id)
+        except Exception as e:
+            logger.error(f"Error toggling notifications: {e}")
+            return None
+        if row is not None:
+            self.profiles.update(user_id, notifications=row[0], reminder_time=row[1])
+        return row
+
+    def _toggle_notifications(self, conn, user_id):
+        cur = conn.cursor()
+        cur.execute("""
+            UPDATE user_settings SET notifications = NOT COALESCE(notifications, TRUE)
+            WHERE user_id = %s
+            RETURNING notifications, workout_reminder_time
+        """, (user_id,))
+        row = cur.fetchone()
+        cur.close()
+        return row
+
+    def _add_user_stats(self, cur, rows):
+        """افزودن تمرینات به ردیف هفته خودشان در user_stats
+
+        ردیف هفته جدید مجموع‌ها و streak را از آخرین ردیف قبلی کاربر ادامه می‌دهد. تمرینی که
+        در هفته‌ای قدیمی‌تر از آخرین ردیف کاربر ثبت شود مجموع‌های هفته‌های بعد را به‌روز
+        نمی‌کند؛ repair_stats.py آن را درست می‌کند.
+        """
+        weeks = {}
+        for user_id, _, _, calories, _, workout_date, volume in rows:
+            day = workout_date.date()
+            key = (user_id, day - timedelta(days=day.weekday()))
+            sessions, total_calories, total_volume, active_days, last_workout = weeks.get(key, (0, 0, 0, 0, workout_date))
+            weeks[key] = (
+                sessions + 1,
+                total_calories + (calories or 0),
+                total_volume + (volume or 0),
+                active_days | (1 << day.weekday()),
+                max(last_workout, workout_date),
+            )
+        # هر هفته جدا و به ترتیب، تا ردیف هفته بعد ادامه ردیفی باشد که همین دسته ساخته
+        by_week = {}
+        for (user_id, week_start), value in weeks.items():
+            by_week.setdefault(week_start, []).append((user_id, week_start) + value)
+        for week_start in sorted(by_week):
+            self._upsert_user_stats(cur, by_week[week_start])
+
+    def _upsert_user_stats(self, cur, values):
+        execute_values(cur, """
+            INSERT INTO user_stats (user_id, week_start, sessions, calories, volume, active_days, last_workout,
+                                    total_sessions, total_calories, total_volume, streak_weeks)
+            SELECT v.user_id, v.week_start, v.sessions, v.calories, v.volume, v.active_days, v.last_workout,
+                   COALESCE(p.total_sessions, 0) + v.sessions,
+                   COALESCE(p.total_calories, 0) + v.calories,
+                   COALESCE(p.total_volume, 0) + v.volume,
+                   CASE WHEN p.week_start = v.week_start - 7 THEN p.streak_weeks + 1 ELSE 1 END
+            FROM (VALUES %s) AS v(user_id, week_start, sessions, calories, volume, active_days, last_workout)
+            LEFT JOIN LATERAL (
+                SELECT week_start, total_sessions, total_calories, total_volume, streak_weeks
+                FROM user_stats s
+                WHERE s.user_id = v.user_id AND s.week_start < v.week_start
+                ORDER BY s.week_start DESC
+                LIMIT 1
+            ) p ON TRUE
+            ON CONFLICT (user_id, week_start) DO UPDATE SET
+            sessions = user_stats.sessions + EXCLUDED.sessions,
+            calories = user_stats.calories + EXCLUDED.calories,
+            volume = user_stats.volume + EXCLUDED.volume,
+            active_days = user_stats.active_days | EXCLUDED.active_days,
+            last_workout = GREATEST(user_stats.last_workout, EXCLUDED.last_workout),
+            total_sessions = user_stats.total_sessions + EXCLUDED.sessions,
+            total_calories = user_stats.total_calories + EXCLUDED.calories,
+            total_volume = user_stats.total_volume + EXCLUDED.volume
+        """, values,
+            template="(%s::bigint, %s::date, %s::int, %s::bigint, %s::bigint, %s::smallint, %s::timestamp)",
+            page_size=len(values))
+
+    async def get_user_stats(self, user_id):
+        """آخرین ردیف آمار هفتگی کاربر (یک جستجو روی کلید اصلی) یا None"""
+        try:
+            return await self._run(self._get_user_stats, user_id)
+        except Exception as e:
+            logger.error(f"Error getting user stats: {e}")
+            return None
+
+    def _get_user_stats(self, conn, user_id):
+        cur = conn.cursor(cursor_factory=RealDictCursor)
+        cur.execute("""
+            SELECT week_start, sessions, calories, volume, active_days, last_workout,
+                   total_sessions, total_calories, total_volume, streak_weeks
+            FROM user_stats
+            WHERE user_id = %s
+            ORDER BY week_start DESC
+            LIMIT 1
+        """, (user_id,))
+        stats = cur.fetchone()
+        cur.close()
+        return stats
+
+    async def fold_user_history(self, user_id, fold, chunk_size=500):
+        """عبور دادن همه تمرینات کاربر به ترتیب تاریخ به await fold(rows)؛ تعداد ردیف‌ها یا None با خطای دیتابیس
+
+        ردیف‌ها (workout_date, workout_text, calories, volume) با cursor سمت سرور در دسته‌های
+        chunk_size خوانده می‌شوند و هر بار فقط یک دسته در حافظه است. fold روی event loop اجرا
+        می‌شود (و می‌تواند پارس را به استخر کار بدهد) و thread دیتابیس تا تمام شدن fold هر دسته
+        منتظر می‌ماند و بعد دسته بعد را می‌خواند. خطای خود fold به فراخواننده می‌رسد.
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            return await self._run(self._fold_user_history, user_id, fold, chunk_size, loop)
+        except psycopg2.Error as e:
+            logger.error(f"Error folding user history: {e}")
+            return None
+
+    def _fold_user_history(self, conn, user_id, fold, chunk_size, loop):
+        cur = conn.cursor(name="fold_user_history")
+        cur.itersize = chunk_size
+        cur.execute("""
+            SELECT workout_date, workout_text, calories, volume
+            FROM workout_history
+            WHERE user_id = %s
+            ORDER BY workout_date
+        """, (user_id,))
+        count = 0
+        while True:
+            rows = cur.fetchmany(chunk_size)
+            if not rows:
+                break
+            asyncio.run_coroutine_threadsafe(fold(rows), loop).result()
+            count += len(rows)
+        cur.close()
+        return count
+
+    async def export_user_history(self, user_id, sink, chunk_size=500):
+        """نوشتن همه تمرینات کاربر به ترتیب تاریخ در sink.add؛ تعداد ردیف‌ها یا None در صورت خطا
+
+        ستون‌ها: workout_date, workout_text, calories, intensity, volume, analysis
+        """
+        try:
+            return await self._run(self._export_user_history, user_id, sink, chunk_size)
+        except Exception as e:
+            logger.error(f"Error exporting user history: {e}")
+            return None
+
+    def _export_user_history(self, conn, user_id, sink, chunk_size):
+        cur = conn.cursor(name="export_user_history")
+        cur.itersize = chunk_size
+        cur.execute("""
+            SELECT workout_date, workout_text, calories, intensity, volume, analysis
+            FROM workout_history
+            WHERE user_id = %s
+            ORDER BY workout_date
+        """, (user_id,))
+        rows = 0
+        for row in cur:
+            sink.add(row)
+            rows += 1
+        cur.close()
+        return rows
+
+    async def rebuild_user_stats(self, user_ids=None):
+        """بازسازی user_stats از workout_history برای این کاربران (None یعنی همه)؛ تعداد ردیف‌ها"""
+        try:
+            return await self._run(self._rebuild_user_stats, user_ids)
+        except Exception as e:
+            logger.error(f"Error rebuilding user stats: {e}")
+            return None
+
+    def _rebuild_user_stats(self, conn, user_ids):
+        cur = conn.cursor()
+        if user_ids is None:
+            # نوشتن‌های هم‌زمان تا پایان بازسازی منتظر می‌مانند تا چیزی دو بار یا هیچ بار شمرده نشود
+            cur.execute("LOCK TABLE user_stats IN SHARE ROW EXCLUSIVE MODE")
+            cur.execute("DELETE FROM user_stats")
+            cur.execute(f"INSERT INTO user_stats {_USER_STATS_FROM_HISTORY.format(where='')}")
+        else:
+            user_ids = list(user_ids)
+            cur.execute("DELETE FROM user_stats WHERE user_id = ANY(%s)", (user_ids,))
+            cur.execute(f"INSERT INTO user_stats {_USER_STATS_FROM_HISTORY.format(where='AND user_id = ANY(%s)')}",
+                        (user_ids,))
+        count = cur.rowcount
+        cur.close()
+        return count
+
+    async def find_stale_user_stats(self):
+        """کاربرانی که user_stats آن‌ها با بازسازی از تاریخچه یکی نیست"""
+        try:
+            return await self._run(self._find_stale_user_stats)
+        except Exception as e:
+            logger.error(f"Error checking user stats: {e}")
+            return None
+
+    def _find_stale_user_stats(self, conn):
+        cur = conn.cursor()
+        cur.execute(f"""
+            WITH expected AS ({_USER_STATS_FROM_HISTORY.format(where='')})
+            SELECT DISTINCT COALESCE(e.user_id, s.user_id)
+            FROM expected e
+            FULL OUTER JOIN user_stats s ON s.user_id = e.user_id AND s.week_start = e.week_start
+            WHERE (e.sessions, e.calories, e.volume, e.active_days, e.last_workout,
+                   e.total_sessions, e.total_calories, e.total_volume, e.streak_weeks)
+            IS DISTINCT FROM
+                  (s.sessions, s.calories, s.volume, s.active_days, s.last_workout,
+                   s.total_sessions, s.total_calories, s.total_volume, s.streak_weeks)
+        """)
+        user_ids = [row[0] for row in cur.fetchall()]
+        cur.close()
+        return user_ids
+
+
+# آمار هفتگی کامل از تاریخچه خام؛ مجموع‌ها با window و streak با شماره‌گذاری هفته‌های پشت سر هم
+_USER_STATS_FROM_HISTORY = """
+    SELECT user_id, week_start, sessions, calories, volume, active_days, last_workout,
+           SUM(sessions) OVER w AS total_sessions, SUM(calories) OVER w AS total_calories,
+           SUM(volume) OVER w AS total_volume,
+           ROW_NUMBER() OVER (PARTITION BY user_id, streak_group ORDER BY week_start) AS streak_weeks
+    FROM (
+        SELECT *, week_start - 7 * ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY week_start)::int AS streak_group
+        FROM (
+            SELECT user_id, date_trunc('week', workout_date)::date AS week_start,
+                   COUNT(*) AS sessions, COALESCE(SUM(calories), 0) AS calories,
+                   COALESCE(SUM(volume), 0) AS volume,
+                   BIT_OR(1 << (EXTRACT(ISODOW FROM workout_date)::int - 1))::smallint AS active_days,
+                   MAX(workout_date) AS last_workout
+            FROM workout_history
+            WHERE user_id IS NOT NULL AND workout_date IS NOT NULL {where}
+            GROUP BY 1, 2
+        ) weeks
+    ) numbered
+    WINDOW w AS (PARTITION BY user_id ORDER BY week_start)
+"""
@@ -0,0 +1,227 @@
+"""واژه‌نامه مشترک حرکات ورزشی
+
+همه نام‌ها، معادل‌ها، دسته‌ها و نواحی بدن از exercise_lexicon.json خوانده می‌شوند و
+در یک اتوماتای Aho-Corasick کامپایل می‌شوند تا هر متن فقط یک بار اسکن شود.
+اتوماتای ساخته‌شده در فایل کش ذخیره می‌شود و تا وقتی فایل واژه‌نامه تغییر نکرده،
+در راه‌اندازی دوباره ساخته نمی‌شود.
+
+افزودن حرکت یا معادل جدید نیازی به تغییر کد ندارد:
+    python exercise_lexicon.py add aliases شنا "push-up"
+    python exercise_lexicon.py add categories هوازی "شنای آزاد"
+"""
+import argparse
+import hashlib
+import json
+import os
+import logging
+from collections import deque
+from typing import Dict, List, Optional, Set
+
+from config import LEXICON_PATH, LEXICON_CACHE_PATH
+
+logger = logging.getLogger(__name__)
+
+# نوع هر گروه در فایل واژه‌نامه؛ ترتیب برچسب‌ها داخل هر گروه اولویت آن‌هاست
+GROUPS = ("categories", "aliases", "body_regions", "focus_areas")
+CACHE_FORMAT = 1
+
+_default_lexicon = None
+
+
+class ExerciseLexicon:
+    def __init__(self, data: Dict[str, Dict[str, List[str]]], source_hash: str = "", tables: Optional[Dict] = None):
+        self.data = data
+        self.source_hash = source_hash
+        self.categories = data.get("categories", {})
+        self.aliases = data.get("aliases", {})
+        if tables is None:
+            tables = self._build(data)
+        self._goto = tables["goto"]
+        self._fail = tables["fail"]
+        self._out = tables["out"]
+        # هر برچسب: (گروه، نام برچسب، اولویت)
+        self._tags = [tuple(tag) for tag in tables["tags"]]
+
+    @staticmethod
+    def _build(data) -> Dict:
+        """ساخت جدول‌های goto/fail/output اتوماتا"""
+        tags = []
+        patterns = {}
+        for group in GROUPS:
+            for rank, (label, keywords) in enumerate(data.get(group, {}).items()):
+                tag_id = len(tags)
+                tags.append((group, label, rank))
+                for keyword in keywords:
+                    patterns.setdefault(keyword, set()).add(tag_id)
+
+        goto = [{}]
+        out = [set()]
+        for keyword, tag_ids in patterns.items():
+            state = 0
+            for ch in keyword:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][ch] = nxt
+                    goto.append({})
+                    out.append(set())
+                state = nxt
+            out[state] |= tag_ids
+
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in goto[state].items():
+                queue.append(nxt)
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(ch, 0)
+                out[nxt] |= out[fail[nxt]]
+
+        return {
+            "goto": goto,
+            "fail": fail,
+            "out": [sorted(tag_ids) for tag_ids in out],
+            "tags": tags,
+        }
+
+    def tables(self) -> Dict:
+        return {"goto": self._goto, "fail": self._fail, "out": self._out, "tags": self._tags}
+
+    def scan(self, text: str) -> Set[int]:
+        """شناسه همه برچسب‌هایی که کلیدواژه‌شان در متن آمده، در یک عبور خطی"""
+        goto, fail, out = self._goto, self._fail, self._out
+        found = set()
+        state = 0
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                found.update(out[state])
+        return found
+
+    def _best(self, found: Set[int], group: str) -> Optional[str]:
+        best = None
+        for tag_id in found:
+            tag_group, label, rank = self._tags[tag_id]
+            if tag_group == group and (best is None or rank < best[1]):
+                best = (label, rank)
+        return best[0] if best else None
+
+    def category(self, text: str, default: str = "سایر") -> str:
+        """اولین دسته (به ترتیب واژه‌نامه) که یکی از حرکاتش در متن آمده"""
+        return self._best(self.scan(text), "categories") or default
+
+    def canonical_name(self, text: str) -> Optional[str]:
+        """نام استاندارد حرکت بر اساس معادل‌ها"""
+        return self._best(self.scan(text), "aliases")
+
+    def body_regions(self, text: str) -> Set[str]:
+        """همه نواحی بدن (upper/lower/core) که متن به آن‌ها اشاره دارد"""
+        return {self._tags[t][1] for t in self.scan(text) if self._tags[t][0] == "body_regions"}
+
+    def focus_area(self, text: str) -> Optional[str]:
+        """ناحیه تمرکز با بالاترین اولویت"""
+        return self._best(self.scan(text), "focus_areas")
+
+    def lookup(self, text: str) -> Dict[str, object]:
+        """همه اطلاعات واژه‌نامه برای یک متن با یک اسکن"""
+        found = self.scan(text)
+        return {
+            "category": self._best(found, "categories") or "سایر",
+            "canonical_name": self._best(found, "aliases"),
+            "body_regions": {self._tags[t][1] for t in found if self._tags[t][0] == "body_regions"},
+            "focus_area": self._best(found, "focus_areas"),
+        }
+
+    @classmethod
+    def load(cls, path: str = LEXICON_PATH, cache_path: Optional[str] = LEXICON_CACHE_PATH) -> "ExerciseLexicon":
+        """خواندن واژه‌نامه؛ اگر کش معتبر باشد اتوماتا از آن بارگذاری می‌شود"""
+        with open(path, "rb") as f:
+            raw = f.read()
+        source_hash = hashlib.sha256(raw).hexdigest()
+        data = json.loads(raw.decode("utf-8"))
+
+        if cache_path and os.path.exists(cache_path):
+            try:
+                with open(cache_path, encoding="utf-8") as f:
+                    cached = json.load(f)
+                if cached.get("format") == CACHE_FORMAT and cached.get("source_hash") == source_hash:
+                    tables = cached["tables"]
+                    tables["goto"] = [{ch: int(nxt) for ch, nxt in row.items()} for row in tables["goto"]]
+                    return cls(data, source_hash, tables)
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning(f"Ignoring unreadable lexicon cache {cache_path}: {e}")
+
+        lexicon = cls(data, source_hash)
+        if cache_path:
+            lexicon.save_cache(cache_path)
+        return lexicon
+
+    def save_cache(self, cache_path: str = LEXICON_CACHE_PATH):
+        """ذخیره اتوماتای ساخته‌شده"""
+        payload = {"format": CACHE_FORMAT, "source_hash": self.source_hash, "tables": self.tables()}
+        tmp_path = f"{cache_path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(payload, f, ensure_ascii=False, separators=(",", ":"))
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            logger.warning(f"Could not write lexicon cache {cache_path}: {e}")
+
+
+def get_lexicon() -> ExerciseLexicon:
+    """نمونه مشترک واژه‌نامه برای همه تحلیلگرها"""
+    global _default_lexicon
+    if _default_lexicon is None:
+        _default_lexicon = ExerciseLexicon.load()
+    return _default_lexicon
+
+
+def add_entry(group: str, label: str, keyword: str, path: str = LEXICON_PATH):
+    """افزودن یک کلیدواژه به واژه‌نامه؛ برچسب جدید در انتهای گروه (کمترین اولویت) قرار می‌گیرد"""
+    if group not in GROUPS:
+        raise ValueError(f"Unknown lexicon group: {group}")
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    keywords = data.setdefault(group, {}).setdefault(label, [])
+    if keyword not in keywords:
+        keywords.append(keyword)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(_format_lexicon(data))
+
+
+def _format_lexicon(data) -> str:
+    """هر برچسب در یک خط، تا فایل واژه‌نامه با دست هم قابل ویرایش بماند"""
+    groups = []
+    for group, labels in data.items():
+        rows = ",\n".join(
+            f"    {json.dumps(label, ensure_ascii=False)}: {json.dumps(keywords, ensure_ascii=False)}"
+            for label, keywords in labels.items()
+        )
+        groups.append(f"  {json.dumps(group)}: {{\n{rows}\n  }}")
+    return "{\n" + ",\n".join(groups) + "\n}\n"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("build", help="ساخت دوباره فایل کش اتوماتا")
+    add = sub.add_parser("add", help="افزودن حرکت یا معادل")
+    add.add_argument("group", choices=GROUPS)
+    add.add_argument("label")
+    add.add_argument("keyword")
+    args = parser.parse_args()
+
+    if args.command == "add":
+        add_entry(args.group, args.label, args.keyword)
+    lexicon = ExerciseLexicon.load(cache_path=None)
+    lexicon.save_cache()
+    print(f"lexicon compiled: {len(lexicon.tables()['goto'])} states, {len(lexicon.tables()['tags'])} tags")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+import asyncio
+import csv
+import json
+import os
+import tempfile
+import time
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Set, Tuple
+import logging
+
+from aiogram import types
+from fpdf import FPDF
+
+from config import (
+    EXPORT_MAX_CONCURRENT, EXPORT_CACHE_SIZE, EXPORT_PDF_FONT, EXPORT_PDF_MAX_SESSIONS
+)
+from metrics import EXPORTS, EXPORT_SECONDS
+from work_pool import WorkCancelled
+from responses import (
+    NO_HISTORY, EXPORT_FAILED, EXPORT_PDF_TITLE, export_caption, export_pdf_entry, export_pdf_summary
+)
+
+logger = logging.getLogger(__name__)
+
+# ترتیب ستون‌ها همان ترتیب Database.export_user_history است
+COLUMNS = ("workout_date", "workout_text", "calories", "intensity", "volume", "analysis")
+FORMATS = ("csv", "json", "pdf")
+# خطوط بلندتر از عرض صفحه در PDF کوتاه می‌شوند
+PDF_LINE_CHARS = 90
+
+
+class CsvSink:
+    """نوشتن ردیف‌ها در CSV به محض رسیدن از cursor"""
+
+    def __init__(self, stream):
+        self.writer = csv.writer(stream)
+        self.writer.writerow(COLUMNS)
+        self.rows = 0
+
+    def add(self, row):
+        self.writer.writerow((row[0].isoformat(sep=" ", timespec="seconds"),) + tuple(row[1:]))
+        self.rows += 1
+
+    def close(self):
+        pass
+
+
+class JsonSink:
+    """آرایه JSON که عضو به عضو نوشته می‌شود"""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.rows = 0
+        stream.write("[")
+
+    def add(self, row):
+        item = dict(zip(COLUMNS, row), workout_date=row[0].isoformat(timespec="seconds"))
+        self.stream.write(",\n" if self.rows else "\n")
+        json.dump(item, self.stream, ensure_ascii=False)
+        self.rows += 1
+
+    def close(self):
+        self.stream.write("\n]\n")
+
+
+def render_pdf(csv_path: str, pdf_path: str, font_path: str = EXPORT_PDF_FONT, max_sessions: int = EXPORT_PDF_MAX_SESSIONS):
+    """ساخت PDF از CSV خروجی؛ در پردازه جدا اجرا می‌شود
+
+    CSV ردیف به ردیف خوانده می‌شود و فقط max_sessions جلسه آخر در PDF می‌آیند (جمع کل از همه
+    جلسات است)؛ تاریخچه کامل در خروجی CSV/JSON است. هر خط با cell جدا نوشته می‌شود چون
+    شکست خط multi_cell متن فارسی را برای هر حرف دوباره shape می‌کند.
+    """
+    sessions = calories = volume = 0
+    recent = deque(maxlen=max_sessions)
+    with open(csv_path, encoding="utf-8-sig", newline="") as stream:
+        reader = csv.reader(stream)
+        next(reader)
+        for row in reader:
+            sessions += 1
+            calories += int(row[2] or 0)
+            volume += int(row[4] or 0)
+            recent.append(row)
+
+    pdf = FPDF()
+    pdf.set_auto_page_break(True, margin=15)
+    pdf.add_font("body", fname=font_path)
+    pdf.set_text_shaping(True)
+    pdf.add_page()
+    pdf.set_font("body", size=16)
+    pdf.cell(0, 12, EXPORT_PDF_TITLE, align="R", new_x="LMARGIN", new_y="NEXT")
+    pdf.set_font("body", size=12)
+    pdf.cell(0, 8, export_pdf_summary(sessions, calories, volume), align="R", new_x="LMARGIN", new_y="NEXT")
+    pdf.ln(4)
+
+    for workout_date, workout_text, row_calories, intensity, row_volume, _ in reversed(recent):
+        pdf.set_font("body", size=11)
+        pdf.cell(0, 7, export_pdf_entry(workout_date[:16], row_calories or "-", intensity or "-", row_volume or "-"),
+                 align="R", new_x="LMARGIN", new_y="NEXT")
+        pdf.set_font("body", size=10)
+        for line in workout_text.splitlines():
+            pdf.cell(0, 6, line[:PDF_LINE_CHARS], align="R", new_x="LMARGIN", new_y="NEXT")
+        pdf.ln(3)
+    pdf.output(pdf_path)
+
+
+class Exporter:
+    """خروجی CSV/JSON/PDF تاریخچه تمرین کاربر به صورت سند تلگرام
+
+    ردیف‌ها از cursor سمت سرور مستقیم در فایل موقت نوشته می‌شوند و PDF در استخر پردازه
+    WorkPool از روی همان CSV ساخته می‌شود، پس نه حافظه ربات و نه event loop درگیر حجم تاریخچه نیست.
+    حداکثر max_concurrent خروجی هم‌زمان ساخته می‌شود (بقیه منتظر می‌مانند) تا اتصال‌های
+    دیتابیس و پهنای آپلود برای پیام‌های عادی بماند. file_id سند آپلودشده تا تمرین بعدی
+    کاربر نگه داشته می‌شود و درخواست دوباره بدون ساختن فایل فرستاده می‌شود.
+    """
+
+    def __init__(self, db, bot, pool, max_concurrent=EXPORT_MAX_CONCURRENT, cache_size=EXPORT_CACHE_SIZE):
+        self.db = db
+        self.bot = bot
+        self.pool = pool
+        self.max_concurrent = max_concurrent
+        self.cache_size = cache_size
+        self._semaphore = None
+        # user_id -> {format: file_id}
+        self._file_ids: "OrderedDict[int, Dict[str, str]]" = OrderedDict()
+        self._tasks: Dict[Tuple[int, str], asyncio.Task] = {}
+        self._stale: Set[Tuple[int, str]] = set()
+        self._closing = False
+
+    @property
+    def pending(self) -> int:
+        return len(self._tasks)
+
+    def start(self):
+        self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        logger.info(f"Exporter started (max {self.max_concurrent} concurrent exports)")
+
+    async def close(self, timeout: float = 30):
+        """توقف پذیرش و انتظار برای خروجی‌های در حال ساخت؛ بعد از timeout لغو می‌شوند"""
+        self._closing = True
+        tasks = list(self._tasks.values())
+        if tasks:
+            done, running = await asyncio.wait(tasks, timeout=timeout)
+            for task in running:
+                task.cancel()
+            if running:
+                logger.warning(f"Cancelled {len(running)} exports on shutdown")
+                await asyncio.wait(running)
+        logger.info("Exporter stopped")
+
+    def invalidate(self, user_ids: Iterable[int]):
+        """تمرین جدید کاربر ذخیره شده؛ فایل‌های قبلی دیگر به‌روز نیستند"""
+        for user_id in user_ids:
+            self._file_ids.pop(user_id, None)
+            for key in self._tasks:
+                if key[0] == user_id:
+                    self._stale.add(key)
+
+    def submit(self, chat_id: int, user_id: int, fmt: str) -> bool:
+        """شروع خروجی در پس‌زمینه؛ اگر همین خروجی در حال ساخت باشد False"""
+        key = (user_id, fmt)
+        if self._closing or key in self._tasks:
+            return False
+        task = asyncio.create_task(self._export(chat_id, user_id, fmt))
+        self._tasks[key] = task
+        task.add_done_callback(lambda _: self._done(key))
+        return True
+
+    def _done(self, key):
+        del self._tasks[key]
+        self._stale.discard(key)
+
+    async def _export(self, chat_id: int, user_id: int, fmt: str):
+        file_id = self._file_ids.get(user_id, {}).get(fmt)
+        if file_id is not None:
+            self._file_ids.move_to_end(user_id)
+            try:
+                await self.bot.send_document(chat_id, file_id)
+                EXPORTS.labels(fmt, "cached").inc()
+                return
+            except Exception as e:
+                # file_id منقضی شده یا نامعتبر است؛ فایل دوباره ساخته می‌شود
+                logger.warning(f"Cached export for {user_id} failed, rebuilding: {e}")
+                self._file_ids.get(user_id, {}).pop(fmt, None)
+
+        async with self._semaphore:
+            started = time.perf_counter()
+            paths = []
+            try:
+                rows, path = await self._build(user_id, fmt, paths)
+                if rows == 0:
+                    EXPORTS.labels(fmt, "empty").inc()
+                    await self.bot.send_message(chat_id, NO_HISTORY)
+                    return
+                filename = f"moraby_{user_id}_{datetime.now():%Y%m%d}.{fmt}"
+                message = await self.bot.send_document(
+                    chat_id, types.InputFile(path, filename=filename), caption=export_caption(rows)
+                )
+            except asyncio.CancelledError:
+                raise
+            except WorkCancelled:
+                EXPORTS.labels(fmt, "cancelled").inc()
+                return
+            except Exception as e:
+                EXPORTS.labels(fmt, "failed").inc()
+                logger.error(f"Error exporting {fmt} for {user_id}: {e}")
+                await self.bot.send_message(chat_id, EXPORT_FAILED)
+                return
+            finally:
+                for temp_path in paths:
+                    os.unlink(temp_path)
+            EXPORT_SECONDS.labels(fmt).observe(time.perf_counter() - started)
+            EXPORTS.labels(fmt, "sent").inc()
+
+        if (user_id, fmt) not in self._stale:
+            self._file_ids.setdefault(user_id, {})[fmt] = message.document.file_id
+            self._file_ids.move_to_end(user_id)
+            while len(self._file_ids) > self.cache_size:
+                self._file_ids.popitem(last=False)
+
+    def _temp_path(self, suffix: str, paths: list) -> str:
+        fd, path = tempfile.mkstemp(prefix="moraby_export_", suffix=suffix)
+        os.close(fd)
+        paths.append(path)
+        return path
+
+    async def _build(self, user_id: int, fmt: str, paths: list) -> Tuple[int, Optional[str]]:
+        """نوشتن فایل خروجی؛ (تعداد ردیف‌ها، مسیر فایل). مسیرهای موقت به paths اضافه می‌شوند"""
+        data_path = self._temp_path(".json" if fmt == "json" else ".csv", paths)
+        # BOM تا اکسل متن فارسی CSV را درست نشان دهد
+        encoding = "utf-8" if fmt == "json" else "utf-8-sig"
+        with open(data_path, "w", encoding=encoding, newline="") as stream:
+            sink = JsonSink(stream) if fmt == "json" else CsvSink(stream)
+            rows = await self.db.export_user_history(user_id, sink)
+            if rows is None:
+                raise RuntimeError("database export failed")
+            sink.close()
+        if fmt != "pdf" or rows == 0:
+            return rows, data_path
+
+        pdf_path = self._temp_path(".pdf", paths)
+        await self.pool.run_cpu(render_pdf, data_path, pdf_path, user_id=user_id)
+        return rows, pdf_path
@@ -0,0 +1,256 @@
+import asyncio
+import copy
+import json
+import sqlite3
+import time
+import typing
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import logging
+
+from aiogram.dispatcher.storage import BaseStorage
+
+from config import FSM_TTL, FSM_MAX_KEYS, FSM_SQLITE_PATH
+
+logger = logging.getLogger(__name__)
+
+
+class BoundedMemoryStorage(BaseStorage):
+    """ذخیره‌ساز حالت در حافظه با TTL برای هر کلید و سقف تعداد کلیدها
+
+    برخلاف MemoryStorage، خواندن حالت کاربری که حالتی ندارد چیزی در حافظه نمی‌سازد و
+    کلیدی که حالت و داده‌اش خالی شود حذف می‌شود. TTL از آخرین نوشتن حساب می‌شود، پس
+    کاربری که «ثبت برنامه تمرینی» را زده و جواب نداده بعد از ttl ثانیه پاک می‌شود.
+    """
+
+    def __init__(self, ttl: float = FSM_TTL, max_keys: int = FSM_MAX_KEYS):
+        self.ttl = ttl
+        self.max_keys = max_keys
+        # key -> (expires_at, state, data)؛ به ترتیب آخرین نوشتن، پس قدیمی‌ترین اول است
+        self._entries = OrderedDict()
+        self.evictions = 0
+        self.expirations = 0
+
+    async def close(self):
+        self._entries.clear()
+
+    async def wait_closed(self):
+        pass
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _key(self, chat, user):
+        chat, user = self.check_address(chat=chat, user=user)
+        return f"{chat}:{user}"
+
+    def _get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None, {}
+        if entry[0] <= time.monotonic():
+            del self._entries[key]
+            self.expirations += 1
+            return None, {}
+        return entry[1], entry[2]
+
+    def _put(self, key, state, data):
+        if state is None and not data:
+            self._entries.pop(key, None)
+            return
+        now = time.monotonic()
+        self._entries[key] = (now + self.ttl, state, data)
+        self._entries.move_to_end(key)
+        self._purge(now)
+
+    def _purge(self, now):
+        entries = self._entries
+        while entries:
+            key, entry = next(iter(entries.items()))
+            if entry[0] > now and len(entries) <= self.max_keys:
+                break
+            entries.popitem(last=False)
+            if entry[0] > now:
+                self.evictions += 1
+            else:
+                self.expirations += 1
+
+    async def get_state(self, *,
+                        chat: typing.Union[str, int, None] = None,
+                        user: typing.Union[str, int, None] = None,
+                        default: typing.Optional[str] = None) -> typing.Optional[str]:
+        state, _ = self._get(self._key(chat, user))
+        return state if state is not None else self.resolve_state(default)
+
+    async def get_data(self, *,
+                       chat: typing.Union[str, int, None] = None,
+                       user: typing.Union[str, int, None] = None,
+                       default: typing.Optional[dict] = None) -> typing.Dict:
+        _, data = self._get(self._key(chat, user))
+        return copy.deepcopy(data) if data else (default or {})
+
+    async def set_state(self, *,
+                        chat: typing.Union[str, int, None] = None,
+                        user: typing.Union[str, int, None] = None,
+                        state: typing.AnyStr = None):
+        key = self._key(chat, user)
+        _, data = self._get(key)
+        self._put(key, self.resolve_state(state), data)
+
+    async def set_data(self, *,
+                       chat: typing.Union[str, int, None] = None,
+                       user: typing.Union[str, int, None] = None,
+                       data: typing.Dict = None):
+        key = self._key(chat, user)
+        state, _ = self._get(key)
+        self._put(key, state, copy.deepcopy(data) if data else {})
+
+    async def update_data(self, *,
+                          chat: typing.Union[str, int, None] = None,
+                          user: typing.Union[str, int, None] = None,
+                          data: typing.Dict = None, **kwargs):
+        key = self._key(chat, user)
+        state, current = self._get(key)
+        current = dict(current)
+        current.update(data or {}, **kwargs)
+        self._put(key, state, current)
+
+    def has_bucket(self):
+        return False
+
+
+class SQLiteStorage(BaseStorage):
+    """ذخیره‌ساز حالت روی SQLite محلی
+
+    حالت‌ها بعد از ری‌استارت باقی می‌مانند و چند پردازه روی یک ماشین می‌توانند یک فایل را
+    به اشتراک بگذارند (حالت WAL). کلیدهای منقضی و کلیدهای بیش از max_keys هر
+    purge_every نوشتن یک بار پاک می‌شوند. همه فراخوانی‌های sqlite3 به ترتیب در یک thread جدا
+    اجرا می‌شوند، پس انتظار برای قفل فایل که پردازه دیگری گرفته (تا busy_timeout) فقط همان
+    عملیات را معطل می‌کند و event loop بقیه کاربران را بلاک نمی‌کند.
+    """
+
+    def __init__(self, path: str = FSM_SQLITE_PATH, ttl: float = FSM_TTL, max_keys: int = FSM_MAX_KEYS,
+                 purge_every: int = 1000):
+        self.path = path
+        self.ttl = ttl
+        self.max_keys = max_keys
+        self.purge_every = purge_every
+        self._writes = 0
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="fsm")
+        self._conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS fsm_state (
+                key TEXT PRIMARY KEY,
+                state TEXT,
+                data TEXT,
+                expires_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS fsm_state_expires ON fsm_state (expires_at)")
+
+    async def close(self):
+        await self._call(self._conn.close)
+        self._executor.shutdown()
+
+    async def wait_closed(self):
+        pass
+
+    async def _call(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    def __len__(self):
+        return self._conn.execute("SELECT COUNT(*) FROM fsm_state WHERE expires_at > ?", (time.time(),)).fetchone()[0]
+
+    def _key(self, chat, user):
+        chat, user = self.check_address(chat=chat, user=user)
+        return f"{chat}:{user}"
+
+    def _get(self, key):
+        row = self._conn.execute(
+            "SELECT state, data FROM fsm_state WHERE key = ? AND expires_at > ?",
+            (key, time.time())
+        ).fetchone()
+        if row is None:
+            return None, {}
+        return row[0], json.loads(row[1]) if row[1] else {}
+
+    def _put(self, key, state, data):
+        if state is None and not data:
+            self._conn.execute("DELETE FROM fsm_state WHERE key = ?", (key,))
+            return
+        self._conn.execute(
+            "INSERT OR REPLACE INTO fsm_state (key, state, data, expires_at) VALUES (?, ?, ?, ?)",
+            (key, state, json.dumps(data, ensure_ascii=False) if data else None, time.time() + self.ttl)
+        )
+        self._writes += 1
+        if self._writes % self.purge_every == 0:
+            self.purge()
+
+    def purge(self):
+        """حذف کلیدهای منقضی و قدیمی‌ترین کلیدهای بیش از سقف"""
+        self._conn.execute("DELETE FROM fsm_state WHERE expires_at <= ?", (time.time(),))
+        self._conn.execute("""
+            DELETE FROM fsm_state WHERE key IN (
+                SELECT key FROM fsm_state ORDER BY expires_at DESC LIMIT -1 OFFSET ?
+            )
+        """, (self.max_keys,))
+
+    # هر عملیات خواندن و نوشتن با هم در یک فراخوانی thread
+    def _set_state(self, key, state):
+        _, data = self._get(key)
+        self._put(key, state, data)
+
+    def _set_data(self, key, data):
+        state, _ = self._get(key)
+        self._put(key, state, data)
+
+    def _update_data(self, key, data):
+        state, current = self._get(key)
+        current.update(data)
+        self._put(key, state, current)
+
+    async def get_state(self, *,
+                        chat: typing.Union[str, int, None] = None,
+                        user: typing.Union[str, int, None] = None,
+                        default: typing.Optional[str] = None) -> typing.Optional[str]:
+        state, _ = await self._call(self._get, self._key(chat, user))
+        return state if state is not None else self.resolve_state(default)
+
+    async def get_data(self, *,
+                       chat: typing.Union[str, int, None] = None,
+                       user: typing.Union[str, int, None] = None,
+                       default: typing.Optional[dict] = None) -> typing.Dict:
+        _, data = await self._call(self._get, self._key(chat, user))
+        return data or (default or {})
+
+    async def set_state(self, *,
+                        chat: typing.Union[str, int, None] = None,
+                        user: typing.Union[str, int, None] = None,
+                        state: typing.AnyStr = None):
+        await self._call(self._set_state, self._key(chat, user), self.resolve_state(state))
+
+    async def set_data(self, *,
+                       chat: typing.Union[str, int, None] = None,
+                       user: typing.Union[str, int, None] = None,
+                       data: typing.Dict = None):
+        await self._call(self._set_data, self._key(chat, user), data or {})
+
+    async def update_data(self, *,
+                          chat: typing.Union[str, int, None] = None,
+                          user: typing.Union[str, int, None] = None,
+                          data: typing.Dict = None, **kwargs):
+        await self._call(self._update_data, self._key(chat, user), dict(data or {}, **kwargs))
+
+    def has_bucket(self):
+        return False
+
+
+def create_storage(path: typing.Optional[str] = FSM_SQLITE_PATH) -> BaseStorage:
+    """SQLite اگر مسیرش تنظیم شده باشد، وگرنه حافظه محدود"""
+    if path:
+        logger.info(f"Using SQLite FSM storage at {path}")
+        return SQLiteStorage(path)
+    return BoundedMemoryStorage()
@@ -0,0 +1,60 @@
+import bisect
+import hashlib
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# تعداد نقطه‌های هر پردازه روی حلقه؛ با ۲۵۶ نقطه سهم هیچ پردازه‌ای بیشتر از حدود ۱۰٪ با
+# میانگین فرق ندارد
+RING_REPLICAS = 256
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """hash سازگار: هر کلید به اولین نقطه بعد از hash خودش روی حلقه می‌رسد
+
+    هر پردازه replicas نقطه روی حلقه دارد. با اضافه یا حذف یک پردازه از N پردازه فقط حدود
+    1/N کلیدها صاحب جدید پیدا می‌کنند و بقیه سر جایشان می‌مانند. ingress و پردازه‌های ربات
+    حلقه را از همان فهرست نام‌ها می‌سازند، پس بدون ارتباط با هم روی صاحب هر کاربر توافق دارند.
+    """
+
+    def __init__(self, nodes: Iterable[str] = (), replicas: int = RING_REPLICAS):
+        self.replicas = replicas
+        self._points: List[Tuple[int, str]] = []
+        self._hashes: List[int] = []
+        self._nodes: Dict[str, None] = {}
+        for node in nodes:
+            self.add(node)
+
+    def __len__(self):
+        return len(self._nodes)
+
+    def __contains__(self, node: str) -> bool:
+        return node in self._nodes
+
+    @property
+    def nodes(self) -> List[str]:
+        return list(self._nodes)
+
+    def add(self, node: str):
+        if node in self._nodes:
+            return
+        self._nodes[node] = None
+        for i in range(self.replicas):
+            bisect.insort(self._points, (_hash(f"{node}#{i}"), node))
+        self._hashes = [point for point, _ in self._points]
+
+    def remove(self, node: str):
+        if node not in self._nodes:
+            return
+        del self._nodes[node]
+        self._points = [point for point in self._points if point[1] != node]
+        self._hashes = [point for point, _ in self._points]
+
+    def node_for(self, key) -> Optional[str]:
+        """صاحب کلید؛ روی حلقه خالی None"""
+        if not self._points:
+            return None
+        index = bisect.bisect(self._hashes, _hash(str(key)))
+        return self._points[index % len(self._points)][1]
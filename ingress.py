@@ -0,0 +1,169 @@
+"""ورودی وب‌هوک برای اجرای چند پردازه ربات
+
+    WORKERS=w1=http://127.0.0.1:10001,w2=http://127.0.0.1:10002 WEBHOOK_HOST=https://example.com \
+        WEBHOOK_SECRET=... python ingress.py
+
+وب‌هوک تلگرام به این پردازه تنظیم می‌شود و هر آپدیت بدون تغییر به WEBHOOK_PATH پردازه‌ای از
+WORKERS فرستاده می‌شود که hash سازگار شناسه کاربر به آن می‌رسد. پردازه‌های ربات با
+BOT_MODE=worker، همان WORKERS و WORKER_NAME خودشان اجرا می‌شوند؛ همه آپدیت‌های یک کاربر به یک
+پردازه می‌روند، پس حالت FSM و کش‌های هر کاربر فقط در همان پردازه است و قفل بین پردازه‌ها لازم
+نیست. پردازه‌ای که جواب ندهد تا سالم شدن دوباره از حلقه برداشته می‌شود و فقط کاربران آن به
+پردازه‌های بعدی حلقه می‌روند. ingress و پردازه‌ها یک WEBHOOK_SECRET مشترک دارند: ingress آن را
+هنگام تنظیم وب‌هوک به تلگرام می‌دهد، درخواستی را که سرآیندش را ندارد رد می‌کند و آن را همراه
+آپدیت به پردازه می‌فرستد، و پردازه‌ها هم درخواست بدون آن را نمی‌پذیرند.
+"""
+import asyncio
+import json
+import os
+import time
+from typing import Dict, Optional, Set
+import logging
+
+from aiohttp import web, ClientSession, ClientTimeout, ClientError
+from aiogram import Bot
+from aiogram.bot.api import TelegramAPIServer, TELEGRAM_PRODUCTION
+
+from config import (
+    BOT_TOKEN, PORT, WEBHOOK_PATH, WEBHOOK_URL, WEBHOOK_SECRET, TELEGRAM_API_URL, WORKERS, INGRESS_HEALTH_INTERVAL,
+    INGRESS_TIMEOUT
+)
+from hash_ring import HashRing
+from keep_alive import setup_routes
+from metrics import INGRESS_UPDATES, INGRESS_SECONDS, INGRESS_WORKERS
+from update_scheduler import USER_EVENTS, SECRET_HEADER, valid_secret
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def raw_user_id(update: dict) -> Optional[int]:
+    """همان update_user_id روی JSON خام آپدیت، بدون ساختن اشیای aiogram"""
+    for name in USER_EVENTS:
+        user = (update.get(name) or {}).get("from")
+        if user is not None:
+            return user["id"]
+    poll_answer = update.get("poll_answer")
+    if poll_answer is not None:
+        return poll_answer["user"]["id"]
+    post = update.get("channel_post") or update.get("edited_channel_post")
+    if post is not None:
+        return post["chat"]["id"]
+    return None
+
+
+class Ingress:
+    """فرستادن آپدیت‌ها به پردازه صاحب کاربر روی حلقه hash سازگار"""
+
+    def __init__(self, workers: Dict[str, str], path: str = WEBHOOK_PATH, secret: str = WEBHOOK_SECRET,
+                 timeout=INGRESS_TIMEOUT, health_interval=INGRESS_HEALTH_INTERVAL):
+        self.workers = workers
+        self.path = path
+        self.secret = secret
+        self.timeout = timeout
+        self.health_interval = health_interval
+        self.ring = HashRing(workers)
+        self._down: Set[str] = set()
+        self._session: Optional[ClientSession] = None
+        self._health_task = None
+
+    def start(self):
+        self._session = ClientSession(timeout=ClientTimeout(total=self.timeout))
+        self._health_task = asyncio.create_task(self._check_health())
+        logger.info(f"Ingress started with {len(self.workers)} workers: {', '.join(self.workers)}")
+
+    async def close(self):
+        self._health_task.cancel()
+        await self._session.close()
+        logger.info("Ingress stopped")
+
+    async def handle(self, request: web.Request) -> web.Response:
+        if not valid_secret(request, self.secret):
+            INGRESS_UPDATES.labels("", "forbidden").inc()
+            logger.warning(f"Rejected webhook request from {request.remote}: invalid secret token")
+            return web.Response(status=403, text="forbidden")
+        body = await request.read()
+        try:
+            update = json.loads(body)
+        except ValueError:
+            return web.Response(status=400, text="invalid update")
+        user_id = raw_user_id(update)
+        # آپدیت بدون کاربر ترتیبی لازم ندارد
+        key = user_id if user_id is not None else update.get("update_id")
+
+        # اگر صاحب کاربر جواب ندهد از حلقه برداشته می‌شود و صاحب بعدی امتحان می‌شود
+        while True:
+            name = self.ring.node_for(key)
+            if name is None:
+                INGRESS_UPDATES.labels("", "unrouted").inc()
+                # تلگرام آپدیت را بعداً دوباره می‌فرستد
+                return web.Response(status=503, text="no workers available")
+            started = time.perf_counter()
+            try:
+                async with self._session.post(self.workers[name] + self.path, data=body,
+                                              headers={"Content-Type": "application/json",
+                                                       SECRET_HEADER: self.secret}) as response:
+                    payload = await response.read()
+                    if response.status >= 500:
+                        raise ClientError(f"worker returned {response.status}")
+            except (ClientError, asyncio.TimeoutError) as e:
+                INGRESS_UPDATES.labels(name, "failed").inc()
+                self._mark_down(name, e)
+                continue
+            INGRESS_SECONDS.labels(name).observe(time.perf_counter() - started)
+            INGRESS_UPDATES.labels(name, "forwarded").inc()
+            return web.Response(body=payload, status=response.status, content_type=response.content_type)
+
+    def _mark_down(self, name: str, reason):
+        if name not in self._down:
+            self._down.add(name)
+            self.ring.remove(name)
+            logger.warning(f"Worker {name} removed from ring: {reason}")
+
+    async def _check_health(self):
+        """برداشتن پردازه‌های بی‌جواب از حلقه و برگرداندن پردازه‌های سالم‌شده"""
+        while True:
+            await asyncio.sleep(self.health_interval)
+            for name, url in self.workers.items():
+                try:
+                    async with self._session.get(url + "/health") as response:
+                        healthy = response.status == 200
+                except (ClientError, asyncio.TimeoutError):
+                    healthy = False
+                if not healthy:
+                    self._mark_down(name, "health check failed")
+                elif name in self._down:
+                    self._down.discard(name)
+                    self.ring.add(name)
+                    logger.info(f"Worker {name} back on ring")
+
+
+def create_app(ingress: Ingress) -> web.Application:
+    app = setup_routes(web.Application())
+    app.router.add_post(ingress.path, ingress.handle)
+    INGRESS_WORKERS.set_function(lambda: len(ingress.ring))
+
+    async def on_startup(_):
+        ingress.start()
+        api_server = TelegramAPIServer.from_base(TELEGRAM_API_URL) if TELEGRAM_API_URL else TELEGRAM_PRODUCTION
+        bot = Bot(token=BOT_TOKEN, server=api_server)
+        try:
+            await bot.set_webhook(WEBHOOK_URL, drop_pending_updates=True, secret_token=ingress.secret)
+            logger.info(f"Webhook set to {WEBHOOK_URL}")
+        finally:
+            await (await bot.get_session()).close()
+
+    async def on_shutdown(_):
+        await ingress.close()
+
+    app.on_startup.append(on_startup)
+    app.on_shutdown.append(on_shutdown)
+    return app
+
+
+if __name__ == "__main__":
+    if not WORKERS:
+        raise SystemExit("WORKERS is not set")
+    # رمز تصادفی هر پردازه با رمز پردازه‌های ربات یکی نیست
+    if not os.environ.get("WEBHOOK_SECRET"):
+        raise SystemExit("WEBHOOK_SECRET is not set")
+    web.run_app(create_app(Ingress(WORKERS)), host="0.0.0.0", port=PORT)
@@ -1,40 +1,46 @@
-from flask import Flask
-from threading import Thread
-import requests
-import time
+import asyncio
+from aiohttp import web, ClientSession, ClientTimeout
 import logging
-import os
+
+from metrics import REGISTRY
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = Flask(__name__)
+async def home(request):
+    return web.Response(text="ربات زنده است!")
 
-@app.route('/')
-def home():
-    return "ربات زنده است!"
+async def health(request):
+    return web.Response(text="OK")
 
-@app.route('/health')
-def health():
-    return "OK", 200
+async def metrics(request):
+    return web.Response(body=REGISTRY.render().encode("utf-8"),
+                        headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"})
 
-def run():
-    port = int(os.environ.get('PORT', 8080))
-    app.run(host='0.0.0.0', port=port)
+def setup_routes(app: web.Application) -> web.Application:
+    """افزودن مسیرهای /، /health و /metrics به اپلیکیشن aiohttp ربات"""
+    app.router.add_get('/', home)
+    app.router.add_get('/health', health)
+    app.router.add_get('/metrics', metrics)
+    return app
 
-def keep_alive():
-    t = Thread(target=run)
-    t.daemon = True
-    t.start()
-    logger.info("Keep alive server started")
+async def start_server(app: web.Application, port: int) -> web.AppRunner:
+    """اجرای اپلیکیشن روی همان event loop ربات (حالت polling)"""
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '0.0.0.0', port)
+    await site.start()
+    logger.info(f"Keep alive server started on port {port}")
+    return runner
 
-def ping_self():
+async def ping_self(url: str, interval: int = 300):
     """پینگ زدن به خودش برای جلوگیری از خوابیدن"""
-    url = os.environ.get('RENDER_EXTERNAL_URL', 'https://moraby.onrender.com')
-    while True:
-        try:
-            time.sleep(300)  # هر ۵ دقیقه یکبار
-            requests.get(url, timeout=10)
-            logger.info("Ping sent to keep alive")
-        except Exception as e:
-            logger.error(f"Ping failed: {e}")
+    async with ClientSession(timeout=ClientTimeout(total=10)) as session:
+        while True:
+            await asyncio.sleep(interval)  # هر ۵ دقیقه یکبار
+            try:
+                async with session.get(url) as response:
+                    await response.read()
+                logger.info("Ping sent to keep alive")
+            except Exception as e:
+                logger.error(f"Ping failed: {e}")
@@ -0,0 +1,368 @@
+"""رجیستری سبک متریک‌ها با خروجی متنی Prometheus
+
+بدون وابستگی خارجی؛ هر سری برچسب‌دار یک بار با labels() ساخته و نگه داشته می‌شود و
+مسیر داغ فقط یک bisect و دو جمع زیر یک قفل بدون رقابت است، پس روشن ماندن آن در
+production هزینه محسوسی ندارد. observe از نخ‌های دیتابیس هم امن است.
+"""
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+# مرزهای پیش‌فرض هیستوگرام بر حسب ثانیه؛ از نیم میلی‌ثانیه (پارس) تا ۱۰ ثانیه (API تلگرام)
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_text(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Registry:
+    """مجموعه متریک‌هایی که در /metrics نمایش داده می‌شوند"""
+
+    def __init__(self):
+        self._metrics: Dict[str, "_Metric"] = {}
+
+    def register(self, metric: "_Metric"):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} already registered")
+        self._metrics[metric.name] = metric
+
+    def get(self, name: str) -> Optional["_Metric"]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        """متن قالب Prometheus (text/plain; version=0.0.4)"""
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            try:
+                lines.extend(metric.samples())
+            except Exception as e:
+                logger.error(f"Error collecting metric {metric.name}: {e}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 registry: Optional[Registry] = REGISTRY):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        if registry is not None:
+            registry.register(self)
+
+    def labels(self, *values):
+        """سری مربوط به مقادیر برچسب؛ نتیجه را برای مسیرهای داغ نگه دارید"""
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {key}")
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _default(self):
+        # متریک بدون برچسب یک سری دارد
+        return self.labels()
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class _CounterChild:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self.value += amount
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1):
+        self._default().inc(amount)
+
+    def samples(self):
+        return [
+            f"{self.name}_total{_label_text(self.labelnames, key)} {_format_value(child.value)}"
+            for key, child in list(self._children.items())
+        ]
+
+
+class _GaugeChild:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def set(self, value: float):
+        self.value = value
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1):
+        with self._lock:
+            self.value -= amount
+
+
+class Gauge(_Metric):
+    """مقدار لحظه‌ای؛ با set_function هنگام خواندن /metrics محاسبه می‌شود"""
+    kind = "gauge"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._functions: Dict[Tuple[str, ...], Callable[[], float]] = {}
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value: float):
+        self._default().set(value)
+
+    def inc(self, amount: float = 1):
+        self._default().inc(amount)
+
+    def dec(self, amount: float = 1):
+        self._default().dec(amount)
+
+    def set_function(self, func: Callable[[], float], *values):
+        self._functions[tuple(str(value) for value in values)] = func
+
+    def samples(self):
+        values = {key: child.value for key, child in list(self._children.items())}
+        for key, func in self._functions.items():
+            values[key] = func()
+        return [
+            f"{self.name}{_label_text(self.labelnames, key)} {_format_value(value)}"
+            for key, value in values.items()
+        ]
+
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum", "_lock")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        # یک خانه اضافه برای +Inf
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def time(self) -> "Timer":
+        return Timer(self)
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Iterable[float] = DEFAULT_BUCKETS, registry: Optional[Registry] = REGISTRY):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self._default().observe(value)
+
+    def time(self) -> "Timer":
+        return Timer(self._default())
+
+    def samples(self):
+        lines = []
+        for key, child in list(self._children.items()):
+            with child._lock:
+                counts = list(child.counts)
+                total = child.sum
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                labels = _label_text(self.labelnames, key, f'le="{_format_value(bound)}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _label_text(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Timer:
+    """زمان‌سنج برای with یا دکوراتور روی یک سری هیستوگرام"""
+    __slots__ = ("_child", "_started")
+
+    def __init__(self, child: _HistogramChild):
+        self._child = child
+        self._started = 0.0
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._child.observe(time.perf_counter() - self._started)
+        return False
+
+    def __call__(self, func):
+        child = self._child
+
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                child.observe(time.perf_counter() - started)
+
+        wrapper.__name__ = func.__name__
+        wrapper.__qualname__ = func.__qualname__
+        wrapper.__doc__ = func.__doc__
+        wrapper.__wrapped__ = func
+        return wrapper
+
+
+# متریک‌های ربات
+HANDLER_SECONDS = Histogram(
+    "bot_handler_seconds", "Handler latency by handler and callback prefix",
+    ("kind", "handler", "callback")
+)
+HANDLER_ERRORS = Counter(
+    "bot_handler_errors", "Unhandled exceptions while processing updates",
+    ("exception",)
+)
+UPDATES_RECEIVED = Counter("bot_updates_received", "Updates received from Telegram")
+UPDATES_IN_FLIGHT = Gauge("bot_updates_in_flight", "Updates currently being processed")
+TELEGRAM_API_SECONDS = Histogram(
+    "telegram_api_seconds", "Outbound Bot API request latency by method",
+    ("method",)
+)
+TELEGRAM_API_ERRORS = Counter(
+    "telegram_api_errors", "Outbound Bot API request failures by method",
+    ("method",)
+)
+DB_QUERY_SECONDS = Histogram(
+    "db_query_seconds", "Database method latency on a pooled connection",
+    ("method",)
+)
+DB_QUERY_ERRORS = Counter(
+    "db_query_errors", "Database method failures",
+    ("method",)
+)
+DB_POOL_WAIT_SECONDS = Histogram(
+    "db_pool_wait_seconds", "Time spent waiting for a database connection, including executor queueing"
+)
+ANALYZER_SECONDS = Histogram(
+    "analyzer_seconds", "Workout parse/analyze time by stage",
+    ("stage",)
+)
+QUEUE_DEPTH = Gauge(
+    "bot_queue_depth", "Pending items in internal queues",
+    ("queue",)
+)
+SEND_QUEUE_SECONDS = Histogram(
+    "send_queue_seconds", "Time outbound messages wait in the send scheduler by priority",
+    ("priority",)
+)
+SEND_RETRY_AFTER = Counter(
+    "send_retry_after", "Bot API 429 responses handled by the send scheduler by method",
+    ("method",)
+)
+SEND_COALESCED = Counter(
+    "send_coalesced", "Low-priority messages merged into another send to the same chat"
+)
+REMINDERS = Counter(
+    "reminders", "Workout reminders by outcome (sent, failed, blocked, skipped)",
+    ("result",)
+)
+EXPORTS = Counter(
+    "exports", "History exports by format and outcome (sent, cached, empty, cancelled, failed)",
+    ("format", "result")
+)
+EXPORT_SECONDS = Histogram(
+    "export_seconds", "Time to build and upload a history export by format",
+    ("format",)
+)
+WORK_JOBS = Counter(
+    "work_jobs", "Jobs run in the work pools by pool and outcome (done, failed, timeout, cancelled, rejected)",
+    ("pool", "result")
+)
+WORK_SECONDS = Histogram(
+    "work_seconds", "Time jobs spend in the work pools including queueing",
+    ("pool",)
+)
+UPDATES_DROPPED = Counter(
+    "updates_dropped", "Stale updates dropped because the sender's update queue was full"
+)
+UPDATE_QUEUE_SECONDS = Histogram(
+    "update_queue_seconds", "Time updates wait in the update scheduler before their handlers run"
+)
+UPDATE_USERS = Gauge(
+    "bot_update_users", "Users with queued or running updates"
+)
+INGRESS_UPDATES = Counter(
+    "ingress_updates", "Updates forwarded by the ingress by worker and outcome (forwarded, failed, unrouted, forbidden)",
+    ("worker", "result")
+)
+INGRESS_SECONDS = Histogram(
+    "ingress_forward_seconds", "Time for a worker to accept an update forwarded by the ingress",
+    ("worker",)
+)
+INGRESS_WORKERS = Gauge(
+    "ingress_workers_up", "Workers currently on the ingress hash ring"
+)
+ACTIVITY_TOUCHES = Counter(
+    "activity_touches", "User activity events recorded in memory for users.last_activity"
+)
+ACTIVITY_ROWS = Counter(
+    "activity_rows_written", "users.last_activity values written by the activity tracker flushes"
+)
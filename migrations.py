@@ -0,0 +1,143 @@
+"""مهاجرت‌های نسخه‌دار شِمای دیتابیس
+
+هر مهاجرت (نسخه، توضیح، دستورها) است و فقط یک بار اجرا می‌شود؛ نسخه‌های اجراشده در
+schema_version ثبت می‌شوند. مهاجرت جدید همیشه با نسخه بزرگ‌تر به انتهای MIGRATIONS اضافه
+می‌شود و مهاجرتی که اجرا شده هرگز تغییر نمی‌کند. وقتی شِما به‌روز است migrate فقط یک
+SELECT اجرا می‌کند.
+"""
+import logging
+
+logger = logging.getLogger(__name__)
+
+# کلید قفل advisory تا چند پردازه هم‌زمان مهاجرت را دو بار اجرا نکنند
+_LOCK_KEY = 7_460_117
+
+MIGRATIONS = (
+    (1, "base tables", (
+        """
+        CREATE TABLE IF NOT EXISTS users (
+            user_id BIGINT PRIMARY KEY,
+            username VARCHAR(255),
+            first_name VARCHAR(255),
+            last_name VARCHAR(255),
+            registered_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            fitness_level VARCHAR(50) DEFAULT 'مبتدی',
+            last_activity TIMESTAMP
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS workout_history (
+            id SERIAL PRIMARY KEY,
+            user_id BIGINT REFERENCES users(user_id),
+            workout_text TEXT,
+            analysis TEXT,
+            calories INT,
+            intensity VARCHAR(50),
+            workout_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (user_id)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS user_settings (
+            user_id BIGINT PRIMARY KEY REFERENCES users(user_id),
+            language VARCHAR(10) DEFAULT 'fa',
+            notifications BOOLEAN DEFAULT TRUE,
+            workout_reminder_time TIME,
+            preferred_level VARCHAR(50)
+        )
+        """,
+    )),
+    (2, "reminder claims and due-reminder index", (
+        # روز آخرین یادآوری؛ قبل از ارسال ادعا می‌شود تا بعد از ری‌استارت دوباره فرستاده نشود
+        "ALTER TABLE user_settings ADD COLUMN IF NOT EXISTS last_reminded_on DATE",
+        # get_reminders فقط از ایندکس خوانده می‌شود (index-only scan)
+        "DROP INDEX IF EXISTS idx_user_settings_reminder",
+        """
+        CREATE INDEX idx_user_settings_reminder
+        ON user_settings (workout_reminder_time) INCLUDE (user_id, last_reminded_on)
+        WHERE notifications AND workout_reminder_time IS NOT NULL
+        """,
+    )),
+    (3, "workout history by user and date", (
+        # get_user_history و آمار کاربر بدون مرتب‌سازی همه ردیف‌های کاربر؛ بررسی کلید خارجی
+        # هنگام حذف کاربر هم از همین ایندکس استفاده می‌کند
+        """
+        CREATE INDEX IF NOT EXISTS idx_workout_history_user_date
+        ON workout_history (user_id, workout_date DESC) INCLUDE (calories, intensity)
+        """,
+    )),
+    (4, "room for HOT updates of users.last_activity", (
+        # last_activity ایندکس ندارد و با جای خالی در صفحه، به‌روزرسانی آن HOT و بدون
+        # نوشتن در ایندکس‌ها انجام می‌شود
+        "ALTER TABLE users SET (fillfactor = 85)",
+    )),
+    (5, "weekly user stats", (
+        # حجم هر تمرین برای بازسازی آمار از تاریخچه؛ ردیف‌های قدیمی با backfill.py پر می‌شوند
+        "ALTER TABLE workout_history ADD COLUMN IF NOT EXISTS volume INT",
+        # یک ردیف برای هر کاربر و هفته ISO (week_start دوشنبه است). total_* و streak_weeks تا
+        # پایان همین هفته حساب شده‌اند، پس آخرین ردیف کاربر به تنهایی همه آمار را دارد.
+        # active_days بیت‌های روزهای هفته است (دوشنبه بیت صفر)
+        """
+        CREATE TABLE IF NOT EXISTS user_stats (
+            user_id BIGINT REFERENCES users(user_id),
+            week_start DATE,
+            sessions INT NOT NULL DEFAULT 0,
+            calories BIGINT NOT NULL DEFAULT 0,
+            volume BIGINT NOT NULL DEFAULT 0,
+            active_days SMALLINT NOT NULL DEFAULT 0,
+            last_workout TIMESTAMP,
+            total_sessions BIGINT NOT NULL DEFAULT 0,
+            total_calories BIGINT NOT NULL DEFAULT 0,
+            total_volume BIGINT NOT NULL DEFAULT 0,
+            streak_weeks INT NOT NULL DEFAULT 1,
+            PRIMARY KEY (user_id, week_start)
+        )
+        """,
+    )),
+)
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def current_version(cur):
+    cur.execute("SELECT to_regclass('schema_version') IS NOT NULL")
+    if not cur.fetchone()[0]:
+        return 0
+    cur.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+    return cur.fetchone()[0]
+
+
+def migrate(conn):
+    """اجرای مهاجرت‌های باقی‌مانده در تراکنش conn؛ نسخه‌های اجراشده برگردانده می‌شوند
+
+    commit با فراخواننده است؛ اگر یکی از دستورها خطا بدهد کل تراکنش برمی‌گردد.
+    """
+    cur = conn.cursor()
+    if current_version(cur) >= LATEST_VERSION:
+        cur.close()
+        return []
+
+    cur.execute("SELECT pg_advisory_xact_lock(%s)", (_LOCK_KEY,))
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INT PRIMARY KEY,
+            description TEXT,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    # پردازه دیگری ممکن است در زمان انتظار برای قفل مهاجرت‌ها را اجرا کرده باشد
+    version = current_version(cur)
+    applied = []
+    for migration_version, description, statements in MIGRATIONS:
+        if migration_version <= version:
+            continue
+        for statement in statements:
+            cur.execute(statement)
+        cur.execute(
+            "INSERT INTO schema_version (version, description) VALUES (%s, %s)",
+            (migration_version, description)
+        )
+        logger.info(f"Applied migration {migration_version}: {description}")
+        applied.append(migration_version)
+    cur.close()
+    return applied
@@ -0,0 +1,64 @@
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+from datetime import time as dtime
+from typing import Dict, Optional, Tuple
+
+from config import PROFILE_CACHE_SIZE, PROFILE_CACHE_TTL
+
+
+@dataclass(frozen=True)
+class UserProfile:
+    fitness_level: str
+    language: str
+    notifications: bool
+    reminder_time: Optional[dtime]
+
+
+class ProfileCache:
+    """کش LRU/TTL پروفایل کاربران (سطح و تنظیمات) در حافظه پردازه
+
+    Database آن را با خواندن از دیتابیس پر می‌کند و بعد از هر نوشتن سطح یا تنظیمات همان مقدار
+    را در ورودی موجود جایگزین می‌کند؛ انقضای ورودی تغییر نمی‌کند، پس تغییری که از بیرون این
+    پردازه (اسکریپت‌ها یا پردازه دیگر) انجام شود حداکثر ttl ثانیه دیده نمی‌شود.
+    """
+
+    def __init__(self, max_size: int = PROFILE_CACHE_SIZE, ttl: float = PROFILE_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[int, Tuple[float, UserProfile]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, int]:
+        return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+    def get(self, user_id: int) -> Optional[UserProfile]:
+        """پروفایل تازه کاربر یا None"""
+        entry = self._entries.get(user_id)
+        if entry is not None:
+            if entry[0] > time.monotonic():
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return entry[1]
+            del self._entries[user_id]
+        self.misses += 1
+        return None
+
+    def put(self, user_id: int, profile: UserProfile):
+        self._entries[user_id] = (time.monotonic() + self.ttl, profile)
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def update(self, user_id: int, **changes):
+        """اعمال نوشتن موفق روی ورودی موجود؛ کاربری که در کش نیست بار بعد خوانده می‌شود"""
+        entry = self._entries.get(user_id)
+        if entry is not None:
+            self._entries[user_id] = (entry[0], replace(entry[1], **changes))
+
+    def invalidate(self, user_id: int):
+        self._entries.pop(user_id, None)
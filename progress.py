@@ -0,0 +1,274 @@
+import asyncio
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Awaitable, Callable, Dict, Iterable, Optional, Set, Tuple
+import logging
+
+from analysis_cache import normalize_workout_text
+from config import PROGRESS_WEEKS, PROGRESS_CACHE_SIZE
+from exercise_lexicon import get_lexicon
+from workout_parser import parse_exercises
+
+logger = logging.getLogger(__name__)
+
+# تعداد جلسات اخیر هر حرکت که با همان تعداد جلسه قبل از آن مقایسه می‌شود
+OVERLOAD_WINDOW = 3
+# تغییر کمتر از این نسبت «ثابت» حساب می‌شود
+OVERLOAD_THRESHOLD = 0.05
+# حداکثر حرکت‌های دنبال‌شده برای هر کاربر؛ حرکتی که مدت‌ها انجام نشده اول کنار می‌رود
+MAX_TRACKED_EXERCISES = 64
+# حرکتی که در این چند هفته انجام نشده در گزارش اضافه‌بار نمی‌آید
+OVERLOAD_RECENT_WEEKS = 4
+
+UP = "up"
+FLAT = "flat"
+DOWN = "down"
+
+
+@dataclass(frozen=True)
+class WeekPoint:
+    week_start: date
+    sessions: int = 0
+    calories: int = 0
+    volume: int = 0
+
+
+@dataclass(frozen=True)
+class ExerciseProgress:
+    name: str
+    unit: str
+    before: float
+    recent: float
+    status: str
+
+
+@dataclass(frozen=True)
+class ProgressReport:
+    """گزارش پیشرفت کاربر؛ weeks از قدیمی به جدید و آخرین عضو آن همین هفته است"""
+    sessions: int
+    first_date: Optional[date]
+    last_date: Optional[date]
+    weeks: Tuple[WeekPoint, ...]
+    volume_trend: Optional[float]
+    calories_trend: Optional[float]
+    # (دسته، سهم در نیمه اول بازه، سهم در نیمه دوم) به درصد؛ نیمه بدون تمرین None
+    category_mix: Tuple[Tuple[str, Optional[int], Optional[int]], ...]
+    overload: Tuple[ExerciseProgress, ...]
+
+    @property
+    def this_week(self) -> WeekPoint:
+        return self.weeks[-1]
+
+    @property
+    def last_week(self) -> WeekPoint:
+        return self.weeks[-2]
+
+
+def week_start(day: date) -> date:
+    return day - timedelta(days=day.weekday())
+
+
+def _trend(values) -> Optional[float]:
+    """شیب خط کمترین مربعات به درصد میانگین در هر هفته؛ با کمتر از دو هفته فعال None"""
+    if sum(1 for v in values if v) < 2:
+        return None
+    n = len(values)
+    mean_x = (n - 1) / 2
+    mean_y = sum(values) / n
+    slope = sum((x - mean_x) * (y - mean_y) for x, y in enumerate(values)) / sum(
+        (x - mean_x) ** 2 for x in range(n))
+    return round(100 * slope / mean_y)
+
+
+class _Track:
+    __slots__ = ("values", "last_seen")
+
+    def __init__(self):
+        self.values = []
+        self.last_seen = None
+
+
+def parse_session(workout_text: Optional[str]) -> Tuple[Dict[Tuple[str, str], int], int]:
+    """مجموع هر (حرکت، واحد) در یک جلسه و حجم محاسبه‌شده آن"""
+    per_session: Dict[Tuple[str, str], int] = {}
+    computed_volume = 0
+    for name, value, unit in parse_exercises(normalize_workout_text(workout_text or "")):
+        per_session[name, unit] = per_session.get((name, unit), 0) + value
+        computed_volume += value * 2 if unit == 'دقیقه' else value
+    return per_session, computed_volume
+
+
+def parse_sessions(texts) -> list:
+    """parse_session برای یک دسته متن؛ در سطح ماژول است تا دسته‌های بزرگ در استخر پردازه پارس شوند"""
+    return [parse_session(text) for text in texts]
+
+
+class ProgressFold:
+    """محاسبه گزارش پیشرفت با یک گذر روی تاریخچه مرتب‌شده بر اساس تاریخ
+
+    هر ردیف با add (یا با add_parsed بعد از parse_session جدا) اضافه می‌شود و چیزی از ردیف‌ها
+    نگه داشته نمی‌شود: فقط weeks سطل هفتگی، شمارش دسته‌ها در دو نیمه بازه و حداکثر
+    ۲×OVERLOAD_WINDOW مقدار آخر برای MAX_TRACKED_EXERCISES حرکت، پس حافظه به تعداد جلسات
+    کاربر بستگی ندارد، به شرط این‌که ردیف‌ها هم دسته‌دسته به آن برسند (Database.fold_user_history).
+    """
+
+    def __init__(self, today: date, weeks: int = PROGRESS_WEEKS):
+        self.lexicon = get_lexicon()
+        self.this_week = week_start(today)
+        self.first_week = self.this_week - timedelta(weeks=weeks - 1)
+        self.weeks = weeks
+        self._sessions = [0] * weeks
+        self._calories = [0] * weeks
+        self._volume = [0] * weeks
+        self._categories = ({}, {})
+        # (نام حرکت، واحد) -> مقادیر آخرین جلسات؛ ترتیب = زمان آخرین انجام
+        self._tracks: "OrderedDict[Tuple[str, str], _Track]" = OrderedDict()
+        self.sessions = 0
+        self.first_date = None
+        self.last_date = None
+
+    def add(self, workout_date, workout_text: str, calories: Optional[int], volume: Optional[int]):
+        per_session, computed_volume = parse_session(workout_text)
+        self.add_parsed(workout_date, per_session, computed_volume, calories, volume)
+
+    def add_parsed(self, workout_date, per_session: Dict[Tuple[str, str], int], computed_volume: int,
+                   calories: Optional[int], volume: Optional[int]):
+        day = workout_date.date()
+        self.sessions += 1
+        if self.first_date is None:
+            self.first_date = day
+        self.last_date = day
+
+        index = (week_start(day) - self.first_week).days // 7
+        if 0 <= index < self.weeks:
+            self._sessions[index] += 1
+            self._calories[index] += calories or 0
+            self._volume[index] += volume if volume is not None else computed_volume
+            categories = self._categories[index * 2 >= self.weeks]
+            for name, _ in per_session:
+                category = self.lexicon.category(name)
+                categories[category] = categories.get(category, 0) + 1
+
+        for key, value in per_session.items():
+            track = self._tracks.get(key)
+            if track is None:
+                track = self._tracks[key] = _Track()
+                if len(self._tracks) > MAX_TRACKED_EXERCISES:
+                    self._tracks.popitem(last=False)
+            else:
+                self._tracks.move_to_end(key)
+            track.values.append(value)
+            if len(track.values) > 2 * OVERLOAD_WINDOW:
+                del track.values[0]
+            track.last_seen = day
+
+    def result(self) -> ProgressReport:
+        weeks = tuple(
+            WeekPoint(self.first_week + timedelta(weeks=i), self._sessions[i], self._calories[i], self._volume[i])
+            for i in range(self.weeks)
+        )
+        return ProgressReport(
+            sessions=self.sessions,
+            first_date=self.first_date,
+            last_date=self.last_date,
+            weeks=weeks,
+            volume_trend=_trend(self._volume),
+            calories_trend=_trend(self._calories),
+            category_mix=self._category_mix(),
+            overload=self._overload(),
+        )
+
+    def _category_mix(self):
+        def shares(counts):
+            total = sum(counts.values())
+            return lambda category: round(100 * counts.get(category, 0) / total) if total else None
+
+        earlier, recent = map(shares, self._categories)
+        mix = [(category, earlier(category), recent(category)) for category in set().union(*self._categories)]
+        mix.sort(key=lambda item: (-(item[2] or 0), -(item[1] or 0), item[0]))
+        return tuple(mix)
+
+    def _overload(self):
+        since = self.this_week - timedelta(weeks=OVERLOAD_RECENT_WEEKS - 1)
+        result = []
+        # جدیدترین حرکت‌ها اول
+        for (name, unit), track in reversed(self._tracks.items()):
+            if track.last_seen < since:
+                break
+            if len(track.values) <= OVERLOAD_WINDOW:
+                continue
+            before_values = track.values[:-OVERLOAD_WINDOW]
+            before = sum(before_values) / len(before_values)
+            recent = sum(track.values[-OVERLOAD_WINDOW:]) / OVERLOAD_WINDOW
+            if recent >= before * (1 + OVERLOAD_THRESHOLD):
+                status = UP
+            elif recent <= before * (1 - OVERLOAD_THRESHOLD):
+                status = DOWN
+            else:
+                status = FLAT
+            result.append(ExerciseProgress(name, unit, round(before, 1), round(recent, 1), status))
+        return tuple(result)
+
+
+class ProgressCache:
+    """کش LRU متن گزارش پیشرفت هر کاربر تا ذخیره شدن تمرین بعدی او
+
+    invalidate هم با صف شدن تمرین جدید و هم بعد از نوشتن آن در دیتابیس صدا زده می‌شود؛ گزارشی
+    که بین این دو و بدون تمرین هنوز نوشته‌نشده ساخته شده با flush دور ریخته می‌شود. نتیجه
+    محاسبه‌ای که هم‌زمان با invalidate انجام شده ذخیره نمی‌شود. گزارش به هفته جاری وابسته است، پس با شروع
+    هفته جدید هم دوباره محاسبه می‌شود.
+    """
+
+    def __init__(self, max_size: int = PROGRESS_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries: "OrderedDict[int, Tuple[date, str]]" = OrderedDict()
+        self._inflight: Dict[int, asyncio.Future] = {}
+        self._stale: Set[int] = set()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def invalidate(self, user_ids: Iterable[int]):
+        for user_id in user_ids:
+            self._entries.pop(user_id, None)
+            if user_id in self._inflight:
+                self._stale.add(user_id)
+
+    async def get_or_compute(self, user_id: int, week: date, compute: Callable[[], Awaitable[Optional[str]]]):
+        """متن گزارش از کش یا compute؛ None (خطا یا بدون تمرین) ذخیره نمی‌شود"""
+        entry = self._entries.get(user_id)
+        if entry is not None and entry[0] == week:
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return entry[1]
+
+        inflight = self._inflight.get(user_id)
+        if inflight is not None:
+            return await asyncio.shield(inflight)
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[user_id] = future
+        try:
+            value = await compute()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()
+            raise
+        else:
+            future.set_result(value)
+            if value is not None and user_id not in self._stale:
+                self._entries[user_id] = (week, value)
+                self._entries.move_to_end(user_id)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+        finally:
+            del self._inflight[user_id]
+            self._stale.discard(user_id)
+        return value
@@ -0,0 +1,197 @@
+import asyncio
+import heapq
+from collections import defaultdict
+from datetime import datetime, timedelta, time as dtime
+from typing import Callable, Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+import logging
+
+from aiogram.utils.exceptions import BotBlocked, UserDeactivated, ChatNotFound
+
+from config import REMINDER_TIMEZONE, REMINDER_WINDOW, REMINDER_CATCHUP, REMINDER_BATCH_SIZE
+from metrics import REMINDERS
+from responses import REMINDER_TEXT
+from send_scheduler import send_priority, REMINDER
+
+logger = logging.getLogger(__name__)
+
+# حداکثر خواب بین دو بررسی؛ زمان هر بار از ساعت دیواری خوانده می‌شود پس خطا جمع نمی‌شود
+MAX_SLEEP = 60
+# انتظار بعد از خطای دیتابیس تا تلاش دوباره برای بارگذاری یا ادعای یادآوری‌ها
+RETRY_DELAY = 15
+
+
+class ReminderScheduler:
+    """ارسال یادآوری روزانه تمرین در ساعت workout_reminder_time کاربر
+
+    فقط یادآوری‌های window ثانیه بعد در یک heap (زمان سررسید، user_id) در حافظه‌اند و هر بار
+    با یک پرس‌وجو روی ایندکس جزئی workout_reminder_time بارگذاری می‌شوند؛ تغییر تنظیمات با
+    update مستقیم در heap اعمال می‌شود. یادآوری‌های سررسیده در دسته‌های batch_size قبل از
+    ارسال در last_reminded_on ادعا می‌شوند، پس ری‌استارت یا چند پردازه هم‌زمان یک یادآوری را
+    دو بار نمی‌فرستند. ارسال با اولویت REMINDER از صف ارسال و محدودیت‌های نرخ آن می‌گذرد.
+    با owns فقط یادآوری کاربرانی بارگذاری می‌شود که owns(user_id) برایشان True است (کاربران همین
+    پردازه وقتی چند پردازه اجرا می‌شوند). اگر بارگذاری یا ادعا با خطای دیتابیس روبه‌رو شود همان
+    پنجره یا همان دسته بعد از RETRY_DELAY ثانیه دوباره امتحان می‌شود و چیزی جا نمی‌ماند.
+    """
+
+    def __init__(self, db, bot, timezone=REMINDER_TIMEZONE, window=REMINDER_WINDOW, catchup=REMINDER_CATCHUP,
+                 batch_size=REMINDER_BATCH_SIZE, owns: Optional[Callable[[int], bool]] = None):
+        self.db = db
+        self.bot = bot
+        self.owns = owns
+        self.tz = ZoneInfo(timezone)
+        self.window = timedelta(seconds=window)
+        self.catchup = timedelta(seconds=catchup)
+        self.batch_size = batch_size
+        self._heap: List[Tuple[float, int]] = []
+        # user_id -> زمان سررسید معتبر؛ ورودی‌های heap که با این یکی نیستند کهنه‌اند
+        self._due: Dict[int, float] = {}
+        self._loaded_until: Optional[datetime] = None
+        self._wakeup = None
+        self._task = None
+        self._closing = False
+
+    @property
+    def pending(self) -> int:
+        return len(self._due)
+
+    def start(self):
+        """شروع حلقه یادآوری در پس‌زمینه"""
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"Reminder scheduler started ({self.tz.key})")
+
+    async def close(self, timeout: float = 10):
+        """توقف بعد از ارسال دسته در حال ارسال (یادآوری‌های آن قبلاً ادعا شده‌اند)"""
+        if self._task is None:
+            return
+        self._closing = True
+        self._wakeup.set()
+        try:
+            await asyncio.wait_for(self._task, timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Reminder batch interrupted by shutdown")
+        self._task = None
+        logger.info("Reminder scheduler stopped")
+
+    def update(self, user_id: int, notifications: bool, reminder_time: Optional[dtime]):
+        """اعمال تنظیمات جدید کاربر بعد از نوشتن در دیتابیس"""
+        self._due.pop(user_id, None)
+        if not notifications or reminder_time is None or self._loaded_until is None:
+            return
+        now = datetime.now(self.tz)
+        due = datetime.combine(now.date(), reminder_time, self.tz)
+        if due <= now:
+            due += timedelta(days=1)
+        # بعد از پنجره بارگذاری‌شده، بارگذاری بعدی آن را از دیتابیس برمی‌دارد
+        if due < self._loaded_until:
+            self._push(user_id, due.timestamp())
+            self._wakeup.set()
+
+    def _push(self, user_id: int, due: float):
+        self._due[user_id] = due
+        heapq.heappush(self._heap, (due, user_id))
+
+    async def _load(self, start: datetime, end: datetime) -> bool:
+        """بارگذاری یادآوری‌های [start, end)؛ بازه‌ای که از نیمه‌شب می‌گذرد دو پرس‌وجو می‌شود
+
+        با خطای دیتابیس False برمی‌گرداند و _loaded_until جلو نمی‌رود؛ کاربرانی که تا آن لحظه
+        بارگذاری شده‌اند در heap می‌مانند و بارگذاری دوباره آن‌ها را تکرار نمی‌کند.
+        """
+        segments = []
+        day = start.date()
+        while day <= end.date():
+            segment_start = start.time() if day == start.date() else dtime.min
+            segment_end = end.time() if day == end.date() else None
+            if segment_end is None or segment_start < segment_end:
+                segments.append((day, segment_start, segment_end))
+            day += timedelta(days=1)
+
+        loaded = 0
+        for day, segment_start, segment_end in segments:
+            rows = await self.db.get_reminders(day, segment_start, segment_end)
+            if rows is None:
+                logger.warning(f"Reminders from {start:%Y-%m-%d %H:%M} not loaded, retrying in {RETRY_DELAY}s")
+                return False
+            for user_id, reminder_time in rows:
+                if user_id not in self._due and (self.owns is None or self.owns(user_id)):
+                    self._push(user_id, datetime.combine(day, reminder_time, self.tz).timestamp())
+                    loaded += 1
+        self._loaded_until = end
+        logger.info(f"Loaded {loaded} reminders until {end:%Y-%m-%d %H:%M}")
+        return True
+
+    async def _run(self):
+        now = datetime.now(self.tz)
+        self._loaded_until = now - self.catchup
+        while not self._closing:
+            now = datetime.now(self.tz)
+            # پنجره بعدی کمی قبل از تمام شدن پنجره فعلی خوانده می‌شود
+            if now + self.window / 4 >= self._loaded_until:
+                if not await self._load(max(self._loaded_until, now - self.catchup), now + self.window):
+                    await self._sleep(RETRY_DELAY)
+                continue
+
+            batch = self._pop_due(now.timestamp())
+            if batch:
+                if not await self._send_batch(batch):
+                    await self._sleep(RETRY_DELAY)
+                continue
+
+            next_load = (self._loaded_until - self.window / 4 - now).total_seconds()
+            timeout = min(MAX_SLEEP, next_load)
+            if self._heap:
+                timeout = min(timeout, self._heap[0][0] - now.timestamp())
+            await self._sleep(timeout)
+
+    async def _sleep(self, timeout: float):
+        """خواب تا timeout ثانیه یا تا update یا close"""
+        self._wakeup.clear()
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), max(0.0, timeout))
+        except asyncio.TimeoutError:
+            pass
+
+    def _pop_due(self, now: float) -> List[Tuple[int, float]]:
+        batch = []
+        while self._heap and self._heap[0][0] <= now and len(batch) < self.batch_size:
+            due, user_id = heapq.heappop(self._heap)
+            if self._due.get(user_id) == due:
+                del self._due[user_id]
+                batch.append((user_id, due))
+        return batch
+
+    async def _send_batch(self, batch: List[Tuple[int, float]]) -> bool:
+        """ادعا و ارسال دسته؛ با خطای دیتابیس یادآوری‌هایی که ادعا نشدند به heap برمی‌گردند و False"""
+        by_day = defaultdict(list)
+        for user_id, due in batch:
+            by_day[datetime.fromtimestamp(due, self.tz).date()].append((user_id, due))
+
+        sent = True
+        for day, reminders in by_day.items():
+            user_ids = [user_id for user_id, _ in reminders]
+            claimed = await self.db.claim_reminders(user_ids, day)
+            if claimed is None:
+                for user_id, due in reminders:
+                    # مگر این‌که کاربر در این فاصله تنظیماتش را عوض کرده باشد
+                    if user_id not in self._due:
+                        self._push(user_id, due)
+                sent = False
+                continue
+            REMINDERS.labels("skipped").inc(len(user_ids) - len(claimed))
+            # تسک‌های ارسال اولویت را از context به ارث می‌برند
+            with send_priority(REMINDER):
+                await asyncio.gather(*(self._remind(user_id) for user_id in claimed))
+        return sent
+
+    async def _remind(self, user_id: int):
+        try:
+            await self.bot.send_message(user_id, REMINDER_TEXT)
+            REMINDERS.labels("sent").inc()
+        except (BotBlocked, UserDeactivated, ChatNotFound):
+            # کاربری که ربات را بسته دیگر یادآوری نمی‌گیرد
+            REMINDERS.labels("blocked").inc()
+            await self.db.set_notifications(user_id, False)
+        except Exception as e:
+            REMINDERS.labels("failed").inc()
+            logger.error(f"Error sending reminder to {user_id}: {e}")
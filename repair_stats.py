@@ -0,0 +1,60 @@
+"""بررسی و بازسازی جدول user_stats از workout_history
+
+    python repair_stats.py            # فقط کاربرانی که آمارشان با تاریخچه یکی نیست
+    python repair_stats.py --full     # بازسازی کامل (نوشتن تمرینات تا پایان منتظر می‌ماند)
+    python repair_stats.py --user 123 --user 456
+
+بعد از اولین استقرار user_stats، بعد از backfill.py و هر وقت نوشتن مستقیم در workout_history
+انجام شده اجرا شود.
+"""
+import argparse
+import asyncio
+import time
+import logging
+
+from config import DATABASE_URL
+from database import Database
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+async def run(full=False, user_ids=None, dry_run=False):
+    db = Database(DATABASE_URL)
+    await db.connect()
+    started = time.perf_counter()
+    try:
+        if full:
+            user_ids = None
+        elif not user_ids:
+            user_ids = await db.find_stale_user_stats()
+            if user_ids is None:
+                return False
+            logger.info(f"{len(user_ids)} users with stale stats")
+            if not user_ids:
+                return True
+
+        if dry_run:
+            logger.info(f"Dry run: would rebuild {'all users' if user_ids is None else user_ids[:20]}")
+            return True
+        rows = await db.rebuild_user_stats(user_ids)
+        if rows is None:
+            return False
+        logger.info(f"Rebuilt {rows} user_stats rows in {time.perf_counter() - started:.1f}s")
+        return True
+    finally:
+        await db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--full", action="store_true", help="بازسازی همه کاربران بدون بررسی")
+    parser.add_argument("--user", type=int, action="append", dest="users", help="فقط این کاربر (تکرارپذیر)")
+    parser.add_argument("--dry-run", action="store_true", help="فقط گزارش، بدون نوشتن")
+    args = parser.parse_args()
+    ok = asyncio.run(run(full=args.full, user_ids=args.users, dry_run=args.dry_run))
+    raise SystemExit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
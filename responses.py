@@ -0,0 +1,389 @@
+"""متن‌ها و کیبوردهای پاسخ ربات
+
+پاسخ‌های ثابت (راهنما، برنامه‌های هفتگی، سطح‌های قدرت) و کیبوردها یک بار هنگام import
+ساخته می‌شوند. کیبوردها به صورت JSON آماده نگه داشته می‌شوند؛ aiogram رشته را بدون
+ساختن دوباره شیء و سریال‌سازی می‌فرستد. گزارش تحلیل با یک join ساخته می‌شود و خط هر
+حرکت فقط بار اول قالب‌بندی می‌شود.
+"""
+import json
+
+from aiogram.types import ReplyKeyboardMarkup, KeyboardButton, InlineKeyboardMarkup, InlineKeyboardButton
+
+
+def prebuilt(markup) -> str:
+    """کیبورد به صورت payload آماده ارسال"""
+    return json.dumps(markup.to_python())
+
+
+def inline_keyboard(buttons, row_width=2) -> str:
+    keyboard = InlineKeyboardMarkup(row_width=row_width)
+    keyboard.add(*(InlineKeyboardButton(text, callback_data=data) for text, data in buttons))
+    return prebuilt(keyboard)
+
+
+# کیبورد اصلی
+_main_keyboard = ReplyKeyboardMarkup(resize_keyboard=True, row_width=2)
+_main_keyboard.add(
+    KeyboardButton("🏋 ثبت برنامه تمرینی"),
+    KeyboardButton("📊 تحلیل تمرین من"),
+    KeyboardButton("📅 ساخت برنامه هفتگی"),
+    KeyboardButton("⚡ ارتقای تمرین"),
+    KeyboardButton("📉 کاهش وزن هوشمند"),
+    KeyboardButton("📈 افزایش قدرت"),
+    KeyboardButton("🧠 راهنمای تمرین اصولی"),
+    KeyboardButton("⚙ تنظیمات")
+)
+MAIN_KEYBOARD = prebuilt(_main_keyboard)
+
+# کیبورد اینلاین برای بعد از تحلیل
+ANALYSIS_KEYBOARD = inline_keyboard((
+    ("🔥 سخت‌ترش کن", "make_harder"),
+    ("🧊 سبک‌ترش کن", "make_easier"),
+    ("⏱ تنظیم زمان استراحت", "adjust_rest"),
+    ("📋 ذخیره این تمرین", "save_workout"),
+    ("📤 خروجی PDF", "export_pdf"),
+    ("🔄 بازنویسی حرفه‌ای", "rewrite_pro"),
+))
+
+PLAN_KEYBOARD = inline_keyboard((
+    ("🔥 چربی‌سوزی", "plan_fatloss"),
+    ("💪 افزایش قدرت", "plan_strength"),
+    ("⚡ استقامتی", "plan_endurance"),
+    ("🧘 ترکیبی", "plan_mixed"),
+))
+
+# همه در یک ردیف (row_width پیش‌فرض)
+STRENGTH_KEYBOARD = inline_keyboard((
+    ("مبتدی", "strength_beginner"),
+    ("متوسط", "strength_intermediate"),
+    ("حرفه‌ای", "strength_advanced"),
+), row_width=3)
+
+SETTINGS_KEYBOARD = inline_keyboard((
+    ("🔔 اعلان‌ها", "settings_notifications"),
+    ("📊 سطح تمرین", "settings_level"),
+    ("🔄 بازنشانی", "settings_reset"),
+    ("📤 خروجی", "settings_export"),
+))
+
+EXPORT_KEYBOARD = inline_keyboard((
+    ("📄 CSV", "export_csv"),
+    ("🧾 JSON", "export_json"),
+    ("📕 PDF", "export_pdf"),
+), row_width=3)
+
+REST_KEYBOARD = inline_keyboard((
+    ("۳۰ ثانیه", "rest_30"),
+    ("۴۵ ثانیه", "rest_45"),
+    ("۶۰ ثانیه", "rest_60"),
+    ("۹۰ ثانیه", "rest_90"),
+    ("۲ دقیقه", "rest_120"),
+), row_width=3)
+
+LEVEL_KEYBOARD = inline_keyboard((
+    ("مبتدی", "level_beginner"),
+    ("متوسط", "level_intermediate"),
+    ("حرفه‌ای", "level_advanced"),
+), row_width=3)
+
+# پیام‌های ثابت
+WORKOUT_PROMPT = (
+    "📝 لطفاً تمریناتت رو به این شکل برام بنویس:\n\n"
+    "دراز نشست=۲۰\n"
+    "شنا=۱۰\n"
+    "اسکات=۵\n"
+    "طناب=۳ دقیقه\n\n"
+    "یا هر شکل دیگه‌ای که راحت‌تری ✍️"
+)
+
+WORKOUT_NOT_UNDERSTOOD = "❌ متوجه تمرینات نشدم! لطفاً دوباره با فرمت واضح‌تر بنویس."
+
+NO_HISTORY = "📭 هنوز تمرینی ثبت نکردی! از دکمه 'ثبت برنامه تمرینی' شروع کن."
+
+PLAN_PROMPT = "🎯 **هدف خود از برنامه هفتگی رو انتخاب کن:**"
+
+UPGRADE_PROMPT = "📝 تمرین فعلیت رو برام بنویس تا نسخه پیشرفته‌ترش رو بهت بدم:"
+
+WEIGHT_LOSS_PROMPT = (
+    "🎯 **برنامه کاهش وزن هوشمند:**\n\n"
+    "برای شروع، اطلاعات زیر رو برام بفرست:\n"
+    "1️⃣ وزن فعلی\n"
+    "2️⃣ وزن هدف\n"
+    "3️⃣ تعداد جلسات تمرین در هفته\n\n"
+    "مثال: ۷۵, ۶۵, ۴"
+)
+
+STRENGTH_PROMPT = (
+    "💪 **برنامه افزایش قدرت:**\n\n"
+    "برای شروع، سطح فعلی خودت رو انتخاب کن:"
+)
+
+SETTINGS_PROMPT = (
+    "⚙ **تنظیمات ربات:**\n\n"
+    "از اینجا می‌تونی تنظیمات ربات رو شخصی‌سازی کنی."
+)
+
+TUTORIAL_TEXT = """
+🧠 **راهنمای تمرین اصولی:**
+
+🔹 **قبل از تمرین:**
+• ۱۰ دقیقه گرم کردن
+• حرکات کششی پویا
+• نوشیدن آب کافی
+
+🔸 **حین تمرین:**
+• فرم صحیح حرکات رو رعایت کن
+• بین حرکات ۳۰-۶۰ ثانیه استراحت کن
+• هر ۱۵-۲۰ دقیقه آب بخور
+
+🔹 **بعد از تمرین:**
+• ۵-۱۰ دقیقه سرد کردن
+• حرکات کششی ایستا
+• تغذیه مناسب (پروتئین + کربوهیدرات)
+
+⚠ **نکات مهم:**
+• به بدن خود گوش کن
+• در صورت درد شدید، تمرین رو قطع کن
+• پیشرفت تدریجی داشته باش
+• ۴۸ ساعت بین تمرینات یک گروه عضلانی فاصله بنداز
+
+💧 **هیدراتاسیون:**
+• قبل تمرین: ۵۰۰ میلی‌لیتر
+• حین تمرین: هر ۱۵ دقیقه ۲۰۰ میلی‌لیتر
+• بعد تمرین: ۵۰۰ میلی‌لیتر به ازای هر نیم‌ساعت
+"""
+
+PING_REPLY = "🏓 پونگ! ربات فعال است."
+
+# پاسخ callbackهای ثابت
+MAKE_HARDER_REPLY = (
+    "🔥 **نسخه سخت‌تر تمرین:**\n\n"
+    "برای دریافت نسخه سخت‌تر، لطفاً تمرین فعلیت رو با دکمه ثبت برنامه وارد کن."
+)
+MAKE_EASIER_REPLY = (
+    "🧊 **نسخه سبک‌تر تمرین:**\n\n"
+    "برای شروع می‌تونی تعداد تکرارها رو ۲۰٪ کاهش بدی و زمان استراحت رو افزایش بدی."
+)
+REST_PROMPT = "⏱ **زمان استراحت مورد نظر را انتخاب کن:**"
+SAVE_WORKOUT_REPLY = "✅ تمرین با موفقیت در تاریخچه شما ذخیره شد!"
+EXPORT_PDF_REPLY = "📤 در حال آماده‌سازی PDF... لطفاً صبر کنید."
+REWRITE_PRO_REPLY = "🔄 در حال بازنویسی حرفه‌ای تمرین..."
+NOTIFICATIONS_REPLY = "🔔 اعلان‌ها با موفقیت تغییر کرد!"
+LEVEL_PROMPT = "📊 سطح تمرینی خود را انتخاب کن:"
+RESET_REPLY = "🔄 تنظیمات به حالت پیش‌فرض بازگشت!"
+EXPORT_REPLY = "📤 اطلاعات شما در حال آماده‌سازی است..."
+EXPORT_FORMAT_PROMPT = "📤 خروجی تاریخچه تمرین‌هات رو با چه فرمتی می‌خوای؟"
+EXPORT_BUSY = "⏳ خروجی قبلی هنوز در حال آماده‌سازی است."
+EXPORT_FAILED = "❌ ساخت خروجی با خطا مواجه شد. لطفاً کمی بعد دوباره امتحان کن."
+export_caption = "📤 تاریخچه تمرین شما ({} جلسه)".format
+EXPORT_PDF_TITLE = "گزارش تاریخچه تمرین"
+export_pdf_entry = "{} | کالری: {} | شدت: {} | حجم: {}".format
+export_pdf_summary = "مجموع: {} جلسه، {} کالری، حجم {}".format
+
+REMINDER_TEXT = "⏰ وقت تمرینه! برنامه امروزت رو ثبت کن تا تحلیلش کنم 💪"
+REMINDER_USAGE = (
+    "⏰ برای تنظیم یادآوری روزانه ساعت را بفرست:\n"
+    "/reminder 18:30\n\n"
+    "برای خاموش کردن: /reminder off"
+)
+REMINDER_OFF_REPLY = "🔕 یادآوری تمرین خاموش شد."
+reminder_set_reply = "✅ یادآوری تمرین هر روز ساعت {:%H:%M} فرستاده می‌شود.".format
+
+NO_STATS = "📈 هنوز آماری نداری. اولین تمرینت رو ثبت کن!"
+
+WORK_BUSY = "⏳ سرور الان شلوغه و تحلیل این تمرین تموم نشد. لطفاً کمی بعد دوباره بفرست."
+CANCEL_REPLY = "❎ لغو شد."
+NOTHING_TO_CANCEL = "چیزی برای لغو کردن نیست."
+PROGRESS_BUSY = "⏳ سرور الان شلوغه و گزارش پیشرفت آماده نشد. لطفاً کمی بعد دوباره امتحان کن."
+stats_reply = (
+    "📈 **آمار تمرین شما:**\n\n"
+    "📅 **این هفته:**\n"
+    "• {sessions} جلسه در {days} روز\n"
+    "• کالری: {calories}\n"
+    "• حجم: {volume}\n\n"
+    "🏆 **از ابتدا:**\n"
+    "• {total_sessions} جلسه\n"
+    "• کالری: {total_calories}\n"
+    "• حجم: {total_volume}\n\n"
+    "🔥 هفته‌های پشت سر هم با تمرین: {streak}"
+).format_map
+
+WEEKLY_PLANS = {
+    "fatloss": "🔥 **برنامه چربی‌سوزی هفتگی:**\n\n"
+               "شنبه: هوازی ۴۵ دقیقه + کرانچ\n"
+               "یک‌شنبه: تمرین قدرتی تمام بدن\n"
+               "دوشنبه: استراحت یا یوگا\n"
+               "سه‌شنبه: اینتروال ۳۰ دقیقه\n"
+               "چهارشنبه: تمرین قدرتی میان‌تنه\n"
+               "پنج‌شنبه: هوازی ۶۰ دقیقه\n"
+               "جمعه: استراحت فعال",
+
+    "strength": "💪 **برنامه افزایش قدرت هفتگی:**\n\n"
+                "شنبه: سینه و پشت بازو\n"
+                "یک‌شنبه: پا و سرشانه\n"
+                "دوشنبه: استراحت\n"
+                "سه‌شنبه: پشت و جلو بازو\n"
+                "چهارشنبه: پا و سرشانه\n"
+                "پنج‌شنبه: سینه و زیربغل\n"
+                "جمعه: استراحت",
+
+    "endurance": "⚡ **برنامه استقامتی هفتگی:**\n\n"
+                 "شنبه: دویدن ۵ کیلومتر\n"
+                 "یک‌شنبه: شنا ۱۰۰۰ متر\n"
+                 "دوشنبه: دوچرخه ۲۰ کیلومتر\n"
+                 "سه‌شنبه: تمرین تناوبی\n"
+                 "چهارشنبه: استراحت\n"
+                 "پنج‌شنبه: کوهنوردی\n"
+                 "جمعه: پیاده‌روی سریع",
+
+    "mixed": "🧘 **برنامه ترکیبی هفتگی:**\n\n"
+             "شنبه: قدرتی بالاتنه + هوازی\n"
+             "یک‌شنبه: یوگا و کشش\n"
+             "دوشنبه: قدرتی پایین‌تنه\n"
+             "سه‌شنبه: اینتروال + کرانچ\n"
+             "چهارشنبه: استراحت\n"
+             "پنج‌شنبه: تمرین دایره‌ای\n"
+             "جمعه: پیاده‌روی طولانی"
+}
+PLAN_NOT_FOUND = "برنامه مورد نظر یافت نشد."
+
+STRENGTH_LEVELS = {
+    "beginner": "💪 برنامه مبتدی: ۳ جلسه در هفته، تمرینات پایه",
+    "intermediate": "💪 برنامه متوسط: ۴ جلسه در هفته، تمرینات ترکیبی",
+    "advanced": "💪 برنامه حرفه‌ای: ۵ جلسه در هفته، تمرینات پیشرفته"
+}
+STRENGTH_UNKNOWN = "💪 برنامه انتخابی"
+
+# قالب‌های پاسخ‌های پویا
+_REST_TEMPLATE = (
+    "✅ زمان استراحت روی {0} ثانیه تنظیم شد.\n\n"
+    "به یاد داشته باش که بین ستها هم {0} ثانیه استراحت کنی."
+).format
+REST_REPLIES = {seconds: _REST_TEMPLATE(seconds) for seconds in (30, 45, 60, 90, 120)}
+
+
+def rest_reply(seconds: int) -> str:
+    reply = REST_REPLIES.get(seconds)
+    return reply if reply is not None else _REST_TEMPLATE(seconds)
+
+
+level_reply = "✅ سطح شما به {} تغییر کرد!".format
+
+# مقدار level_ در دکمه‌های سطح -> نام فارسی (ستون fitness_level هر دو شکل را دارد)
+LEVEL_NAMES = {"beginner": "مبتدی", "intermediate": "متوسط", "advanced": "حرفه‌ای"}
+
+
+def settings_prompt(profile) -> str:
+    """متن منوی تنظیمات با تنظیمات فعلی کاربر؛ بدون پروفایل همان متن ثابت"""
+    if profile is None:
+        return SETTINGS_PROMPT
+    reminder = f"{profile.reminder_time:%H:%M}" if profile.notifications and profile.reminder_time else "خاموش"
+    return (
+        f"{SETTINGS_PROMPT}\n\n"
+        f"📊 سطح: {LEVEL_NAMES.get(profile.fitness_level, profile.fitness_level)}\n"
+        f"🔔 اعلان‌ها: {'روشن' if profile.notifications else 'خاموش'}\n"
+        f"⏰ یادآوری روزانه: {reminder}"
+    )
+
+
+_REPORT_HEADER = "🔥 **تحلیل تمرین شما:**\n\n📋 **تمرینات ثبت شده:**\n"
+_IMBALANCE_HEADER = "⚠ **هشدارهای تعادل:**\n• "
+_OVERTRAINING_HEADER = "⚠ **هشدار تمرین بیش از حد:**\n• "
+_SUGGESTIONS_HEADER = "🧠 **پیشنهادات هوشمند:**\n• "
+_BULLET_SEPARATOR = "\n• "
+
+# خط هر حرکت یک بار ساخته می‌شود؛ حرکات پرتکرار بین کاربران مشترک‌اند
+_EXERCISE_LINES = {}
+_EXERCISE_LINES_MAX = 8192
+
+
+def _exercise_line(ex) -> str:
+    line = _EXERCISE_LINES.get(ex)
+    if line is None:
+        if len(_EXERCISE_LINES) >= _EXERCISE_LINES_MAX:
+            _EXERCISE_LINES.clear()
+        line = _EXERCISE_LINES[ex] = f"• {ex.name}: {ex.value} {ex.unit} (دسته: {ex.category})\n"
+    return line
+
+
+def render_report(report) -> str:
+    """متن پیام نتیجه تحلیل از روی WorkoutReport"""
+    parts = [_REPORT_HEADER]
+    parts += map(_exercise_line, report.exercises)
+    parts.append(
+        f"\n📊 **آمار کلی:**\n"
+        f"• حجم کل: {report.volume}\n"
+        f"• کالری تقریبی: {report.calories} کالری\n"
+        f"• هدف تمرین: {report.goal}\n"
+        f"• سطح سختی: {report.difficulty}\n"
+        f"\n⏱ **زمان استراحت پیشنهادی:**\n"
+        f"• بین حرکات: {report.rest_time} ثانیه\n"
+        f"💧 آب: هر ۱۵ دقیقه\n\n"
+    )
+    if report.imbalances:
+        parts += (_IMBALANCE_HEADER, _BULLET_SEPARATOR.join(report.imbalances), "\n\n")
+    if report.overtraining:
+        parts += (_OVERTRAINING_HEADER, _BULLET_SEPARATOR.join(report.overtraining), "\n\n")
+    parts.append(f"📈 **پیشنهاد بهینه‌سازی:**\n{report.improvements}\n\n")
+    if report.suggestions:
+        parts += (_SUGGESTIONS_HEADER, _BULLET_SEPARATOR.join(report.suggestions), "\n")
+    return "".join(parts)
+
+
+_OVERLOAD_STATUS = {
+    "up": "📈 پیشرفت",
+    "flat": "➖ ثابت؛ وقت افزایش تکرار یا زمان است",
+    "down": "📉 افت",
+}
+_SPARK = "▁▂▃▄▅▆▇█"
+
+
+def _change(current, previous) -> str:
+    if not previous:
+        return "جدید" if current else "—"
+    return f"{round(100 * (current - previous) / previous):+d}٪"
+
+
+def _share(percent) -> str:
+    return "—" if percent is None else f"{percent}٪"
+
+
+def _trend_line(label, trend) -> str:
+    if trend is None:
+        return f"• {label}: داده کافی نیست\n"
+    return f"• {label}: {trend:+d}٪ در هفته\n"
+
+
+def _sparkline(values) -> str:
+    top = max(values) or 1
+    return "".join(_SPARK[round(v / top * (len(_SPARK) - 1))] for v in values)
+
+
+def render_progress(report) -> str:
+    """متن گزارش پیشرفت از روی ProgressReport"""
+    this_week, last_week = report.this_week, report.last_week
+    parts = [
+        f"📊 **گزارش پیشرفت شما:**\n\n"
+        f"🏋 {report.sessions} جلسه از {report.first_date:%Y-%m-%d}؛ آخرین تمرین {report.last_date:%Y-%m-%d}\n\n"
+        f"📅 **این هفته در برابر هفته قبل:**\n"
+        f"• جلسات: {this_week.sessions} ({_change(this_week.sessions, last_week.sessions)})\n"
+        f"• کالری: {this_week.calories} ({_change(this_week.calories, last_week.calories)})\n"
+        f"• حجم: {this_week.volume} ({_change(this_week.volume, last_week.volume)})\n\n"
+        f"📈 **روند {len(report.weeks)} هفته اخیر:**\n"
+        f"• حجم هفتگی: {_sparkline([w.volume for w in report.weeks])}\n",
+        _trend_line("حجم", report.volume_trend),
+        _trend_line("کالری", report.calories_trend),
+    ]
+    if report.category_mix:
+        parts.append("\n🧩 **ترکیب دسته‌ها (نیمه اول ← نیمه دوم بازه):**\n")
+        parts += (
+            f"• {category}: {_share(earlier)} ← {_share(recent)}\n"
+            for category, earlier, recent in report.category_mix
+        )
+    if report.overload:
+        parts.append("\n💪 **اضافه‌بار تدریجی (میانگین جلسات قبل ← جلسات اخیر):**\n")
+        parts += (
+            f"• {ex.name}: {ex.before:g} ← {ex.recent:g} {ex.unit} {_OVERLOAD_STATUS[ex.status]}\n"
+            for ex in report.overload
+        )
+    return "".join(parts)
@@ -0,0 +1,380 @@
+import asyncio
+import heapq
+import itertools
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+import logging
+
+from aiogram.utils.exceptions import RetryAfter
+
+from bot_metrics import InstrumentedBot
+from config import SEND_GLOBAL_RATE, SEND_CHAT_RATE, SEND_CHAT_BURST, SEND_GROUP_RATE, SEND_MAX_RETRIES
+from metrics import SEND_QUEUE_SECONDS, SEND_RETRY_AFTER, SEND_COALESCED
+
+logger = logging.getLogger(__name__)
+
+# اولویت‌ها؛ عدد کمتر زودتر ارسال می‌شود
+INTERACTIVE = 0
+REMINDER = 1
+BROADCAST = 2
+PRIORITY_NAMES = {INTERACTIVE: "interactive", REMINDER: "reminder", BROADCAST: "broadcast"}
+
+# متدهایی که در محدودیت پیام تلگرام حساب می‌شوند؛ بقیه (مثل answerCallbackQuery) مستقیم می‌روند
+SCHEDULED_METHODS = frozenset((
+    "sendMessage", "sendDocument", "sendPhoto", "sendAudio", "sendVideo", "sendVoice", "sendAnimation",
+    "sendSticker", "sendLocation", "sendMediaGroup", "copyMessage", "forwardMessage",
+))
+
+# پیام‌هایی که فقط این پارامترها را دارند می‌توانند با پیام بعدی همان چت یکی شوند
+_COALESCE_KEYS = frozenset(("chat_id", "text", "parse_mode", "disable_notification", "disable_web_page_preview"))
+MAX_MESSAGE_LENGTH = 4096
+
+_priority: ContextVar[int] = ContextVar("send_priority", default=INTERACTIVE)
+
+
+class SchedulerClosed(Exception):
+    """زمان‌بند ارسال بسته شد و پیام فرستاده نشد"""
+
+
+@contextmanager
+def send_priority(priority: int):
+    """ارسال‌های داخل این بلوک (و تسک‌هایی که در آن ساخته می‌شوند) با این اولویت صف می‌شوند"""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class TokenBucket:
+    """سطل توکن با نرخ rate در ثانیه و ظرفیت capacity؛ rate صفر یعنی بدون محدودیت"""
+
+    __slots__ = ("rate", "capacity", "tokens", "updated", "blocked_until")
+
+    def __init__(self, rate: float, capacity: float, now: float):
+        self.rate = rate
+        self.capacity = max(1.0, capacity)
+        self.tokens = self.capacity
+        self.updated = now
+        self.blocked_until = 0.0
+
+    def _refill(self, now: float):
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def delay(self, now: float) -> float:
+        """چند ثانیه تا در دسترس بودن یک توکن"""
+        blocked = self.blocked_until - now
+        if self.rate <= 0:
+            return max(0.0, blocked)
+        self._refill(now)
+        missing = (1 - self.tokens) / self.rate if self.tokens < 1 else 0.0
+        return max(0.0, blocked, missing)
+
+    def consume(self, now: float):
+        if self.rate > 0:
+            self._refill(now)
+            self.tokens -= 1
+
+    def block(self, until: float):
+        """توقف تا until (پاسخ 429)؛ بعد از آن با سطل خالی و بدون burst ادامه می‌دهد"""
+        if until > self.blocked_until:
+            self.blocked_until = until
+            self.tokens = 0.0
+            self.updated = until
+
+    def idle(self, now: float) -> bool:
+        """سطل پر است و دیگر لازم نیست نگه داشته شود"""
+        if now < self.blocked_until:
+            return False
+        if self.rate <= 0:
+            return True
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+
+class _Job:
+    __slots__ = ("priority", "seq", "method", "data", "files", "kwargs", "future", "submitted", "attempts")
+
+    def __init__(self, priority, seq, method, data, files, kwargs, future, submitted):
+        self.priority = priority
+        self.seq = seq
+        self.method = method
+        self.data = data
+        self.files = files
+        self.kwargs = kwargs
+        self.future = future
+        self.submitted = submitted
+        self.attempts = 0
+
+    def __lt__(self, other):
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class SendScheduler:
+    """صف ارسال پیام با محدودیت نرخ سراسری و هر چت و اولویت‌بندی
+
+    هر چت صف خودش (به ترتیب اولویت و زمان) و سطل توکن خودش را دارد. چت‌هایی که سطلشان
+    آماده است در یک heap به ترتیب اولویت پیام اولشان منتظرند و حلقه ارسال با سطل سراسری
+    از آن‌ها برمی‌دارد؛ پس جواب‌های تعاملی جلوتر از یادآوری‌ها و پیام‌های همگانی می‌روند و
+    یک چت پرترافیک بقیه را معطل نمی‌کند. پاسخ 429 چت را به اندازه retry_after متوقف می‌کند و
+    پیام دوباره در ابتدای صف همان چت قرار می‌گیرد. پیام‌های متنی ساده غیرتعاملی که پشت
+    سر هم برای یک چت صف شده‌اند در یک sendMessage فرستاده می‌شوند.
+    """
+
+    def __init__(self, send: Callable[..., Awaitable[Any]], global_rate=SEND_GLOBAL_RATE, chat_rate=SEND_CHAT_RATE,
+                 chat_burst=SEND_CHAT_BURST, group_rate=SEND_GROUP_RATE, max_retries=SEND_MAX_RETRIES):
+        self.send = send
+        self.global_rate = global_rate
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.group_rate = group_rate
+        self.max_retries = max_retries
+        self._seq = itertools.count()
+        # chat_id -> heap از _Job
+        self._chats: Dict[Any, List[_Job]] = {}
+        self._buckets: Dict[Any, TokenBucket] = {}
+        # (اولویت، ترتیب، chat_id) برای چت‌های آماده و (زمان آماده شدن، ترتیب، chat_id) برای بقیه
+        self._ready: List[tuple] = []
+        self._waiting: List[tuple] = []
+        # chat_id -> ترتیب آخرین ورودی معتبر در heapها؛ ورودی‌های قدیمی‌تر نادیده گرفته می‌شوند
+        self._scheduled: Dict[Any, int] = {}
+        self._global: Optional[TokenBucket] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._inflight: Set[asyncio.Task] = set()
+        self._pending = 0
+        self._task = None
+        self._closing = False
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._closing
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def start(self):
+        """شروع حلقه ارسال در پس‌زمینه"""
+        loop = asyncio.get_running_loop()
+        # ظرفیت یک: ارسال‌ها یکنواخت پخش می‌شوند و در هیچ پنجره یک‌ثانیه‌ای از حد نمی‌گذرند
+        self._global = TokenBucket(self.global_rate, 1, loop.time())
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"Send scheduler started (global {self.global_rate}/s, per chat {self.chat_rate}/s)")
+
+    async def close(self, timeout: float = 10):
+        """ارسال پیام‌های صف‌شده (حداکثر timeout ثانیه) و توقف"""
+        if self._task is None:
+            return
+        self._closing = True
+        self._wakeup.set()
+        try:
+            await asyncio.wait_for(asyncio.shield(self._task), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Send scheduler closed with {self._pending} messages unsent")
+            self._task.cancel()
+            self._fail_queued()
+        self._task = None
+        logger.info("Send scheduler stopped")
+
+    async def submit(self, chat_id, method: str, data: dict, files=None, priority: Optional[int] = None, **kwargs):
+        """صف کردن یک درخواست و انتظار برای نتیجه آن"""
+        loop = asyncio.get_running_loop()
+        if priority is None:
+            priority = _priority.get()
+        job = _Job(priority, next(self._seq), method, data, files, kwargs, loop.create_future(), time.perf_counter())
+        queue = self._chats.setdefault(chat_id, [])
+        heapq.heappush(queue, job)
+        self._pending += 1
+        # اگر پیام جدید اول صف چت شد، اولویت چت در heap آماده‌ها عوض می‌شود
+        if queue[0] is job:
+            self._schedule_chat(chat_id, loop.time())
+            self._wakeup.set()
+        return await job.future
+
+    def _bucket(self, chat_id, now: float) -> TokenBucket:
+        bucket = self._buckets.get(chat_id)
+        if bucket is None:
+            if isinstance(chat_id, int) and chat_id < 0:
+                bucket = TokenBucket(self.group_rate, 1, now)
+            else:
+                bucket = TokenBucket(self.chat_rate, self.chat_burst, now)
+            self._buckets[chat_id] = bucket
+        return bucket
+
+    def _schedule_chat(self, chat_id, now: float):
+        queue = self._chats.get(chat_id)
+        if not queue:
+            self._chats.pop(chat_id, None)
+            self._scheduled.pop(chat_id, None)
+            return
+        seq = next(self._seq)
+        self._scheduled[chat_id] = seq
+        delay = self._bucket(chat_id, now).delay(now)
+        if delay > 0:
+            heapq.heappush(self._waiting, (now + delay, seq, chat_id))
+        else:
+            heapq.heappush(self._ready, (queue[0].priority, seq, chat_id))
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        last_prune = loop.time()
+        while True:
+            now = loop.time()
+            while self._waiting and self._waiting[0][0] <= now:
+                _, seq, chat_id = heapq.heappop(self._waiting)
+                if self._scheduled.get(chat_id) == seq:
+                    heapq.heappush(self._ready, (self._chats[chat_id][0].priority, seq, chat_id))
+
+            if not self._ready:
+                if self._closing and not self._chats:
+                    break
+                if now - last_prune > 60:
+                    self._prune(now)
+                    last_prune = now
+                self._wakeup.clear()
+                timeout = self._waiting[0][0] - now if self._waiting else None
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            delay = self._global.delay(now)
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+
+            _, seq, chat_id = heapq.heappop(self._ready)
+            if self._scheduled.get(chat_id) != seq:
+                continue
+            bucket = self._bucket(chat_id, now)
+            if bucket.delay(now) > 0:
+                # بعد از زمان‌بندی با 429 متوقف شده
+                self._schedule_chat(chat_id, now)
+                continue
+
+            jobs = self._take(chat_id)
+            bucket.consume(now)
+            self._global.consume(now)
+            self._schedule_chat(chat_id, now)
+            task = asyncio.create_task(self._send(chat_id, jobs))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+        if self._inflight:
+            await asyncio.gather(*self._inflight, return_exceptions=True)
+        # پیام‌هایی که ارسال در جریانشان با 429 دوباره صف کرده
+        if self._chats:
+            logger.warning(f"Send scheduler closed with {self._pending} messages requeued after flood control")
+            self._fail_queued()
+
+    def _fail_queued(self):
+        """تمام کردن future همه پیام‌های صف با SchedulerClosed تا فراخواننده‌ها منتظر نمانند"""
+        chats, self._chats = self._chats, {}
+        self._scheduled.clear()
+        self._ready.clear()
+        self._waiting.clear()
+        for queue in chats.values():
+            for job in queue:
+                self._finish(job, error=SchedulerClosed(f"{job.method} to chat {job.data.get('chat_id')} not sent"))
+
+    def _take(self, chat_id) -> List[_Job]:
+        """پیام اول صف چت و پیام‌های متنی ساده هم‌اولویتی که می‌شود با آن یکی کرد"""
+        queue = self._chats[chat_id]
+        job = heapq.heappop(queue)
+        jobs = [job]
+        if not self._coalescable(job):
+            return jobs
+        length = len(job.data["text"])
+        while queue and queue[0].priority == job.priority and self._coalescable(queue[0]):
+            other = queue[0]
+            if any(other.data.get(key) != job.data.get(key) for key in _COALESCE_KEYS if key != "text"):
+                break
+            length += 2 + len(other.data["text"])
+            if length > MAX_MESSAGE_LENGTH:
+                break
+            jobs.append(heapq.heappop(queue))
+        return jobs
+
+    @staticmethod
+    def _coalescable(job: _Job) -> bool:
+        return (job.priority != INTERACTIVE and job.method == "sendMessage" and not job.files and not job.kwargs
+                and isinstance(job.data.get("text"), str) and _COALESCE_KEYS.issuperset(job.data))
+
+    async def _send(self, chat_id, jobs: List[_Job]):
+        job = jobs[0]
+        data = job.data
+        if len(jobs) > 1:
+            data = dict(data, text="\n\n".join(j.data["text"] for j in jobs))
+            SEND_COALESCED.inc(len(jobs) - 1)
+        started = time.perf_counter()
+        for j in jobs:
+            if j.attempts == 0:
+                SEND_QUEUE_SECONDS.labels(PRIORITY_NAMES.get(j.priority, str(j.priority))).observe(started - j.submitted)
+
+        try:
+            result = await self.send(job.method, data, job.files, **job.kwargs)
+        except RetryAfter as e:
+            SEND_RETRY_AFTER.labels(job.method).inc()
+            loop = asyncio.get_running_loop()
+            now = loop.time()
+            self._bucket(chat_id, now).block(now + e.timeout)
+            logger.warning(f"Flood control for chat {chat_id}: retry in {e.timeout}s")
+            # فایل‌های آپلودی در تلاش بعدی از ابتدا خوانده شوند
+            for input_file in (job.files or {}).values():
+                stream = getattr(input_file, "file", None)
+                if stream is not None and stream.seekable():
+                    stream.seek(0)
+            queue = self._chats.setdefault(chat_id, [])
+            for j in jobs:
+                j.attempts += 1
+                if j.attempts > self.max_retries:
+                    self._finish(j, error=e)
+                else:
+                    # ترتیب قبلی حفظ می‌شود پس دوباره اول صف چت قرار می‌گیرد
+                    heapq.heappush(queue, j)
+            self._schedule_chat(chat_id, now)
+            self._wakeup.set()
+        except Exception as e:
+            for j in jobs:
+                self._finish(j, error=e)
+        else:
+            for j in jobs:
+                self._finish(j, result=result)
+
+    def _finish(self, job: _Job, result=None, error: Optional[BaseException] = None):
+        self._pending -= 1
+        if job.future.done():
+            return
+        if error is not None:
+            job.future.set_exception(error)
+        else:
+            job.future.set_result(result)
+
+    def _prune(self, now: float):
+        """حذف سطل‌های پر چت‌هایی که پیامی در صف ندارند"""
+        idle = [chat_id for chat_id, bucket in self._buckets.items()
+                if chat_id not in self._chats and bucket.idle(now)]
+        for chat_id in idle:
+            del self._buckets[chat_id]
+
+
+class ScheduledBot(InstrumentedBot):
+    """Bot ای که ارسال پیام‌ها را از SendScheduler می‌گذراند
+
+    وقتی زمان‌بند اجرا نمی‌شود (قبل از startup یا بعد از shutdown) درخواست‌ها مستقیم ارسال می‌شوند.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.scheduler = SendScheduler(super().request)
+
+    async def request(self, method, data=None, files=None, **kwargs):
+        if method in SCHEDULED_METHODS and data and "chat_id" in data and self.scheduler.running:
+            return await self.scheduler.submit(data["chat_id"], method, data, files, **kwargs)
+        return await super().request(method, data, files, **kwargs)
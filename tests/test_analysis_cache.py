@@ -0,0 +1,36 @@
+import asyncio
+
+from analysis_cache import AnalysisCache
+
+
+class Cancelled(Exception):
+    pass
+
+
+def test_private_error_does_not_reach_other_waiters():
+    async def scenario():
+        cache = AnalysisCache("v1", private_errors=(Cancelled,))
+        release = asyncio.Event()
+        calls = []
+
+        async def cancelled_compute(text):
+            calls.append("first")
+            await release.wait()
+            raise Cancelled()
+
+        async def compute(text):
+            calls.append("second")
+            return text.upper()
+
+        first = asyncio.create_task(cache.get_or_compute("squat 3x5", cancelled_compute))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(cache.get_or_compute("squat 3x5", compute))
+        await asyncio.sleep(0)
+        release.set()
+        results = await asyncio.gather(first, second, return_exceptions=True)
+        return results, calls
+
+    (first, second), calls = asyncio.run(scenario())
+    assert isinstance(first, Cancelled)
+    assert second == "SQUAT 3X5"
+    assert calls == ["first", "second"]
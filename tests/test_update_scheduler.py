@@ -0,0 +1,57 @@
+import asyncio
+import time
+
+from aiogram import types
+
+from update_scheduler import UpdateScheduler
+from work_pool import WorkPool, WorkCancelled
+
+USER_ID = 42
+
+
+def slow_analysis(seconds):
+    time.sleep(seconds)
+    return "done"
+
+
+def message_update(update_id, text):
+    message = {
+        "message_id": update_id,
+        "date": 0,
+        "chat": {"id": USER_ID, "type": "private"},
+        "from": {"id": USER_ID, "is_bot": False, "first_name": "test"},
+        "text": text,
+    }
+    return types.Update(update_id=update_id, message=message)
+
+
+def test_cancel_reaches_running_analysis_of_same_user():
+    async def scenario():
+        work_pool = WorkPool(processes=1, threads=1)
+        work_pool.start()
+
+        async def process(update):
+            if update.message.text == "/cancel":
+                return [work_pool.cancel(update.message.from_user.id)]
+            try:
+                return [await work_pool.run_cpu(slow_analysis, 2, user_id=update.message.from_user.id)]
+            except WorkCancelled:
+                return ["cancelled"]
+
+        scheduler = UpdateScheduler(process, concurrency=4)
+        scheduler.start()
+        try:
+            started = time.perf_counter()
+            workout = scheduler.submit(message_update(1, "bench press 3x10"))
+            await asyncio.sleep(0.3)
+            cancel = scheduler.submit(message_update(2, "/cancel"))
+            results = await asyncio.wait_for(asyncio.gather(workout, cancel), 5)
+            return results, time.perf_counter() - started
+        finally:
+            await scheduler.close()
+            await work_pool.close()
+
+    (workout, cancel), elapsed = asyncio.run(scenario())
+    assert cancel == [1]
+    assert workout == ["cancelled"]
+    assert elapsed < 1.5
@@ -0,0 +1,52 @@
+import asyncio
+import os
+
+import pytest
+
+from database import Database
+from workout_writer import WorkoutWriter
+
+# TEST_DATABASE_URL=postgresql://... DATABASE_SSLMODE=disable python -m pytest tests
+TEST_DATABASE_URL = os.environ.get("TEST_DATABASE_URL")
+USER_ID = 990000001
+ORPHAN_ID = 990000002
+
+pytestmark = pytest.mark.skipif(not TEST_DATABASE_URL, reason="TEST_DATABASE_URL is not set")
+
+
+def cleanup(db):
+    conn = db.get_connection()
+    with conn, conn.cursor() as cur:
+        for table in ("user_stats", "workout_history", "user_settings", "users"):
+            cur.execute(f"DELETE FROM {table} WHERE user_id = ANY(%s)", ([USER_ID, ORPHAN_ID],))
+    conn.close()
+
+
+def test_orphan_row_does_not_drop_batch():
+    async def scenario():
+        db = Database(TEST_DATABASE_URL, min_connections=1, max_connections=2)
+        await db.connect()
+        cleanup(db)
+        try:
+            await db.add_user(USER_ID, "test", "test", None)
+            writer = WorkoutWriter(db, max_batch=10, flush_interval=60, max_retries=1)
+            notified = []
+            writer.add_listener(notified.append)
+            writer.start()
+            for user_id in (USER_ID, ORPHAN_ID, USER_ID):
+                await writer.save_workout(user_id, "squat 3x5", "ok", 100, "medium", 500)
+            await writer.close()
+
+            rows = await db.get_user_history(USER_ID)
+            orphans = await db.get_user_history(ORPHAN_ID)
+            stats = await db.get_user_stats(USER_ID)
+            return len(rows), len(orphans), stats["sessions"], notified
+        finally:
+            cleanup(db)
+            await db.close()
+
+    saved, orphans, sessions, notified = asyncio.run(scenario())
+    assert saved == 2
+    assert orphans == 0
+    assert sessions == 2
+    assert notified == [{USER_ID}]
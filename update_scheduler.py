@@ -0,0 +1,227 @@
+import asyncio
+import hmac
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Set, Tuple
+import logging
+
+from aiogram import Dispatcher, types
+from aiogram.dispatcher.webhook import WebhookRequestHandler
+from aiohttp import web
+
+from config import UPDATE_CONCURRENCY, UPDATE_USER_QUEUE_MAX, WEBHOOK_SECRET
+from metrics import UPDATES_DROPPED, UPDATE_QUEUE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# رویدادهایی که فرستنده‌شان در from_user است
+USER_EVENTS = (
+    "message", "edited_message", "callback_query", "inline_query", "chosen_inline_result",
+    "shipping_query", "pre_checkout_query", "my_chat_member", "chat_member", "chat_join_request",
+)
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+# دستورهایی که باید روی کار در جریان همان کاربر اثر کنند و پشت آن در صف نمی‌مانند
+CONTROL_COMMANDS = frozenset(("cancel",))
+
+
+def update_user_id(update: types.Update) -> Optional[int]:
+    """شناسه کاربری که آپدیت را فرستاده؛ برای پست کانال شناسه کانال و برای بقیه None"""
+    for name in USER_EVENTS:
+        event = getattr(update, name)
+        if event is not None and event.from_user is not None:
+            return event.from_user.id
+    if update.poll_answer is not None:
+        return update.poll_answer.user.id
+    post = update.channel_post or update.edited_channel_post
+    if post is not None:
+        return post.chat.id
+    return None
+
+
+def valid_secret(request: web.Request, secret: str = WEBHOOK_SECRET) -> bool:
+    """درخواست سرآیند رمز وب‌هوک درست را دارد"""
+    return hmac.compare_digest(request.headers.get(SECRET_HEADER, "").encode(), secret.encode())
+
+
+def control_command(update: types.Update) -> Optional[str]:
+    """نام دستور کنترلی پیام (بدون / و @bot) یا None"""
+    message = update.message
+    if message is None or not message.is_command():
+        return None
+    command = message.get_command(pure=True).lower()
+    return command if command in CONTROL_COMMANDS else None
+
+
+class UpdateScheduler:
+    """پردازش آپدیت‌های هر کاربر به ترتیب و آپدیت‌های کاربران مختلف به صورت موازی
+
+    هر کاربر صف خودش را دارد و فقط یک تسک آن را خالی می‌کند، پس دو پیام پشت سر هم یک
+    کاربر روی حالت FSM به ترتیب رسیدن اجرا می‌شوند. حداکثر concurrency آپدیت (از همه
+    کاربران) هم‌زمان پردازش می‌شود و بقیه منتظر می‌مانند. اگر صف کاربری به max_per_user
+    برسد قدیمی‌ترین آپدیت منتظر او دور ریخته می‌شود. آپدیت‌های بدون کاربر (مثل poll) بدون
+    ترتیب و فقط با همان محدودیت سراسری پردازش می‌شوند. دستورهای CONTROL_COMMANDS (مثل
+    /cancel) بلافاصله و خارج از صف کاربر و محدودیت سراسری اجرا می‌شوند تا کار در جریان
+    همان کاربر را لغو کنند، نه این‌که بعد از تمام شدنش برسند.
+    """
+
+    def __init__(self, process: Callable[[types.Update], Awaitable[list]], concurrency=UPDATE_CONCURRENCY,
+                 max_per_user=UPDATE_USER_QUEUE_MAX):
+        self.process = process
+        self.concurrency = concurrency
+        self.max_per_user = max_per_user
+        # user_id -> (آپدیت، future نتیجه، زمان ورود)
+        self._queues: Dict[Any, Deque[Tuple[types.Update, asyncio.Future, float]]] = {}
+        self._workers: Set[asyncio.Task] = set()
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._pending = 0
+
+    @property
+    def running(self) -> bool:
+        return self._slots is not None
+
+    @property
+    def pending(self) -> int:
+        """آپدیت‌هایی که در صف منتظرند"""
+        return self._pending
+
+    @property
+    def users(self) -> int:
+        """کاربرانی که آپدیت در صف یا در حال پردازش دارند"""
+        return len(self._queues)
+
+    def start(self):
+        self._slots = asyncio.Semaphore(self.concurrency)
+        logger.info(f"Update scheduler started ({self.concurrency} concurrent updates, "
+                    f"{self.max_per_user} queued per user)")
+
+    async def close(self, timeout: float = 30):
+        """پردازش آپدیت‌های صف‌شده (حداکثر timeout ثانیه) و توقف"""
+        if self._slots is None:
+            return
+        deadline = time.monotonic() + timeout
+        # تسک‌هایی که تا تمام شدن بقیه ساخته می‌شوند هم منتظر می‌مانند
+        while self._workers and time.monotonic() < deadline:
+            await asyncio.wait(set(self._workers), timeout=deadline - time.monotonic())
+        if self._workers:
+            logger.warning(f"Update scheduler closed with {self._pending} updates queued")
+            for worker in self._workers:
+                worker.cancel()
+            await asyncio.wait(set(self._workers))
+        self._slots = None
+        logger.info("Update scheduler stopped")
+
+    def submit(self, update: types.Update) -> asyncio.Future:
+        """صف کردن آپدیت؛ future با نتیجه هندلرها (برای آپدیت دورریخته لیست خالی) تمام می‌شود"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        user_id = update_user_id(update)
+        if user_id is None:
+            self._spawn(self._run_one(update, future, time.perf_counter()))
+            return future
+        if control_command(update) is not None:
+            self._spawn(self._run_one(update, future, time.perf_counter(), limited=False))
+            return future
+
+        queue = self._queues.get(user_id)
+        if queue is None:
+            queue = self._queues[user_id] = deque()
+            self._spawn(self._drain(user_id, queue))
+        elif len(queue) >= self.max_per_user:
+            _, stale, _ = queue.popleft()
+            self._pending -= 1
+            if not stale.done():
+                stale.set_result([])
+            UPDATES_DROPPED.inc()
+            logger.warning(f"Update queue of user {user_id} is full, dropped an update")
+        queue.append((update, future, time.perf_counter()))
+        self._pending += 1
+        return future
+
+    def _spawn(self, coro):
+        worker = asyncio.create_task(coro)
+        self._workers.add(worker)
+        worker.add_done_callback(self._workers.discard)
+
+    async def _drain(self, user_id, queue):
+        try:
+            while queue:
+                update, future, queued = queue.popleft()
+                self._pending -= 1
+                await self._run_one(update, future, queued)
+        finally:
+            del self._queues[user_id]
+            # لغو در خاموشی: آپدیت‌های باقیمانده پردازش نمی‌شوند
+            for _, future, _ in queue:
+                future.cancel()
+            self._pending -= len(queue)
+
+    async def _run_one(self, update: types.Update, future: asyncio.Future, queued: float, limited: bool = True):
+        if not limited:
+            await self._process(update, future, queued)
+            return
+        async with self._slots:
+            await self._process(update, future, queued)
+
+    async def _process(self, update: types.Update, future: asyncio.Future, queued: float):
+        UPDATE_QUEUE_SECONDS.observe(time.perf_counter() - queued)
+        try:
+            # هر آپدیت در تسک خودش، چون aiogram حالت FSM و داده هندلرها را در contextvar نگه
+            # می‌دارد و نباید از آپدیت قبلی همین کاربر باقی بماند
+            result = await asyncio.create_task(self.process(update))
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception:
+            # خطاهای هندلر قبلاً به errors_handlers رسیده‌اند
+            logger.exception(f"Error processing update {update.update_id}")
+            result = []
+        if not future.done():
+            future.set_result(result)
+
+
+class ScheduledDispatcher(Dispatcher):
+    """Dispatcher ای که آپدیت‌های polling را از UpdateScheduler می‌گذراند
+
+    وقتی زمان‌بند اجرا نمی‌شود (قبل از startup یا بعد از shutdown) آپدیت‌ها مستقیم پردازش می‌شوند.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.update_scheduler = UpdateScheduler(self.updates_handler.notify)
+
+    async def process_updates(self, updates, fast: bool = True):
+        if not self.update_scheduler.running:
+            return await super().process_updates(updates, fast)
+        # submit همین حالا و به ترتیب دسته صف می‌کند
+        return await asyncio.gather(*[self.update_scheduler.submit(update) for update in updates])
+
+
+class ScheduledWebhookHandler(WebhookRequestHandler):
+    """وب‌هوک که آپدیت را در UpdateScheduler صف می‌کند و بلافاصله ok جواب می‌دهد
+
+    تلگرام منتظر پردازش آپدیت نمی‌ماند؛ جواب وب‌هوک هندلرها (BaseResponse) بعداً با
+    درخواست جدا فرستاده می‌شود. درخواستی که سرآیند WEBHOOK_SECRET را نداشته باشد با 403 رد
+    می‌شود، چون هر کسی که به این پورت برسد می‌تواند آپدیت جعلی از طرف هر کاربری بفرستد.
+    """
+
+    async def post(self):
+        if not valid_secret(self.request):
+            logger.warning(f"Rejected webhook request from {self.request.remote}: invalid secret token")
+            return web.Response(status=403, text="forbidden")
+        return await super().post()
+
+    async def process_update(self, update):
+        dispatcher = self.get_dispatcher()
+        if not dispatcher.update_scheduler.running:
+            return await super().process_update(update)
+        dispatcher.update_scheduler.submit(update).add_done_callback(self._respond_later)
+        return None
+
+    def _respond_later(self, future: asyncio.Future):
+        if future.cancelled():
+            return
+        response = self.get_response(future.result())
+        if response is not None:
+            asyncio.ensure_future(response.execute_response(self.get_dispatcher().bot))
@@ -0,0 +1,129 @@
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, Set
+import logging
+
+from config import WORK_PROCESSES, WORK_THREADS, WORK_QUEUE_MAX, WORK_TIMEOUT
+from metrics import WORK_JOBS, WORK_SECONDS
+
+logger = logging.getLogger(__name__)
+
+CPU = "cpu"
+IO = "io"
+
+
+class WorkError(Exception):
+    """کار در استخر انجام نشد"""
+
+
+class WorkRejected(WorkError):
+    """صف استخر پر است"""
+
+
+class WorkTimeout(WorkError):
+    """کار در مهلت تعیین‌شده تمام نشد"""
+
+
+class WorkCancelled(WorkError):
+    """کار با cancel برای کاربرش لغو شد"""
+
+
+class WorkPool:
+    """اجرای کارهای سنگین خارج از event loop
+
+    run_cpu در استخر پردازه (تحلیل‌های بزرگ، ساخت PDF) و run_io در استخر thread (فایل و
+    کتابخانه‌های بلاک‌کننده) اجرا می‌کند. هر استخر حداکثر max_pending کار در جریان دارد و کار
+    بیشتر با WorkRejected رد می‌شود. کاری که در timeout ثانیه تمام نشود یا با cancel(user_id)
+    لغو شود دیگر منتظرش نمی‌مانیم؛ کاری که شروع شده در پردازه تا آخر اجرا و نتیجه‌اش دور
+    ریخته می‌شود.
+
+    پردازه‌ها در start با fork ساخته می‌شوند، پس start باید قبل از ساخته شدن threadهای
+    دیگر (مثل استخر دیتابیس) صدا زده شود و تابع‌ها و آرگومان‌ها باید pickle شوند.
+    """
+
+    def __init__(self, processes=WORK_PROCESSES, threads=WORK_THREADS, max_pending=WORK_QUEUE_MAX,
+                 timeout=WORK_TIMEOUT):
+        self.processes = processes
+        self.threads = threads
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._executors = {}
+        self._pending = {CPU: 0, IO: 0}
+        # user_id -> کارهای در جریان کاربر
+        self._jobs: Dict[int, Set[asyncio.Future]] = {}
+        self._cancelled: Set[asyncio.Future] = set()
+
+    def pending(self, kind: str) -> int:
+        return self._pending[kind]
+
+    def start(self):
+        # روی هر سیستمی fork، تا پردازه‌ها ماژول‌های بارشده را به ارث ببرند و تابع‌های bot.py را پیدا کنند
+        self._executors[CPU] = ProcessPoolExecutor(max_workers=self.processes,
+                                                   mp_context=multiprocessing.get_context("fork"))
+        self._executors[IO] = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix="work")
+        # همه پردازه‌ها همین حالا fork شوند
+        for _ in range(self.processes):
+            self._executors[CPU].submit(os.getpid)
+        logger.info(f"Work pool started ({self.processes} processes, {self.threads} threads)")
+
+    async def close(self):
+        """لغو کارهای در صف و بستن استخرها؛ کارهای در حال اجرا تمام می‌شوند"""
+        executors, self._executors = self._executors, {}
+        loop = asyncio.get_running_loop()
+        for executor in executors.values():
+            await loop.run_in_executor(None, lambda: executor.shutdown(wait=True, cancel_futures=True))
+        logger.info("Work pool stopped")
+
+    async def run_cpu(self, func, *args, user_id=None, timeout=None):
+        return await self._run(CPU, func, args, user_id, timeout)
+
+    async def run_io(self, func, *args, user_id=None, timeout=None):
+        return await self._run(IO, func, args, user_id, timeout)
+
+    def cancel(self, user_id: int) -> int:
+        """لغو همه کارهای در جریان کاربر؛ تعداد کارهای لغوشده"""
+        jobs = self._jobs.get(user_id, ())
+        for future in jobs:
+            self._cancelled.add(future)
+            future.cancel()
+        return len(jobs)
+
+    async def _run(self, kind, func, args, user_id, timeout):
+        if kind not in self._executors:
+            raise WorkRejected("work pool is not running")
+        if self._pending[kind] >= self.max_pending:
+            WORK_JOBS.labels(kind, "rejected").inc()
+            raise WorkRejected(f"{kind} pool has {self._pending[kind]} pending jobs")
+
+        future = asyncio.get_running_loop().run_in_executor(self._executors[kind], func, *args)
+        self._pending[kind] += 1
+        if user_id is not None:
+            self._jobs.setdefault(user_id, set()).add(future)
+        started = time.perf_counter()
+        result = "failed"
+        try:
+            value = await asyncio.wait_for(future, timeout or self.timeout)
+            result = "done"
+            return value
+        except asyncio.TimeoutError:
+            result = "timeout"
+            raise WorkTimeout(f"{getattr(func, '__name__', func)} timed out") from None
+        except asyncio.CancelledError:
+            result = "cancelled"
+            # لغو خود فراخواننده (مثلاً خاموشی) همان CancelledError می‌ماند
+            if future not in self._cancelled:
+                raise
+            raise WorkCancelled(f"{getattr(func, '__name__', func)} cancelled") from None
+        finally:
+            self._pending[kind] -= 1
+            self._cancelled.discard(future)
+            if user_id is not None:
+                jobs = self._jobs[user_id]
+                jobs.discard(future)
+                if not jobs:
+                    del self._jobs[user_id]
+            WORK_JOBS.labels(kind, result).inc()
+            WORK_SECONDS.labels(kind).observe(time.perf_counter() - started)
@@ -1,18 +1,42 @@
-import re
-import math
-from typing import Dict, List, Tuple
+from typing import Dict, List
 import logging
 
+from exercise_lexicon import get_lexicon
+from metrics import ANALYZER_SECONDS
+from workout_parser import parse_exercises
+
 logger = logging.getLogger(__name__)
 
+MET_VALUES = {
+    "قدرتی": 5.0,
+    "هوازی": 8.0,
+    "مرکزی": 3.5,
+    "کششی": 2.5,
+    "سایر": 4.0
+}
+
+# حداکثر حجم هر سطح سختی؛ حجم بیشتر از آخرین حد «حرفه‌ای» است
+DIFFICULTY_LIMITS = (30, 70)
+DIFFICULTY_LEVELS = ("مبتدی", "متوسط", "حرفه‌ای")
+
+BASE_REST = {
+    "مبتدی": 60,
+    "متوسط": 45,
+    "حرفه‌ای": 30
+}
+
+MAX_VOLUMES = {
+    "مبتدی": 50,
+    "متوسط": 100,
+    "حرفه‌ای": 200
+}
+
+POWERFUL_EXERCISES = ("اسکات", "شنا", "دراز نشست")
+
 class WorkoutAnalyzer:
     def __init__(self):
-        self.exercise_categories = {
-            "قدرتی": ["شنا", "دراز نشست", "اسکات", "پرس سینه", "پشت بازو", "جلو بازو", "ددلیفت", "بارفیکس"],
-            "هوازی": ["دویدن", "طناب", "پرش", "دوچرخه", "شناوری", "پله"],
-            "مرکزی": ["پلانک", "کرانچ", "پروانه", "کوهنوردی", "پل باسن"],
-            "کششی": ["کشش", "یوگا", "حرکت کششی", "نرمش"]
-        }
+        self.lexicon = get_lexicon()
+        self.exercise_categories = self.lexicon.categories
         
         self.difficulty_levels = {
             "مبتدی": {"min_volume": 0, "max_volume": 50},
@@ -20,47 +44,22 @@ class WorkoutAnalyzer:
             "حرفه‌ای": {"min_volume": 101, "max_volume": 999}
         }
     
+    @ANALYZER_SECONDS.labels("parse_workout").time()
     def parse_workout(self, text: str) -> List[Dict]:
         """پارس کردن متن تمرین و استخراج حرکات"""
-        exercises = []
-        lines = text.strip().split('\n')
-        
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
-            
-            # تشخیص الگوهای مختلف
-            patterns = [
-                r'([\u0600-\u06FF\s]+)[=:](\d+)(?:\s*(دقیقه|ثانیه|تکرار|بار))?',
-                r'([\u0600-\u06FF\s]+)\s+(\d+)\s*(دقیقه|ثانیه|تکرار|بار)?',
-                r'طناب\s*=\s*(\d+)\s*(دقیقه)',
-            ]
-            
-            for pattern in patterns:
-                match = re.search(pattern, line)
-                if match:
-                    name = match.group(1).strip()
-                    value = int(match.group(2))
-                    unit = match.group(3) if len(match.groups()) > 2 else 'تکرار'
-                    
-                    exercises.append({
-                        'name': name,
-                        'value': value,
-                        'unit': unit if unit else 'تکرار',
-                        'category': self._get_category(name)
-                    })
-                    break
-        
-        return exercises
+        return [
+            {
+                'name': name,
+                'value': value,
+                'unit': unit,
+                'category': self._get_category(name)
+            }
+            for name, value, unit in parse_exercises(text)
+        ]
     
     def _get_category(self, exercise_name: str) -> str:
         """تشخیص دسته تمرین"""
-        for category, exercises in self.exercise_categories.items():
-            for ex in exercises:
-                if ex in exercise_name:
-                    return category
-        return "سایر"
+        return self.lexicon.category(exercise_name)
     
     def calculate_volume(self, exercises: List[Dict]) -> int:
         """محاسبه حجم کل تمرین"""
@@ -75,33 +74,33 @@ class WorkoutAnalyzer:
     def calculate_calories(self, exercises: List[Dict], weight: int = 70) -> int:
         """محاسبه کالری تقریبی مصرفی"""
         total_calories = 0
-        met_values = {
-            "قدرتی": 5.0,
-            "هوازی": 8.0,
-            "مرکزی": 3.5,
-            "کششی": 2.5,
-            "سایر": 4.0
-        }
-        
         for ex in exercises:
-            met = met_values.get(ex['category'], 4.0)
-            if ex['unit'] == 'دقیقه':
-                duration = ex['value']
-            else:
-                duration = ex['value'] * 0.5  # هر تکرار حدود ۰.۵ دقیقه
-            
-            calories = (met * 3.5 * weight * duration) / 200
-            total_calories += calories
+            total_calories += self.exercise_calories(ex['category'], ex['value'], ex['unit'], weight)
         
         return round(total_calories)
     
+    @staticmethod
+    def exercise_calories(category: str, value: int, unit: str, weight: int = 70) -> float:
+        """کالری یک حرکت (بدون گرد کردن)"""
+        met = MET_VALUES.get(category, 4.0)
+        if unit == 'دقیقه':
+            duration = value
+        else:
+            duration = value * 0.5  # هر تکرار حدود ۰.۵ دقیقه
+        
+        return (met * 3.5 * weight * duration) / 200
+    
     def detect_goal(self, exercises: List[Dict], volume: int) -> str:
         """تشخیص هدف تمرین"""
-        categories = [ex['category'] for ex in exercises]
-        
+        categories = set(ex['category'] for ex in exercises)
+        high_reps = any(ex['value'] > 12 for ex in exercises if ex['unit'] != 'دقیقه')
+        return self.goal_from(categories, volume, high_reps)
+    
+    def goal_from(self, categories, volume: int, high_reps: bool) -> str:
+        """تشخیص هدف از دسته‌های موجود، حجم و وجود حرکت پرتکرار (بیش از ۱۲)"""
         if "هوازی" in categories and volume > 50:
             return "چربی‌سوزی 🔥"
-        elif "قدرتی" in categories and any(ex['value'] > 12 for ex in exercises if ex['unit'] != 'دقیقه'):
+        elif "قدرتی" in categories and high_reps:
             return "قدرتی 💪"
         elif "مرکزی" in categories:
             return "تقویت میان‌تنه 🎯"
@@ -114,22 +113,19 @@ class WorkoutAnalyzer:
     
     def estimate_difficulty(self, volume: int) -> str:
         """تخمین سطح سختی"""
-        if volume <= 30:
-            return "مبتدی"
-        elif volume <= 70:
-            return "متوسط"
-        else:
-            return "حرفه‌ای"
+        for limit, level in zip(DIFFICULTY_LIMITS, DIFFICULTY_LEVELS):
+            if volume <= limit:
+                return level
+        return DIFFICULTY_LEVELS[-1]
     
     def suggest_rest_time(self, exercises: List[Dict], difficulty: str) -> int:
         """پیشنهاد زمان استراحت"""
-        base_rest = {
-            "مبتدی": 60,
-            "متوسط": 45,
-            "حرفه‌ای": 30
-        }
-        
-        has_powerful = any(ex['name'] in ["اسکات", "شنا", "دراز نشست"] for ex in exercises)
+        has_powerful = any(ex['name'] in POWERFUL_EXERCISES for ex in exercises)
+        return self.rest_time_from(difficulty, has_powerful)
+    
+    def rest_time_from(self, difficulty: str, has_powerful: bool) -> int:
+        """زمان استراحت بر اساس سطح سختی و وجود حرکات سنگین"""
+        base_rest = dict(BASE_REST)
         if has_powerful:
             base_rest[difficulty] += 15
         
@@ -137,23 +133,24 @@ class WorkoutAnalyzer:
     
     def detect_imbalance(self, exercises: List[Dict]) -> List[str]:
         """تشخیص عدم تعادل در تمرین"""
-        warnings = []
         upper_body = 0
         lower_body = 0
         core = 0
         
-        upper_ex = ["شنا", "پرس", "بارفیکس", "پشت بازو", "جلو بازو"]
-        lower_ex = ["اسکات", "ددلیفت", "لانگز"]
-        core_ex = ["پلانک", "کرانچ", "دراز نشست"]
-        
         for ex in exercises:
-            if any(u in ex['name'] for u in upper_ex):
+            regions = self.lexicon.body_regions(ex['name'])
+            if "upper" in regions:
                 upper_body += ex['value']
-            if any(l in ex['name'] for l in lower_ex):
+            if "lower" in regions:
                 lower_body += ex['value']
-            if any(c in ex['name'] for c in core_ex):
+            if "core" in regions:
                 core += ex['value']
         
+        return self.imbalance_from(upper_body, lower_body, core)
+    
+    def imbalance_from(self, upper_body: int, lower_body: int, core: int) -> List[str]:
+        """هشدارهای تعادل از مجموع مقادیر هر ناحیه بدن"""
+        warnings = []
         if upper_body > 0 and lower_body == 0:
             warnings.append("تمرین فقط بالاتنه - بهتره حرکات پایین‌تنه هم اضافه کنی")
         if lower_body > 0 and upper_body == 0:
@@ -165,11 +162,16 @@ class WorkoutAnalyzer:
     
     def suggest_improvement(self, exercises: List[Dict], difficulty: str) -> str:
         """پیشنهاد بهبود تمرین"""
+        categories = set(ex['category'] for ex in exercises)
+        has_minutes = any(ex['unit'] == 'دقیقه' for ex in exercises)
+        return self.improvement_from(len(categories), difficulty, has_minutes)
+    
+    def improvement_from(self, category_count: int, difficulty: str, has_minutes: bool) -> str:
+        """پیشنهاد بهبود از تعداد دسته‌ها، سطح سختی و وجود حرکت زمانی"""
         suggestions = []
         
         # پیشنهاد افزایش تنوع
-        categories = set(ex['category'] for ex in exercises)
-        if len(categories) < 2:
+        if category_count < 2:
             suggestions.append("برای نتیجه بهتر، تمرینات متنوع‌تری انجام بده")
         
         # پیشنهاد افزایش حجم
@@ -179,33 +181,27 @@ class WorkoutAnalyzer:
             suggestions.append("اضافه کردن وزنه یا افزایش تعداد ست‌ها رو در نظر بگیر")
         
         # پیشنهاد تنظیم زمان
-        if any(ex['unit'] == 'دقیقه' for ex in exercises):
+        if has_minutes:
             suggestions.append("تمرینات هوازی رو می‌تونی به صورت اینتروال انجام بدی")
         
         return "\n".join(suggestions) if suggestions else "تمرین خوبی داری! ادامه بده"
     
     def check_overtraining(self, exercises: List[Dict], user_level: str) -> List[str]:
         """بررسی تمرین بیش از حد"""
-        warnings = []
         volume = self.calculate_volume(exercises)
-        
-        max_volumes = {
-            "مبتدی": 50,
-            "متوسط": 100,
-            "حرفه‌ای": 200
-        }
-        
-        max_vol = max_volumes.get(user_level, 50)
+        hard_count = sum(1 for ex in exercises if ex['value'] > 20 and ex['unit'] == 'تکرار')
+        return self.overtraining_from(volume, user_level, hard_count)
+    
+    def overtraining_from(self, volume: int, user_level: str, hard_count: int) -> List[str]:
+        """هشدارهای تمرین بیش از حد از حجم و تعداد حرکات سنگین (بیش از ۲۰ تکرار)"""
+        warnings = []
+        max_vol = MAX_VOLUMES.get(user_level, 50)
         
         if volume > max_vol:
             warnings.append(f"⚠ حجم تمرین بالاست! برای سطح {user_level}، حجم مناسب حداکثر {max_vol} هست")
         
-        # بررسی حرکات سنگین متوالی
-        consecutive_hard = 0
-        for ex in exercises:
-            if ex['value'] > 20 and ex['unit'] == 'تکرار':
-                consecutive_hard += 1
-                if consecutive_hard > 3:
-                    warnings.append("چند حرکت سنگین پشت سر هم داری - به بدنت استراحت بده")
+        # بررسی حرکات سنگین متوالی؛ از حرکت چهارم به بعد برای هر حرکت سنگین یک هشدار
+        for _ in range(hard_count - 3):
+            warnings.append("چند حرکت سنگین پشت سر هم داری - به بدنت استراحت بده")
         
         return warnings
@@ -0,0 +1,53 @@
+import re
+from typing import List, Tuple
+
+UNITS = ("دقیقه", "ثانیه", "تکرار", "بار")
+DEFAULT_UNIT = "تکرار"
+
+# همه فاصله‌های یونیکد (همان \s) به جز خط جدید؛ هر خط متن جدا پردازش می‌شود.
+# بالاتر از U+3000 هیچ کاراکتر فاصله‌ای وجود ندارد.
+_WS = "".join(
+    re.escape(chr(c)) for c in range(0x3001)
+    if chr(c).isspace() and chr(c) != "\n"
+)
+_W = f"[{_WS}]"
+# کاراکترهای مجاز نام حرکت: حروف فارسی/عربی و فاصله (مثل الگوی قبلی)
+_NAME_CHARS = rf"\u0600-\u06FF{_WS}"
+_NAME = f"[{_NAME_CHARS}]"
+_UNIT = "|".join(UNITS)
+# پرش از روی یک «دنباله نام» کامل و کاراکترهای غیرنام بعد از آن. نام فقط می‌تواند
+# از ابتدای یک دنباله شروع شود (شروع از وسط دنباله هیچ‌وقت زودتر تطبیق نمی‌خورد)،
+# پس به جای امتحان تک‌تک موقعیت‌ها فقط ابتدای دنباله‌ها امتحان می‌شود.
+_SKIP = rf"(?:{_NAME}*+[^{_NAME_CHARS}\n]++)*?"
+
+# هر خط فقط یک بار اسکن می‌شود؛ ترتیب شاخه‌ها همان ترتیب الگوهای قبلی است:
+#   ۱) نام=عدد یا نام:عدد
+#   ۲) نام عدد
+#   ۳) نام = عدد (با فاصله بعد از جداکننده؛ شامل «طناب = ۳ دقیقه»)
+# هر شاخه مثل re.search اولین تطبیق از چپ را در کل خط پیدا می‌کند.
+_EXERCISE_RE = re.compile(
+    rf"""
+    ^{_W}*+
+    (?:
+        {_SKIP}(?P<n1>{_NAME}++)[=:](?P<v1>\d+)(?:{_W}*(?P<u1>{_UNIT}))?
+      | {_SKIP}(?P<n2>{_NAME}+){_W}+(?P<v2>\d+){_W}*(?P<u2>{_UNIT})?
+      | {_SKIP}(?P<n3>{_NAME}++)[=:]{_W}*(?P<v3>\d+)(?:{_W}*(?P<u3>{_UNIT}))?
+    )
+    """,
+    re.MULTILINE | re.VERBOSE,
+)
+
+
+def parse_exercises(text: str) -> List[Tuple[str, int, str]]:
+    """استخراج (نام، مقدار، واحد) از کل متن در یک اسکن
+
+    ارقام فارسی و انگلیسی هر دو پذیرفته می‌شوند و واحد پیش‌فرض «تکرار» است.
+    """
+    exercises = []
+    for match in _EXERCISE_RE.finditer(text):
+        index = match.lastindex
+        # lastindex شماره آخرین گروه بسته‌شده است؛ هر شاخه سه گروه دارد
+        branch = (index - 1) // 3
+        name, value, unit = match.group(branch * 3 + 1, branch * 3 + 2, branch * 3 + 3)
+        exercises.append((name.strip(), int(value), unit or DEFAULT_UNIT))
+    return exercises
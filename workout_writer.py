@@ -0,0 +1,119 @@
+import asyncio
+from datetime import datetime
+import logging
+
+from config import WRITE_BATCH_SIZE, WRITE_FLUSH_INTERVAL, WRITE_QUEUE_MAX
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+class WorkoutWriter:
+    """بافر write-behind برای ذخیره تمرینات
+
+    تمرینات در یک صف محدود نگه داشته می‌شوند و وقتی تعدادشان به max_batch برسد
+    یا flush_interval ثانیه بگذرد، در یک تراکنش و با یک INSERT چندسطری نوشته می‌شوند.
+    وقتی صف پر باشد save_workout منتظر می‌ماند (backpressure). ردیف خراب دسته را از کار
+    نمی‌اندازد: Database فقط همان ردیف را کنار می‌گذارد و خطای کل دسته (مثل قطع دیتابیس)
+    با تأخیر دوباره امتحان می‌شود.
+    """
+
+    def __init__(self, db, max_batch=WRITE_BATCH_SIZE, flush_interval=WRITE_FLUSH_INTERVAL,
+                 max_pending=WRITE_QUEUE_MAX, max_retries=3):
+        self.db = db
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self._queue = asyncio.Queue(maxsize=max_pending)
+        self._task = None
+        self._closing = False
+        self._listeners = []
+
+    def add_listener(self, callback):
+        """callback(user_ids) بعد از هر نوشتن موفق با مجموعه کاربرانی که تمرینشان نوشته شد"""
+        self._listeners.append(callback)
+
+    def _notify(self, batch):
+        user_ids = {row[0] for row in batch}
+        for callback in self._listeners:
+            try:
+                callback(user_ids)
+            except Exception as e:
+                logger.error(f"Error in workout writer listener: {e}")
+
+    def start(self):
+        """شروع حلقه flush در پس‌زمینه"""
+        self._task = asyncio.create_task(self._run())
+        logger.info("Workout writer started")
+
+    async def close(self):
+        """توقف پذیرش و خالی کردن کامل صف در دیتابیس"""
+        if self._task is None:
+            return
+        self._closing = True
+        await self._queue.put(_STOP)
+        await self._task
+        self._task = None
+        logger.info("Workout writer drained")
+
+    @property
+    def pending(self):
+        return self._queue.qsize()
+
+    async def save_workout(self, user_id, workout_text, analysis, calories, intensity, volume=None):
+        """افزودن تمرین به صف نوشتن"""
+        row = (user_id, workout_text, analysis, calories, intensity, datetime.now(), volume)
+        if self._closing:
+            # بعد از شروع خاموشی، مستقیم نوشته می‌شود تا چیزی از دست نرود
+            saved = await self.db.save_workouts([row])
+            if saved:
+                self._notify(saved)
+            return bool(saved)
+        await self._queue.put(row)
+        return True
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.max_batch:
+                try:
+                    item = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            await self._flush(batch)
+
+        # هر چیزی که بعد از علامت توقف در صف مانده
+        batch = []
+        while not self._queue.empty():
+            item = self._queue.get_nowait()
+            if item is not _STOP:
+                batch.append(item)
+        for i in range(0, len(batch), self.max_batch):
+            await self._flush(batch[i:i + self.max_batch])
+
+    async def _flush(self, batch):
+        for attempt in range(1, self.max_retries + 1):
+            saved = await self.db.save_workouts(batch)
+            if saved is not None:
+                if saved:
+                    self._notify(saved)
+                return
+            if attempt < self.max_retries:
+                await asyncio.sleep(min(2 ** attempt, 10))
+        logger.error(f"Dropping {len(batch)} workouts after {self.max_retries} failed flushes")